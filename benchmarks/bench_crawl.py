@@ -0,0 +1,366 @@
+"""
+Benchmark de bout en bout hors ligne : les scrapers contre le site de substitution (locanto_stub.py).
+
+Scénarios, chacun dans un processus neuf (le serveur tourne dans un autre processus) :
+    scraper        LocantoScraperFinal seul : catégories, pagination, annonces, une requête à la fois
+    country-sync   scrape_full_country.py, moteur historique
+    country-async  scrape_full_country.py, moteur asynchrone
+    all-countries  scrape_all_countries.py (un processus par pays)
+
+Mesures : pages/s (requêtes servies par le site), annonces/min, latence p50/p99 des requêtes
+(ttfb côté scraper, moyenne pondérée des pays pour all-countries), temps CPU et pic de RSS
+(processus pays compris).
+
+Les réglages viennent de l'environnement comme pour un vrai crawl (CONCURRENCY=20 ... devant la
+commande), avec des valeurs propres au benchmark à la place de celles du .env (voir BENCH_DEFAULTS).
+Proxy, sorties, état et cache sont toujours isolés dans un répertoire temporaire.
+
+Reproductible : même site et mêmes perturbations d'un lancement à l'autre. --save enregistre les
+résultats, --baseline les compare à un enregistrement précédent : code retour 1 si un indicateur se
+dégrade de plus de --tolerance.
+
+Usage :
+    python benchmarks/bench_crawl.py [--scenarios scraper,country-async] [--latency 50]
+        [--error-rate 0.02] [--throttle-rate 0.01] [--repeat 3]
+        [--save bench.json] [--baseline bench.json --tolerance 0.2]
+"""
+import argparse
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from glob import glob
+from typing import Dict, List, Optional, Tuple
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(BENCH_DIR, '..', 'src')
+sys.path.insert(0, SRC_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from locanto_stub import INDEX_HOST, PROBE_PATH  # noqa: E402
+
+SCENARIOS = {
+    'scraper': "LocantoScraperFinal seul",
+    'country-sync': "scrape_full_country.py, moteur historique",
+    'country-async': "scrape_full_country.py, moteur asynchrone",
+    'all-countries': "scrape_all_countries.py, un processus par pays"
+}
+
+# Remplacent les valeurs du .env (pas celles passées sur la ligne de commande)
+BENCH_DEFAULTS = {
+    'MAX_CATEGORIES': '999',
+    'MAX_LISTINGS': '1000',
+    'MAX_PAGES': '10',
+    'HOST_RATE': '20',
+    'RATE_MAX': '50',
+    'COUNTRY_WORKERS': '2',
+    'HTTP_CACHE': '0',
+    'INCREMENTAL': '0',
+    'RESUME': '0',
+    # Les pages d'annonces du site de substitution se répètent : marquées, pas écartées
+    'DEDUP_NEAR': 'mark',
+    'LOG_LEVEL': 'WARNING'
+}
+
+# Indicateur → sens de l'amélioration (+1 : plus haut = mieux)
+INDICATORS = [
+    ('pages_per_s', 'pages/s', +1),
+    ('listings_per_min', 'annonces/min', +1),
+    ('p50_ms', 'p50 ms', -1),
+    ('p99_ms', 'p99 ms', -1),
+    ('cpu_s', 'CPU s', -1),
+    ('rss_mb', 'RSS Mo', -1)
+]
+
+
+# --- Processus enfant : exécute un scénario et écrit result.json -------------------------------
+
+def merge_latency(stage_sets: List[Dict], stage: str = 'ttfb') -> Tuple[float, float]:
+    """p50/p99 d'une étape, pondérés par le nombre de mesures de chaque processus"""
+    samples = [stages[stage] for stages in stage_sets if stages.get(stage, {}).get('count')]
+    total = sum(sample['count'] for sample in samples)
+    if not total:
+        return 0.0, 0.0
+    return tuple(round(sum(sample[q] * sample['count'] for sample in samples) / total, 2)
+                 for q in ('p50_ms', 'p99_ms'))
+
+
+def run_scraper() -> int:
+    from locanto_scraper_final import LocantoScraperFinal
+    from proxy_manager import ProxyManager
+    from scrape_full_country import load_config
+
+    config = load_config()
+    scraper = LocantoScraperFinal(ProxyManager(), extractor=config['extractor'])
+    listings = 0
+    for category in scraper.get_categories(os.environ['SITE_URL'])[:config['max_categories']]:
+        urls = scraper.get_listings_from_category(category['url'], max_pages=config['max_pages'])
+        for url in urls[:config['max_listings']]:
+            if scraper.get_listing_details(url):
+                listings += 1
+    return listings
+
+
+def run_child(scenario: str, workdir: str) -> int:
+    from dotenv import load_dotenv
+    from log_setup import setup_logging
+    from metrics import Metrics
+
+    # Mêmes réglages pour tous les scénarios (les main() des scrapers lisent aussi le .env)
+    load_dotenv(os.path.join(SRC_DIR, '..', '.env'))
+    setup_logging()
+    start = time.perf_counter()
+    if scenario == 'scraper':
+        listings = run_scraper()
+    elif scenario in ('country-sync', 'country-async'):
+        import scrape_full_country
+        scrape_full_country.main()
+    else:
+        import scrape_all_countries
+        scrape_all_countries.main()
+    elapsed = time.perf_counter() - start
+
+    # Scénarios complets : annonces et latences lues dans les .meta.json (un par pays)
+    stage_sets = [Metrics.shared().snapshot()['stages']]
+    if scenario != 'scraper':
+        listings = 0
+        stage_sets = []
+        for path in glob(os.path.join(os.environ['OUTPUT_DIR'], '*.meta.json')):
+            with open(path, encoding='utf-8') as f:
+                stats = json.load(f)['stats']
+            listings += stats['total_listings']
+            stage_sets.append(stats.get('metrics', {}).get('stages', {}))
+
+    p50, p99 = merge_latency(stage_sets)
+    with open(os.path.join(workdir, 'result.json'), 'w', encoding='utf-8') as f:
+        json.dump({'elapsed_s': elapsed, 'listings': listings, 'p50_ms': p50, 'p99_ms': p99}, f)
+    return 0
+
+
+# --- Processus principal ----------------------------------------------------------------------
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def stub_call(port: int, action: str) -> Dict:
+    """Compteurs du site de substitution (connexion directe, sans proxy de l'environnement)"""
+    opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
+    with opener.open(f"http://127.0.0.1:{port}/__bench/{action}", timeout=5) as response:
+        return json.load(response)
+
+
+def start_stub(args, port: int) -> subprocess.Popen:
+    command = [
+        sys.executable, os.path.join(BENCH_DIR, 'locanto_stub.py'), '--port', str(port),
+        '--countries', str(args.countries), '--categories', str(args.categories), '--pages', str(args.pages),
+        '--per-page', str(args.per_page), '--latency', str(args.latency), '--jitter', str(args.jitter),
+        '--error-rate', str(args.error_rate), '--throttle-rate', str(args.throttle_rate),
+        '--page-kb', str(args.page_kb), '--seed', str(args.seed),
+        '--pagination', args.pagination, '--past-last', args.past_last
+    ] + (['--sitemaps'] if args.sitemaps else [])
+    stub = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            stub_call(port, 'stats')
+            return stub
+        except OSError:
+            time.sleep(0.1)
+    stub.kill()
+    raise RuntimeError(f"site de substitution injoignable sur le port {port}")
+
+
+def child_env(port: int, workdir: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    for key, value in BENCH_DEFAULTS.items():
+        env.setdefault(key, value)
+    # Toujours isolé : jamais le vrai proxy, ni l'état, les sorties ou le cache d'un vrai crawl
+    env.update({
+        'PROXY_ENDPOINTS': f"http://127.0.0.1:{port}",
+        'PROXY_TEST_URL': f"http://{INDEX_HOST}{PROBE_PATH}",
+        'INDEX_URL': f"http://{INDEX_HOST}/",
+        'SITE_URL': 'http://www.locanto.ci.test/',
+        'OUTPUT_DIR': os.path.join(workdir, 'out'),
+        'STATE_DIR': os.path.join(workdir, 'state'),
+        'CACHE_DIR': os.path.join(workdir, 'cache'),
+        'DEAD_LETTER': '0',
+        'METRICS_PORT': '0',
+        'METRICS_FILE': '',
+        'TARGET_COUNTRIES': '',
+        'SKIP_COUNTRIES': '',
+        'PYTHONPATH': os.pathsep.join(filter(None, [SRC_DIR, os.environ.get('PYTHONPATH')]))
+    })
+    return env
+
+
+def run_scenario(scenario: str, port: int, keep: bool) -> Optional[Dict]:
+    workdir = tempfile.mkdtemp(prefix=f"bench_{scenario}_")
+    env = child_env(port, workdir)
+    if scenario.startswith('country-'):
+        env['ENGINE'] = scenario.split('-')[1]
+
+    stub_call(port, 'reset')
+    with open(os.path.join(workdir, 'scenario.log'), 'w', encoding='utf-8') as log:
+        child = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--child', scenario, '--workdir', workdir],
+                                 env=env, stdout=log, stderr=subprocess.STDOUT, cwd=workdir)
+        # wait4 : CPU et pic de RSS de l'enfant et de ses propres enfants (processus pays)
+        _, status, usage = os.wait4(child.pid, 0)
+        child.returncode = os.waitstatus_to_exitcode(status)
+    served = stub_call(port, 'stats')
+
+    result_path = os.path.join(workdir, 'result.json')
+    if child.returncode != 0 or not os.path.exists(result_path):
+        print(f"   ❌ {scenario}: code retour {child.returncode}, journal {workdir}/scenario.log")
+        return None
+    with open(result_path, encoding='utf-8') as f:
+        result = json.load(f)
+    if not result['listings']:
+        # Crawl avorté (proxy refusé au démarrage, aucune catégorie…) : pas un résultat comparable
+        print(f"   ❌ {scenario}: aucune annonce, journal {workdir}/scenario.log")
+        return None
+    if not keep:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    elapsed = result['elapsed_s']
+    return {
+        'elapsed_s': round(elapsed, 2),
+        'requests': served['requests'],
+        'statuses': served['statuses'],
+        'listings': result['listings'],
+        'pages_per_s': round(served['requests'] / elapsed, 2),
+        'listings_per_min': round(result['listings'] / (elapsed / 60), 1),
+        'p50_ms': result['p50_ms'],
+        'p99_ms': result['p99_ms'],
+        'cpu_s': round(usage.ru_utime + usage.ru_stime, 2),
+        'rss_mb': round(usage.ru_maxrss / 1024, 1)  # Ko sous Linux
+    }
+
+
+def median_run(runs: List[Dict]) -> Dict:
+    """Médiane de chaque indicateur sur les répétitions (le reste vient du premier passage)"""
+    merged = dict(runs[0])
+    for key, _, _ in INDICATORS + [('elapsed_s', '', 0)]:
+        merged[key] = statistics.median(run[key] for run in runs)
+    return merged
+
+
+def print_results(results: Dict[str, Dict]):
+    print(f"\n{'scénario':15s}" + ''.join(f"{label:>14s}" for _, label, _ in INDICATORS) + f"{'erreurs':>12s}")
+    for scenario, result in results.items():
+        injected = sum(count for status, count in result['statuses'].items() if status != '200')
+        print(f"{scenario:15s}" + ''.join(f"{result[key]:14g}" for key, _, _ in INDICATORS)
+              + f"{injected:>6d}/{result['requests']:<5d}")
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float) -> int:
+    print(f"\n📏 COMPARAISON (tolérance {tolerance:.0%})")
+    regressions = 0
+    for scenario, result in results.items():
+        reference = baseline.get(scenario)
+        if not reference:
+            print(f"   ⏭️  {scenario}: absent de la référence")
+            continue
+        for key, label, direction in INDICATORS:
+            before, after = reference.get(key), result[key]
+            if not before:
+                continue
+            change = (after - before) / before
+            worse = -change * direction > tolerance
+            regressions += worse
+            print(f"   {'❌' if worse else '✅'} {scenario} {label}: {before:g} → {after:g} ({change:+.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--countries', type=int, default=3)
+    parser.add_argument('--categories', type=int, default=4)
+    parser.add_argument('--pages', type=int, default=3)
+    parser.add_argument('--per-page', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=50, help="Délai moyen par réponse (ms)")
+    parser.add_argument('--jitter', type=float, default=0.5)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--throttle-rate', type=float, default=0.0)
+    parser.add_argument('--page-kb', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--sitemaps', action='store_true', help="Le site publie robots.txt et des sitemaps par catégorie")
+    parser.add_argument('--pagination', choices=['count', 'links', 'none'], default='count',
+                        help="Indication du nombre de pages en page 1 (voir locanto_stub.py)")
+    parser.add_argument('--past-last', choices=['repeat', 'empty'], default='repeat')
+    parser.add_argument('--repeat', type=int, default=1, help="Passages par scénario (médiane)")
+    parser.add_argument('--save', help="Fichier JSON des résultats")
+    parser.add_argument('--baseline', help="Résultats de référence (JSON de --save)")
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    parser.add_argument('--keep', action='store_true', help="Garder les répertoires de travail")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--workdir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return run_child(args.child, args.workdir)
+
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        print(f"❌ Scénario inconnu: {', '.join(unknown)} ({', '.join(SCENARIOS)})")
+        return 1
+
+    port = free_port()
+    stub = start_stub(args, port)
+    print(f"🧪 Site de substitution: {args.countries} pays × {args.categories} catégories × {args.pages} pages "
+          f"× {args.per_page} annonces, {args.latency:g} ms ± {args.jitter:.0%}, "
+          f"{args.error_rate:.0%} erreurs, {args.throttle_rate:.0%} 429")
+
+    results = {}
+    failed = 0
+    try:
+        for scenario in scenarios:
+            print(f"\n⏱️  {scenario} : {SCENARIOS[scenario]}")
+            runs = []
+            for i in range(args.repeat):
+                run = run_scenario(scenario, port, args.keep)
+                if run is None:
+                    break
+                print(f"   [{i + 1}/{args.repeat}] {run['elapsed_s']:.1f}s, {run['listings']} annonces, "
+                      f"{run['requests']} requêtes")
+                runs.append(run)
+            if len(runs) < args.repeat:
+                failed += 1
+                continue
+            results[scenario] = median_run(runs)
+    finally:
+        stub.terminate()
+        stub.wait()
+
+    if results:
+        print_results(results)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({'site': {key: getattr(args, key) for key in ('countries', 'categories', 'pages', 'per_page',
+                                                                    'latency', 'jitter', 'error_rate', 'throttle_rate',
+                                                                    'page_kb', 'seed')},
+                       'results': results}, f, indent=2)
+        print(f"\n💾 Résultats: {args.save}")
+
+    regressions = 0
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f)['results'], args.tolerance)
+        if regressions:
+            print(f"\n❌ {regressions} régression(s)")
+
+    return 1 if failed or regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""
+Compare les backends d'extraction sur les pages d'annonces enregistrées.
+
+1. Parité : chaque backend doit produire exactement le même dict que bs4
+   (hors horodatage scrapedAt). Code retour 1 en cas d'écart.
+2. Micro-benchmark : pages/seconde par backend.
+
+Usage :
+    python benchmarks/bench_extractors.py [--iterations 200] [--fixtures DIR]
+"""
+import argparse
+import os
+import sys
+import time
+import zlib
+from glob import glob
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from extractors import EXTRACTORS  # noqa: E402
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+REFERENCE = 'bs4'
+
+
+def load_fixtures(directory: str) -> list:
+    pages = []
+    for path in sorted(glob(os.path.join(directory, 'listing_*.html'))):
+        with open(path, 'rb') as f:
+            content = f.read()
+        name = os.path.basename(path)
+        # URL fictive au format Locanto pour l'extraction de l'ID
+        url = f"https://www.locanto.test/ID_{zlib.crc32(name.encode())}/{name}"
+        pages.append((name, url, content))
+    return pages
+
+
+def without_timestamp(listing: dict) -> dict:
+    listing = dict(listing)
+    listing.pop('scrapedAt', None)
+    return listing
+
+
+def run_extractor(extract, content: bytes, url: str):
+    try:
+        return without_timestamp(extract(content, url))
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
+
+
+def check_parity(pages: list) -> int:
+    print("🔎 PARITÉ")
+    mismatches = 0
+    for name, url, content in pages:
+        expected = run_extractor(EXTRACTORS[REFERENCE], content, url)
+        for backend, extract in EXTRACTORS.items():
+            if backend == REFERENCE:
+                continue
+            got = run_extractor(extract, content, url)
+            if got == expected:
+                print(f"   ✅ {name} [{backend}]")
+                continue
+            mismatches += 1
+            print(f"   ❌ {name} [{backend}]")
+            if isinstance(expected, dict) and isinstance(got, dict):
+                for key in expected:
+                    if expected[key] != got.get(key):
+                        print(f"      {key}: {REFERENCE}={expected[key]!r} {backend}={got.get(key)!r}")
+            else:
+                print(f"      {REFERENCE}={expected!r}")
+                print(f"      {backend}={got!r}")
+    return mismatches
+
+
+def benchmark(pages: list, iterations: int):
+    print(f"\n⏱️  BENCHMARK ({iterations} passes × {len(pages)} pages)")
+    results = {}
+    for backend, extract in EXTRACTORS.items():
+        start = time.perf_counter()
+        for _ in range(iterations):
+            for _, url, content in pages:
+                try:
+                    extract(content, url)
+                except Exception:
+                    pass
+        duration = time.perf_counter() - start
+        results[backend] = iterations * len(pages) / duration
+        print(f"   {backend:6s} {results[backend]:10.1f} pages/s")
+
+    reference = results[REFERENCE]
+    for backend, rate in results.items():
+        if backend != REFERENCE:
+            print(f"   {backend} / {REFERENCE}: x{rate / reference:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--fixtures', default=FIXTURES_DIR)
+    args = parser.parse_args()
+
+    pages = load_fixtures(args.fixtures)
+    if not pages:
+        print(f"❌ Aucune page listing_*.html dans {args.fixtures}")
+        return 1
+
+    mismatches = check_parity(pages)
+    benchmark(pages, args.iterations)
+
+    if mismatches:
+        print(f"\n❌ {mismatches} écart(s) de parité")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
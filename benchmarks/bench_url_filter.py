@@ -0,0 +1,100 @@
+"""
+Compare les filtres "URL déjà vue" (src/url_filter.py) à l'ancien set() de visited_urls.
+
+Pour chaque backend, sur N URLs Locanto synthétiques réparties sur plusieurs domaines :
+1. Mémoire (nbytes : tableaux du filtre, ou set + chaînes pour l'ancien set) et
+   octets/URL, rapportée à 1 million d'URLs.
+2. Vitesse d'ajout et de recherche.
+3. Exactitude : aucune URL ajoutée ne doit manquer (code retour 1 sinon) ;
+   taux de faux positifs mesuré sur N URLs jamais ajoutées.
+4. Taille sur disque et aller-retour save / load.
+
+Usage :
+    python benchmarks/bench_url_filter.py [--urls 1000000] [--error-rate 0.001]
+"""
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from url_filter import BACKENDS, ShardedUrlFilter, load_filter  # noqa: E402
+
+DOMAINS = ['www.locanto.ci', 'abidjan.locanto.ci', 'www.locanto.com.ng', 'www.locanto.com.gh', 'www.locanto.co.za']
+
+
+def make_urls(count: int, salt: str) -> list:
+    return [
+        f"https://{DOMAINS[i % len(DOMAINS)]}/ID_{4_000_000_000 + i}/{salt}-annonce-maison-a-louer-{i % 997}.html"
+        for i in range(count)
+    ]
+
+
+def directory_size(directory: str) -> int:
+    return sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+
+
+def bench_backend(kind: str, urls: list, unseen: list, error_rate: float) -> dict:
+    gc.collect()
+    start = time.perf_counter()
+    seen = ShardedUrlFilter(kind, error_rate)
+    for url in urls:
+        seen.add(url)
+    add_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    missing = sum(1 for url in urls if url not in seen)
+    lookup_time = time.perf_counter() - start
+    false_positives = sum(1 for url in unseen if url in seen)
+
+    with tempfile.TemporaryDirectory() as directory:
+        seen.save(directory)
+        disk = directory_size(directory)
+        loaded = load_filter(directory)
+        sample = urls[::max(1, len(urls) // 10_000)]
+        roundtrip_ok = len(loaded) == len(seen) and all(url in loaded for url in sample)
+
+    return {
+        'memory': seen.nbytes,
+        'add_rate': len(urls) / add_time,
+        'lookup_rate': len(urls) / lookup_time,
+        'missing': missing,
+        'fp_rate': false_positives / len(unseen),
+        'disk': disk,
+        'roundtrip_ok': roundtrip_ok,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--urls', type=int, default=1_000_000)
+    parser.add_argument('--error-rate', type=float, default=0.001)
+    args = parser.parse_args()
+
+    print(f"🔗 {args.urls} URLs sur {len(DOMAINS)} domaines, bloom à {args.error_rate:.2%} de faux positifs\n")
+    urls = make_urls(args.urls, 'vue')
+    unseen = make_urls(args.urls, 'jamais')
+
+    failures = 0
+    header = f"   {'backend':8s} {'Mo/1M URLs':>11s} {'o/URL':>7s} {'ajouts/s':>10s} {'lookups/s':>10s} {'faux pos.':>10s} {'disque':>9s}"
+    print(header)
+    for kind in BACKENDS:
+        r = bench_backend(kind, urls, unseen, args.error_rate)
+        per_url = r['memory'] / args.urls
+        print(f"   {kind:8s} {per_url * 1_000_000 / 1024**2:11.1f} {per_url:7.1f} {r['add_rate']:10.0f} "
+              f"{r['lookup_rate']:10.0f} {r['fp_rate']:10.4%} {r['disk'] / 1024**2:7.1f}Mo")
+        if r['missing'] or not r['roundtrip_ok']:
+            failures += 1
+            print(f"      ❌ {r['missing']} URLs ajoutées introuvables, aller-retour disque {'ok' if r['roundtrip_ok'] else 'KO'}")
+
+    if failures:
+        print(f"\n❌ {failures} backend(s) en échec")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,296 @@
+"""
+Site Locanto de substitution pour les benchmarks hors ligne (aucun crédit proxy consommé).
+
+Le serveur joue à la fois le proxy et le site : les scrapers le reçoivent comme proxy
+(PROXY_ENDPOINTS=http://127.0.0.1:PORT) et lui envoient des URLs absolues
+http://www.locanto.<pays>.test/... ; le domaine .test garantit qu'aucune requête ne part vers Locanto.
+
+Pages :
+    www.locanto.info.test/         index mondial : un lien par pays
+    www.locanto.<pays>.test/       accueil : .catlist avec les catégories
+    /<catégorie>/?page=N           liens /ID_<n>/<slug>.html ; après --pages, la dernière page à nouveau
+                                   (comme Locanto) ou une page vide (--past-last empty)
+                                   --pagination : "N annonces" (count), liens ?page= tronqués (links) ou rien
+    /ID_<n>/<slug>.html            annonce : pages enregistrées de benchmarks/fixtures/ (ou synthétiques)
+    /robots.txt                    avec --sitemaps : /sitemap_index.xml → /sitemaps/<catégorie>.xml.gz
+    /__bench/stats                 compteurs du serveur (JSON) ; /__bench/reset les remet à zéro
+    /__bench/probe                 URL de test des proxies (PROXY_TEST_URL) : ni délai, ni erreur, non comptée
+
+Perturbations, reproductibles (tirées d'un hash de l'URL et de son nombre de visites, pas de l'ordre
+d'arrivée des requêtes) :
+    --latency / --jitter    délai avant chaque réponse (ms, ± fraction)
+    --error-rate            part de réponses 500 / 502 / 503
+    --throttle-rate         part de réponses 429 (avec Retry-After)
+
+Usage :
+    python benchmarks/locanto_stub.py [--port 8790] [--countries 3] [--latency 50] [--error-rate 0.02]
+"""
+import argparse
+import gzip
+import json
+import os
+import re
+import sys
+import threading
+import time
+import zlib
+from collections import Counter
+from glob import glob
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+INDEX_HOST = 'www.locanto.info.test'
+# Test des proxies au démarrage : hors perturbations, le benchmark mesure le crawl
+PROBE_PATH = '/__bench/probe'
+COUNTRY_CODES = ['ci', 'com.ng', 'com.gh', 'co.za', 'sn', 'cm', 'ke', 'ma', 'tn', 'ug']
+CATEGORY_NAMES = ['Immobilier', 'Voitures et motos', 'Offres d\'emploi', 'Services aux particuliers',
+                  'Électronique', 'Maison et jardin', 'Cours et formations', 'Animaux de compagnie']
+ERROR_STATUSES = (500, 502, 503)
+
+SYNTHETIC_LISTING = """<html><head><title>Annonce {id}</title></head><body>
+<h1 class="h1__title">Appartement 3 pièces n°{id}</h1>
+<span class="simple__price">{price}.000 FCFA</span>
+<div class="simple__description">Bel appartement lumineux, <b>proche commerces</b>, disponible de suite.</div>
+<img class="user_images__img" src="https://images.locanto.test/{id}/1.jpg">
+<span class="userprofile__nickname_label">Vendeur {id}</span>
+<span itemprop="addressLocality">Cocody</span>
+<a class="breadcrumb__link">Immobilier</a><a class="breadcrumb__link">Appartements</a>
+<span class="list__element_label">Publiée: il y a 2 jours</span>
+</body></html>"""
+
+
+def load_details(directory: str) -> List[str]:
+    pages = []
+    for path in sorted(glob(os.path.join(directory, 'listing_*.html'))):
+        with open(path, encoding='utf-8') as f:
+            pages.append(f.read())
+    return pages
+
+
+def boilerplate(kb: int) -> str:
+    """Menus et pied de page, pour approcher la taille (et le coût de parsing) des vraies pages"""
+    block = ''.join(f'<li><a href="/ville-{i}/">Ville {i}</a></li>' for i in range(20))
+    block = f'<div class="footer_links"><ul>{block}</ul></div>\n'
+    return block * max(0, kb * 1024 // len(block))
+
+
+class StubSite:
+    def __init__(self, countries: int = 3, categories: int = 4, pages: int = 3, per_page: int = 10,
+                 latency: float = 0.05, jitter: float = 0.5, error_rate: float = 0.0, throttle_rate: float = 0.0,
+                 retry_after: int = 1, page_kb: int = 50, seed: int = 0, fixtures: str = FIXTURES_DIR,
+                 sitemaps: bool = False, pagination: str = 'count', past_last: str = 'repeat'):
+        self.hosts = [f"www.locanto.{code}.test" for code in COUNTRY_CODES[:countries]]
+        self.categories = [(f"/cat-{i}/", CATEGORY_NAMES[i % len(CATEGORY_NAMES)] + (f" {i}" if i >= len(CATEGORY_NAMES) else ''))
+                           for i in range(categories)]
+        self.pages = pages
+        self.per_page = per_page
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.seed = seed
+        self.sitemaps = sitemaps
+        self.pagination = pagination
+        self.past_last = past_last
+        self.details = load_details(fixtures) or [SYNTHETIC_LISTING]
+        self.padding = boilerplate(page_kb)
+        self.visits: Dict[str, int] = {}
+        self.stats: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def draw(self, url: str, visit: int, salt: str) -> float:
+        """Tirage dans [0, 1) ne dépendant que de l'URL et de la visite"""
+        return zlib.crc32(f"{self.seed}:{salt}:{visit}:{url}".encode()) / 2**32
+
+    def visit(self, url: str) -> int:
+        with self._lock:
+            self.visits[url] = self.visits.get(url, 0) + 1
+            return self.visits[url]
+
+    def fault(self, url: str, visit: int) -> Optional[int]:
+        draw = self.draw(url, visit, 'fault')
+        if draw < self.throttle_rate:
+            return 429
+        if draw < self.throttle_rate + self.error_rate:
+            return ERROR_STATUSES[visit % len(ERROR_STATUSES)]
+        return None
+
+    def delay(self, url: str, visit: int) -> float:
+        return max(0.0, self.latency * (1 + self.jitter * (2 * self.draw(url, visit, 'delay') - 1)))
+
+    def ads(self, host: str, category: int, page: int) -> range:
+        first = (self.hosts.index(host) * 1000 + category) * 10000 + (page - 1) * self.per_page
+        return range(first, first + self.per_page)
+
+    def render_sitemap(self, host: str, path: str) -> Optional[Tuple[int, bytes]]:
+        """robots.txt, index des sitemaps et un sitemap gzippé par catégorie"""
+        if path == '/robots.txt':
+            sitemap = f"Sitemap: http://{host}/sitemap_index.xml\n" if self.sitemaps else ''
+            return 200, f"User-agent: *\nDisallow: /post/\n{sitemap}".encode()
+        if not self.sitemaps:
+            return None
+        if path == '/sitemap_index.xml':
+            locs = ''.join(f"<sitemap><loc>http://{host}/sitemaps/{href.strip('/')}.xml.gz</loc></sitemap>"
+                           for href, _ in self.categories)
+            return 200, f'<?xml version="1.0"?><sitemapindex>{locs}</sitemapindex>'.encode()
+        match = re.match(r'/sitemaps/(.+)\.xml\.gz$', path)
+        category = next((i for i, (href, _) in enumerate(self.categories) if match and href.strip('/') == match.group(1)), None)
+        if category is None:
+            return None
+        urls = ''.join(f"<url><loc>http://{host}/ID_{ad}/annonce-{ad}.html</loc><lastmod>2024-01-{1 + page:02d}</lastmod></url>"
+                       for page in range(self.pages, 0, -1) for ad in self.ads(host, category, page))
+        return 200, gzip.compress(f'<?xml version="1.0"?><urlset>{urls}</urlset>'.encode())
+
+    def render_pagination(self, path: str, page: int) -> str:
+        if self.pagination == 'count':
+            return f'<div class="pagination"><span class="result_count">{self.pages * self.per_page} annonces</span></div>'
+        if self.pagination == 'links':
+            # Fenêtre de 3 pages autour de la page courante, comme une pagination tronquée
+            pages = range(max(1, page - 1), min(self.pages, page + 1) + 1)
+            return '<div class="pagination">' + ''.join(f'<a href="{path}?page={n}">{n}</a>' for n in pages) + '</div>'
+        return ''
+
+    def render(self, host: str, path: str, query: str) -> Tuple[int, str]:
+        if host == INDEX_HOST and path == '/':
+            links = ''.join(f'<li><a href="http://{h}/">Locanto {h.split(".", 2)[2][:-5].upper()}</a></li>'
+                            for h in self.hosts)
+            return 200, f'<html><body><ul class="countries">{links}</ul>{self.padding}</body></html>'
+
+        if host not in self.hosts:
+            return 404, '<html>Introuvable</html>'
+
+        if path == '/':
+            links = ''.join(f'<a href="{href}">{name}</a>' for href, name in self.categories)
+            return 200, f'<html><body><div class="catlist">{links}</div>{self.padding}</body></html>'
+
+        category = next((i for i, (href, _) in enumerate(self.categories) if path == href), None)
+        if category is not None:
+            page = int(parse_qs(query).get('page', ['1'])[0])
+            if page > self.pages and self.past_last == 'repeat':
+                page = self.pages
+            links = ''
+            if page <= self.pages:
+                links = ''.join(f'<div class="resultlist__item"><a href="/ID_{ad}/annonce-{ad}.html">Annonce {ad}</a></div>'
+                                for ad in self.ads(host, category, page))
+            return 200, f'<html><body><div class="resultlist">{links}</div>{self.render_pagination(path, page)}{self.padding}</body></html>'
+
+        match = re.match(r'/ID_(\d+)/[^/]+\.html$', path)
+        if match:
+            ad = int(match.group(1))
+            page = self.details[ad % len(self.details)]
+            page = page.replace('{id}', str(ad)).replace('{price}', str(10 + ad % 490))
+            return 200, page.replace('</body>', self.padding + '</body>', 1)
+
+        return 404, '<html>Introuvable</html>'
+
+    def record(self, status: int):
+        with self._lock:
+            self.stats[str(status)] += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {'requests': sum(self.stats.values()), 'statuses': dict(self.stats)}
+
+    def reset(self):
+        with self._lock:
+            self.visits.clear()
+            self.stats.clear()
+
+
+def make_handler(site: StubSite):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # Keep-alive, comme l'unblocker
+
+        def do_GET(self):
+            # Requête de proxy (URL absolue) ou directe (en-tête Host)
+            parts = urlsplit(self.path)
+            host = parts.hostname or (self.headers.get('Host') or '').split(':')[0]
+            path = parts.path or '/'
+
+            if path == PROBE_PATH:
+                return self.reply(200, 'ok', 'text/plain')
+            if path.startswith('/__bench/'):
+                if path == '/__bench/reset':
+                    site.reset()
+                return self.reply(200, json.dumps(site.snapshot()), 'application/json')
+
+            url = f"{host}{path}?{parts.query}"
+            visit = site.visit(url)
+            time.sleep(site.delay(url, visit))
+
+            status = site.fault(url, visit)
+            if status:
+                site.record(status)
+                return self.reply(status, '<html>Erreur simulée</html>')
+            document = site.render_sitemap(host, path) if host in site.hosts else None
+            if document:
+                site.record(document[0])
+                return self.reply(document[0], document[1], 'application/octet-stream')
+            status, body = site.render(host, path, parts.query)
+            site.record(status)
+            self.reply(status, body)
+
+        def reply(self, status: int, body, content_type: str = 'text/html; charset=utf-8'):
+            data = body.encode('utf-8') if isinstance(body, str) else body
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(data)))
+            if status == 429:
+                self.send_header('Retry-After', str(site.retry_after))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8790)
+    parser.add_argument('--countries', type=int, default=3)
+    parser.add_argument('--categories', type=int, default=4, help="Catégories par pays")
+    parser.add_argument('--pages', type=int, default=3, help="Pages d'annonces par catégorie")
+    parser.add_argument('--per-page', type=int, default=10, help="Annonces par page")
+    parser.add_argument('--latency', type=float, default=50, help="Délai moyen par réponse (ms)")
+    parser.add_argument('--jitter', type=float, default=0.5, help="Variation du délai (± fraction)")
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--throttle-rate', type=float, default=0.0)
+    parser.add_argument('--retry-after', type=int, default=1, help="Retry-After des 429 (s)")
+    parser.add_argument('--page-kb', type=int, default=50, help="Menus ajoutés à chaque page (Ko)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--fixtures', default=FIXTURES_DIR)
+    parser.add_argument('--sitemaps', action='store_true', help="robots.txt + sitemaps gzippés par catégorie")
+    parser.add_argument('--pagination', choices=['count', 'links', 'none'], default='count',
+                        help="Indication du nombre de pages en page 1")
+    parser.add_argument('--past-last', choices=['repeat', 'empty'], default='repeat',
+                        help="Page au-delà de la dernière : la dernière à nouveau, ou vide")
+    args = parser.parse_args()
+
+    if args.countries > len(COUNTRY_CODES):
+        print(f"❌ --countries: {len(COUNTRY_CODES)} pays au plus")
+        return 1
+
+    site = StubSite(
+        countries=args.countries, categories=args.categories, pages=args.pages, per_page=args.per_page,
+        latency=args.latency / 1000, jitter=args.jitter, error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate, retry_after=args.retry_after, page_kb=args.page_kb,
+        seed=args.seed, fixtures=args.fixtures, sitemaps=args.sitemaps, pagination=args.pagination,
+        past_last=args.past_last
+    )
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), make_handler(site))
+    server.daemon_threads = True
+    print(f"🧪 Site de substitution sur http://127.0.0.1:{args.port} ({', '.join(site.hosts)})", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
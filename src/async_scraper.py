@@ -0,0 +1,356 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+from bs4 import BeautifulSoup
+
+from dedup import ListingDedup
+from discovery import ListingDiscovery
+from http_cache import ResponseCache
+from locanto_scraper_final import LocantoScraperFinal
+from parse_pool import ParsePool
+from pipeline import CrawlPipeline
+from rate_limiter import AdaptiveRateLimiter, parse_retry_after
+from retry_policy import DeadLetterFile, FetchError, classify_exception, classify_status
+from seen_index import SeenIndex
+from transport import Transport
+from user_agents import HeaderProfiles
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncLocantoScraper(LocantoScraperFinal):
+    """Moteur asynchrone : mêmes extractions que LocantoScraperFinal, requêtes concurrentes"""
+
+    def __init__(self, proxy_manager, concurrency: int = 10, per_host_concurrency: int = 5,
+                 host_rate: float = 2.0, timeout: int = 30, parse_workers: int = 0,
+                 extractor: str = 'bs4', cache: Optional[ResponseCache] = None,
+                 seen: Optional[SeenIndex] = None, rate_limiter: Optional[AdaptiveRateLimiter] = None,
+                 dead_letter: Optional[DeadLetterFile] = None, transport: Optional[Transport] = None,
+                 header_profiles: Optional[HeaderProfiles] = None, dedup: Optional[ListingDedup] = None,
+                 discovery: Optional[ListingDiscovery] = None):
+        super().__init__(proxy_manager, extractor=extractor, cache=cache, seen=seen,
+                         rate_limiter=rate_limiter or AdaptiveRateLimiter(initial_rate=host_rate),
+                         dead_letter=dead_letter, transport=transport, header_profiles=header_profiles,
+                         dedup=dedup, discovery=discovery)
+        self.concurrency = concurrency
+        self.per_host_concurrency = per_host_concurrency
+        self.timeout = timeout
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.http: Optional[aiohttp.ClientSession] = None
+        # parse_workers > 0 : parsing des annonces dans un pool de processus
+        self.parse_pool = ParsePool(parse_workers, extractor) if parse_workers > 0 else None
+        # Un seul worker d'index explore les sitemaps d'un site, les autres attendent le résultat
+        self.discovery_lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def open(self):
+        """Crée la session HTTP poolée (un pool de connexions partagé par toutes les requêtes)"""
+        if self.http is None:
+            self.http = self.transport.client_session(self.concurrency, self.per_host_concurrency, self.timeout)
+
+    async def close(self):
+        if self.http is not None:
+            await self.http.close()
+            self.http = None
+        if self.parse_pool is not None:
+            self.parse_pool.shutdown()
+
+    def _host_semaphore(self, host: str) -> asyncio.Semaphore:
+        if host not in self.host_semaphores:
+            self.host_semaphores[host] = asyncio.Semaphore(self.per_host_concurrency)
+        return self.host_semaphores[host]
+
+    async def fetch(self, url: str) -> Optional[bytes]:
+        """Télécharge une page en respectant les limites globale et par hôte (None si déjà visitée ou en échec)"""
+        try:
+            return await self.fetch_or_raise(url)
+        except FetchError:
+            return None
+
+    async def fetch_or_raise(self, url: str) -> Optional[bytes]:
+        """Comme fetch, mais un échec définitif (après les nouvelles tentatives) lève FetchError"""
+        if self.already_visited(url):
+            return None
+
+        # Cache frais : ni requête, ni attente de politesse
+        cached = self.cache.lookup(url) if self.cache else None
+        if cached and cached.fresh:
+            self.mark_visited(url)
+            return cached.body
+
+        await self.open()
+        host = urlsplit(url).netloc
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                if not self.breaker.allow(host):
+                    raise FetchError(url, 'circuit_open', host)
+                # Politesse (Retry-After compris) attendue avant de prendre une place : les sémaphores
+                # ne sont tenus que pendant la requête, et libérés entre deux tentatives
+                await self.rate_limiter.wait_async(host)
+                async with self.semaphore, self._host_semaphore(host):
+                    content = await self._fetch_once(url, host, cached)
+                self.breaker.record_success(host)
+                self.mark_visited(url)
+                return content
+            except FetchError as e:
+                error = e
+            except asyncio.CancelledError:
+                # Page devenue inutile (fin de pagination) : une éventuelle requête d'essai est libérée
+                self.breaker.release_trial(host)
+                raise
+
+            if not self.retry_later(error, host, attempt):
+                raise error
+            delay = self.retry_policy.delay(attempt, error.retry_after)
+            logger.debug("         🔁 %s: tentative %d/%d dans %.1fs", error.kind, attempt + 1, self.retry_policy.max_retries + 1, delay)
+            await asyncio.sleep(delay)
+
+    async def _fetch_once(self, url: str, host: str, cached) -> bytes:
+        logger.debug("      🔍 %s", url[:80])
+        headers = self.get_headers(host)
+        if cached:
+            headers.update(cached.conditional_headers())
+        endpoint = self.proxy_pool.acquire()
+        status, error_kind = None, None
+        start = time.monotonic()
+        try:
+            async with self.http.get(url, headers=headers, proxy=endpoint.url) as response:
+                status = response.status
+                self.metrics.count('responses', status=status)
+                if cached and response.status == 304:
+                    self.cache.revalidated(url)
+                    self.rate_limiter.success(host, time.monotonic() - start)
+                    return cached.body
+
+                kind = classify_status(response.status)
+                if kind:
+                    raise FetchError(url, kind, f"HTTP {response.status}", response.status,
+                                     parse_retry_after(response.headers.get('Retry-After')))
+
+                read_start = time.perf_counter()
+                content = await response.read()
+                self.metrics.observe('download', time.perf_counter() - read_start)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            error_kind = classify_exception(e)
+            self.metrics.count('fetch_errors', kind=error_kind)
+            raise FetchError(url, error_kind, str(e)[:200] or type(e).__name__) from e
+        finally:
+            self.proxy_pool.release(endpoint, time.monotonic() - start, status, error_kind)
+
+        self.metrics.count('bytes', len(content))
+        if self.cache:
+            self.cache.store(url, content, response.headers)
+        self.rate_limiter.success(host, time.monotonic() - start)
+        return content
+
+    async def scrape_page(self, url: str) -> Optional[BeautifulSoup]:
+        content = await self.fetch(url)
+        if not content:
+            return None
+        return self.parse_html(content)
+
+    async def get_categories(self, site_url: str) -> List[Dict]:
+        """Extrait les catégories"""
+        logger.info(f"\n{'='*60}")
+        logger.info(f"📂 Extraction catégories")
+        logger.info("="*60)
+
+        soup = await self.scrape_page(site_url)
+        if not soup:
+            return []
+
+        categories = self.parse_categories(soup, site_url)
+
+        logger.info(f"\n      Total: {len(categories)} catégories")
+        return categories
+
+    async def iter_listing_pages(self, category_url: str, max_pages: int = 2,
+                                 max_listings: Optional[int] = None) -> AsyncIterator[List[str]]:
+        """
+        Parcourt les pages d'une catégorie et renvoie les URLs d'annonces page par page.
+
+        La page 1 indique la dernière page : les suivantes sont alors téléchargées ensemble
+        (juste assez pour max_listings), soit environ deux allers-retours par catégorie.
+        """
+        discovered = await self.discover_listing_urls(category_url)
+        if discovered is not None:
+            yield discovered
+            return
+
+        previous = None
+        # Dernière page : indiquée par la page 1, max_pages sinon (pages alors lues une à une)
+        last_page, page_size, exact = max_pages, 0, False
+        remaining = max_listings
+        tasks: Dict[int, asyncio.Task] = {}
+        page = 0
+
+        try:
+            while page < last_page:
+                page += 1
+                if page not in tasks:
+                    window = 1
+                    if page_size:
+                        window = last_page - page + 1
+                        if remaining is not None:
+                            window = min(window, max(1, -(-remaining // page_size)))
+                    for next_page in range(page, page + window):
+                        tasks[next_page] = asyncio.create_task(self.fetch_or_raise(self.page_url(category_url, next_page)))
+
+                try:
+                    content = await tasks.pop(page)
+                except FetchError as e:
+                    if e.kind == 'client':
+                        break
+                    # Échec passager : la page est mise de côté, la pagination continue
+                    logger.warning(f"         ⚠️ Page {page} ignorée ({e.kind})")
+                    continue
+                if not content:
+                    break
+
+                soup = self.parse_html(content)
+                page_urls = self.parse_listing_urls(soup, category_url)
+
+                logger.debug("         Page %d: %d annonces trouvées", page, len(page_urls))
+
+                if not page_urls or self.repeated_page(page, page_urls, previous):
+                    break
+                previous = page_urls
+                if page == 1:
+                    page_size = len(page_urls)
+                    last_page, exact = self.last_page_hint(soup, category_url, page_size, max_pages)
+                if not exact:
+                    last_page = self.extend_last_page(page, last_page, max_pages, len(page_urls), page_size)
+
+                new_urls = self.unseen_listing_urls(page_urls)
+
+                # Mode incrémental : tri du plus récent au plus ancien, la suite est déjà connue
+                if not new_urls:
+                    logger.info(f"         🛑 Page entièrement connue, arrêt de la pagination")
+                    break
+
+                if remaining is not None:
+                    remaining -= len(new_urls)
+                yield new_urls
+        finally:
+            # Fin de catégorie (ou consommateur servi) : pages restantes abandonnées
+            for task in tasks.values():
+                if task.done() and not task.cancelled():
+                    task.exception()
+                task.cancel()
+
+    async def explore_site(self, site_url: str):
+        """Télécharge robots.txt, sitemaps et flux d'un site (une fois par site)"""
+        async with self.discovery_lock:
+            documents = self.discovery.start(site_url)
+            while documents:
+                # Sitemaps d'un même niveau téléchargés ensemble
+                batch, documents = documents, []
+                contents = await asyncio.gather(*(self.fetch(url) for url in batch))
+                for url, content in zip(batch, contents):
+                    if content:
+                        documents.extend(self.discovery.add_document(site_url, url, content))
+
+    async def discover_listing_urls(self, category_url: str) -> Optional[List[str]]:
+        """Annonces d'une catégorie d'après les sitemaps et flux, None s'ils ne la couvrent pas"""
+        if self.discovery is None:
+            return None
+
+        parts = urlsplit(category_url)
+        await self.explore_site(f"{parts.scheme}://{parts.netloc}/")
+        listing_urls = self.discovery.listing_urls(category_url)
+        if listing_urls is None:
+            return None
+
+        logger.debug("         🗺️  %d annonces dans les sitemaps et flux, sans pagination", len(listing_urls))
+        return self.unseen_listing_urls(listing_urls)
+
+    async def get_listings_from_category(self, category_url: str, max_pages: int = 2) -> List[str]:
+        """Extrait URLs des annonces"""
+        listing_urls = []
+
+        async for page_urls in self.iter_listing_pages(category_url, max_pages=max_pages):
+            listing_urls.extend(page_urls)
+
+        return listing_urls
+
+    async def get_listing_details(self, listing_url: str) -> Optional[Dict]:
+        """Extrait détails complets"""
+        content = await self.fetch(listing_url)
+        if not content:
+            self.release_listing_url(listing_url)
+            return None
+
+        if self.parse_pool is None:
+            listing = self.parse_listing_content(content, listing_url)
+        else:
+            try:
+                with self.metrics.timer('extract'):
+                    listing = await self.parse_pool.parse_listing_async(content, listing_url)
+            except Exception as e:
+                self.record_failure(FetchError(listing_url, 'parse', str(e)))
+                listing = None
+            else:
+                self.log_listing(listing)
+
+        if not listing:
+            self.release_listing_url(listing_url)
+            return None
+        return self.check_duplicate(listing)
+
+    async def get_many_listing_details(self, listing_urls: List[str]) -> List[Dict]:
+        """Récupère plusieurs annonces en parallèle (ordre conservé, échecs ignorés)"""
+        results = await asyncio.gather(
+            *(self.get_listing_details(url) for url in listing_urls),
+            return_exceptions=True
+        )
+        return [r for r in results if isinstance(r, dict)]
+
+    async def scrape_site(self, site_url: str, max_categories: int = 3, max_listings: int = 5, max_pages: int = 2) -> Dict:
+        """Scrape complet"""
+        logger.info(f"\n{'='*60}")
+        logger.info(f"🌍 SCRAPING: {site_url}")
+        logger.info("="*60)
+
+        result = {
+            'site_url': site_url,
+            'scrape_date': datetime.now().isoformat(),
+            'config': {
+                'max_categories': max_categories,
+                'max_listings': max_listings,
+                'max_pages': max_pages,
+                'concurrency': self.concurrency
+            },
+            'categories': []
+        }
+
+        categories = await self.get_categories(site_url)
+
+        def on_category(cat_data: Dict):
+            # Catégories sans annonce absentes du résultat, comme avec le moteur synchrone
+            if cat_data['listings_found']:
+                result['categories'].append(cat_data)
+
+        pipeline = CrawlPipeline(
+            self,
+            max_pages=max_pages,
+            max_listings=max_listings,
+            detail_workers=self.concurrency,
+            on_category=on_category
+        )
+        await pipeline.run(categories[:max_categories])
+
+        return result
@@ -0,0 +1,342 @@
+"""
+Export colonnaire des annonces (Parquet ou Arrow IPC) pour l'analyse.
+
+Une ligne par annonce, colonnes typées (prix et coordonnées en float, devise / ville / catégorie
+encodées en dictionnaire, images en liste), un fichier par crawl de pays, partitionné à la Hive :
+
+    <EXPORT_DIR>/country=www.locanto.ci/scrape_date=2024-01-01/www.locanto.ci_20240101_120000.parquet
+
+Sources acceptées, lues en flux (mémoire bornée par --batch-size, ou par la plus grosse catégorie
+pour l'ancien format) :
+    <base>.ndjson + <base>.meta.json   sortie actuelle de scrape_full_country / scrape_all_countries
+    <base>.json                        ancien JSON imbriqué (categories[*].listings[*])
+
+Conversion en masse (les fichiers déjà exportés et plus récents que leur source sont sautés) :
+
+    python src/columnar_export.py /app/data/full_scrapes /app/data/countries [--out /app/data/parquet]
+
+Lecture :
+
+    import pyarrow.dataset as ds
+    ds.dataset('/app/data/parquet', format='parquet', partitioning='hive').to_table(filter=...)
+"""
+import argparse
+import json
+import os
+import re
+import sys
+from datetime import date, datetime
+from glob import glob
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from listing_stream import CATEGORY_KEY, iter_listings, stream_paths
+
+FORMATS = {'parquet': '.parquet', 'arrow': '.arrow'}
+READ_CHUNK = 1 << 20
+
+_text = pa.string()
+_dictionary = pa.dictionary(pa.int32(), pa.string())
+
+SCHEMA = pa.schema([
+    ('id', _text),
+    ('url', _text),
+    ('title', _text),
+    ('price', pa.float64()),
+    ('currency', _dictionary),
+    ('description', _text),
+    ('images', pa.list_(_text)),
+    ('mainImage', _text),
+    ('username', _text),
+    ('phone', _text),
+    ('city', _dictionary),
+    ('latitude', pa.float64()),
+    ('longitude', pa.float64()),
+    ('category', _dictionary),
+    ('crawlCategory', _dictionary),
+    ('datePosted', pa.date32()),
+    ('scrapedAt', pa.timestamp('us'))
+])
+
+
+def _float(value) -> Optional[float]:
+    try:
+        return float(value) if value not in (None, '') else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _date(value) -> Optional[date]:
+    try:
+        return date.fromisoformat(value[:10]) if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _timestamp(value) -> Optional[datetime]:
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+def flatten_listing(listing: Dict, category_url: Optional[str] = None) -> Dict:
+    """Annonce (dict de l'extracteur) → ligne typée de SCHEMA"""
+    contact = listing.get('contact') or {}
+    location = listing.get('location') or {}
+    images = listing.get('images')
+    return {
+        'id': listing.get('id'),
+        'url': listing.get('url'),
+        'title': listing.get('title'),
+        'price': _float(listing.get('price')),
+        'currency': listing.get('currency'),
+        'description': listing.get('description'),
+        'images': [str(image) for image in images] if isinstance(images, list) else None,
+        'mainImage': listing.get('mainImage'),
+        'username': contact.get('username'),
+        'phone': contact.get('phone'),
+        'city': location.get('city'),
+        'latitude': _float(location.get('latitude')),
+        'longitude': _float(location.get('longitude')),
+        'category': listing.get('category'),
+        'crawlCategory': listing.get(CATEGORY_KEY, category_url),
+        'datePosted': _date(listing.get('datePosted')),
+        'scrapedAt': _timestamp(listing.get('scrapedAt'))
+    }
+
+
+class DictionaryEncoder:
+    """Dictionnaire commun à tous les lots d'un fichier (Arrow IPC : pas de remplacement, seulement des ajouts)"""
+
+    def __init__(self):
+        self.index: Dict[str, int] = {}
+        self.values: List[str] = []
+
+    def encode(self, values: List[Optional[str]]) -> pa.DictionaryArray:
+        indices = []
+        for value in values:
+            if value is None:
+                indices.append(None)
+                continue
+            value = str(value)
+            if value not in self.index:
+                self.index[value] = len(self.values)
+                self.values.append(value)
+            indices.append(self.index[value])
+        return pa.DictionaryArray.from_arrays(pa.array(indices, pa.int32()), pa.array(self.values, _text))
+
+
+def rows_to_batch(rows: List[Dict], encoders: Dict[str, DictionaryEncoder]) -> pa.RecordBatch:
+    columns = []
+    for field in SCHEMA:
+        values = [row[field.name] for row in rows]
+        if pa.types.is_dictionary(field.type):
+            columns.append(encoders.setdefault(field.name, DictionaryEncoder()).encode(values))
+        else:
+            columns.append(pa.array(values, field.type))
+    return pa.RecordBatch.from_arrays(columns, schema=SCHEMA)
+
+
+def iter_json_array(f, key: str) -> Iterator:
+    """
+    Éléments du premier tableau "key": [...] d'un gros JSON, décodés un par un.
+
+    Seul l'élément en cours est en mémoire (ici une catégorie et ses annonces, pas le fichier).
+    """
+    decoder = json.JSONDecoder()
+    marker = f'"{key}"'
+    buffer, pos, eof = '', 0, False
+
+    def fill():
+        nonlocal buffer, pos, eof
+        chunk = f.read(READ_CHUNK)
+        eof = not chunk
+        buffer, pos = buffer[pos:] + chunk, 0
+
+    while True:
+        found = buffer.find(marker, pos)
+        start = buffer.find('[', found) if found >= 0 else -1
+        if start >= 0:
+            pos = start + 1
+            break
+        if eof:
+            return
+        pos = max(pos, len(buffer) - len(marker) - 16) if found < 0 else found
+        fill()
+
+    while True:
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+            pos += 1
+        if pos >= len(buffer):
+            if eof:
+                return
+            fill()
+            continue
+        if buffer[pos] == ']':
+            return
+        try:
+            item, pos = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            # Élément coupé par la fin du morceau lu
+            if eof:
+                raise
+            fill()
+            continue
+        yield item
+
+
+def read_header(path: str) -> Dict[str, str]:
+    """site_url / scrape_date en tête d'un ancien JSON imbriqué, sans le charger"""
+    with open(path, encoding='utf-8') as f:
+        head = f.read(64 * 1024)
+    header = {}
+    for key in ('site_url', 'scrape_date'):
+        match = re.search(rf'"{key}"\s*:\s*"([^"]*)"', head)
+        if match:
+            header[key] = match.group(1)
+    return header
+
+
+def iter_source(path: str) -> Tuple[Dict[str, str], Iterator[Tuple[Dict, Optional[str]]]]:
+    """(en-tête, (annonce, URL de catégorie)...) d'un flux NDJSON ou d'un ancien JSON imbriqué"""
+    paths = stream_paths(path[:-len('.meta.json')] if path.endswith('.meta.json') else path)
+    if os.path.exists(paths['meta']) and os.path.exists(paths['listings']):
+        with open(paths['meta'], encoding='utf-8') as f:
+            meta = json.load(f)
+        return meta, ((listing, None) for listing in iter_listings(paths['listings']))
+
+    def nested():
+        with open(path, encoding='utf-8') as f:
+            for category in iter_json_array(f, 'categories'):
+                for listing in category.get('listings') or []:
+                    yield listing, category.get('url')
+
+    return read_header(path), nested()
+
+
+def partition_of(path: str, header: Dict[str, str]) -> Tuple[str, str, str]:
+    """(pays, date du crawl, nom de base) depuis le nom <pays>_<AAAAMMJJ>_<HHMMSS>"""
+    name = os.path.basename(path)
+    for suffix in ('.meta.json', '.ndjson', '.json'):
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+            break
+    parts = name.rsplit('_', 2)
+    country = parts[0] if len(parts) == 3 else (re.sub(r'^https?://', '', header.get('site_url', '')).split('/')[0] or name)
+    scrape_date = (header.get('scrape_date') or '')[:10]
+    if not scrape_date and len(parts) == 3 and re.fullmatch(r'\d{8}', parts[1]):
+        scrape_date = f"{parts[1][:4]}-{parts[1][4:6]}-{parts[1][6:]}"
+    return country, scrape_date or 'inconnue', name
+
+
+class ColumnarExporter:
+    def __init__(self, out_dir: str, fmt: str = 'parquet', batch_size: int = 50_000, compression: str = 'zstd'):
+        if fmt not in FORMATS:
+            raise ValueError(f"EXPORT_FORMAT inconnu: {fmt} ({', '.join(FORMATS)})")
+        self.out_dir = out_dir
+        self.fmt = fmt
+        self.batch_size = batch_size
+        self.compression = compression
+
+    @classmethod
+    def from_env(cls) -> Optional['ColumnarExporter']:
+        """Export configuré par EXPORT_DIR (vide = désactivé) / EXPORT_FORMAT (parquet | arrow)"""
+        out_dir = os.getenv('EXPORT_DIR')
+        if not out_dir:
+            return None
+        return cls(out_dir, fmt=os.getenv('EXPORT_FORMAT', 'parquet'))
+
+    def target(self, path: str, header: Dict[str, str]) -> str:
+        country, scrape_date, name = partition_of(path, header)
+        return os.path.join(self.out_dir, f"country={country}", f"scrape_date={scrape_date}", name + FORMATS[self.fmt])
+
+    def _open(self, path: str):
+        if self.fmt == 'parquet':
+            return pq.ParquetWriter(path, SCHEMA, compression=self.compression)
+        options = pa.ipc.IpcWriteOptions(compression=self.compression, emit_dictionary_deltas=True)
+        return pa.ipc.new_file(pa.OSFile(path, 'wb'), SCHEMA, options=options)
+
+    def export(self, path: str, force: bool = False) -> Optional[Tuple[str, int]]:
+        """Exporte un crawl (fichier .meta.json / .ndjson / ancien .json) ; (fichier écrit, annonces) ou None si à jour"""
+        header, listings = iter_source(path)
+        target = self.target(path, header)
+        if not force and os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(path):
+            return None
+
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp = f"{target}.tmp"
+        rows: List[Dict] = []
+        encoders: Dict[str, DictionaryEncoder] = {}
+        total = 0
+        # Une annonce ré-écrite à la reprise d'un crawl n'est exportée qu'une fois
+        seen_urls = set()
+        writer = self._open(tmp)
+        try:
+            for listing, category_url in listings:
+                if listing.get('url') in seen_urls:
+                    continue
+                seen_urls.add(listing.get('url'))
+                rows.append(flatten_listing(listing, category_url))
+                if len(rows) >= self.batch_size:
+                    writer.write_batch(rows_to_batch(rows, encoders))
+                    total += len(rows)
+                    rows = []
+            if rows:
+                writer.write_batch(rows_to_batch(rows, encoders))
+                total += len(rows)
+        finally:
+            writer.close()
+        os.replace(tmp, target)
+        return target, total
+
+
+def find_sources(root: str) -> List[str]:
+    """Crawls d'un dossier : flux (.meta.json) d'abord, anciens JSON imbriqués sans flux ensuite"""
+    if not os.path.isdir(root):
+        return [root]
+    sources = sorted(glob(os.path.join(root, '*.meta.json')))
+    streamed = {path[:-len('.meta.json')] for path in sources}
+    for path in sorted(glob(os.path.join(root, '*.json'))):
+        base = path[:-len('.json')]
+        if path.endswith('.meta.json') or base in streamed or os.path.basename(path).startswith('scraping_report_'):
+            continue
+        if 'site_url' in read_header(path):
+            sources.append(path)
+    return sources
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='+', help="Dossiers de résultats ou fichiers de crawl")
+    parser.add_argument('--out', default=os.getenv('EXPORT_DIR', '/app/data/parquet'))
+    parser.add_argument('--format', choices=list(FORMATS), default=os.getenv('EXPORT_FORMAT', 'parquet'))
+    parser.add_argument('--batch-size', type=int, default=50_000, help="Annonces par groupe de lignes")
+    parser.add_argument('--force', action='store_true', help="Réécrire les exports à jour")
+    args = parser.parse_args()
+
+    exporter = ColumnarExporter(args.out, fmt=args.format, batch_size=args.batch_size)
+    exported = skipped = total = 0
+    for root in args.paths:
+        for path in find_sources(root):
+            try:
+                result = exporter.export(path, force=args.force)
+            except (OSError, ValueError, pa.ArrowException) as e:
+                print(f"❌ {path}: {e}")
+                continue
+            if result is None:
+                skipped += 1
+                continue
+            target, count = result
+            exported += 1
+            total += count
+            print(f"✅ {count} annonces → {target}")
+
+    print(f"\n📦 {exported} crawls exportés ({total} annonces), {skipped} déjà à jour → {args.out}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,233 @@
+"""
+État de crawl persistant (SQLite) : reprise exacte après un arrêt ou un crash.
+
+    countries   statut par pays (running / done) et fichier de sortie en cours
+    categories  catégories terminées d'un pays, avec leurs compteurs
+    urls        frontière : URLs d'annonces découvertes (pending) et déjà écrites (done)
+    runs        avancement d'un crawl multi-pays (résultats par pays)
+
+Une URL n'est marquée done qu'après le fsync de la ligne NDJSON correspondante :
+après un crash, une annonce peut être re-téléchargée, jamais perdue.
+Les URLs done alimentent aussi un filtre compact (url_filter/<pays>/), sauvegardé à chaque
+catégorie terminée et rechargé à la reprise comme visited_urls du scraper.
+"""
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set
+
+from url_filter import ShardedUrlFilter
+
+
+class CrawlState:
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=FULL')
+        self._db.executescript('''
+            CREATE TABLE IF NOT EXISTS countries (
+                country TEXT PRIMARY KEY,
+                site_url TEXT NOT NULL,
+                status TEXT NOT NULL,
+                output_base TEXT,
+                started_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS categories (
+                country TEXT NOT NULL,
+                url TEXT NOT NULL,
+                data TEXT NOT NULL,
+                PRIMARY KEY (country, url)
+            );
+            CREATE TABLE IF NOT EXISTS urls (
+                country TEXT NOT NULL,
+                url TEXT NOT NULL,
+                category_url TEXT NOT NULL,
+                status TEXT NOT NULL,
+                PRIMARY KEY (country, url)
+            );
+            CREATE TABLE IF NOT EXISTS runs (
+                name TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                started_at REAL NOT NULL,
+                data TEXT NOT NULL
+            );
+        ''')
+        self._db.commit()
+
+    @classmethod
+    def from_env(cls) -> Optional['CrawlState']:
+        """État configuré par RESUME / STATE_DIR (RESUME=0 : pas d'état, chaque lancement repart de zéro)"""
+        if os.getenv('RESUME', '1') != '1':
+            return None
+        return cls(os.path.join(os.getenv('STATE_DIR', '/app/data/state'), 'crawl_state.sqlite'))
+
+    def _execute(self, sql: str, params: Iterable = ()):
+        with self._lock:
+            cursor = self._db.execute(sql, tuple(params))
+            self._db.commit()
+            return cursor
+
+    def _query(self, sql: str, params: Iterable = ()) -> List:
+        with self._lock:
+            return self._db.execute(sql, tuple(params)).fetchall()
+
+    def url_filter_dir(self, country: str) -> str:
+        return os.path.join(os.path.dirname(self.path), 'url_filter', country)
+
+    # --- Pays ---
+
+    def country(self, country: str) -> Optional[Dict]:
+        rows = self._query(
+            'SELECT site_url, status, output_base, started_at FROM countries WHERE country = ?', (country,)
+        )
+        if not rows:
+            return None
+        site_url, status, output_base, started_at = rows[0]
+        return {'site_url': site_url, 'status': status, 'output_base': output_base, 'started_at': started_at}
+
+    def start_country(self, country: str, site_url: str, output_base: str) -> 'CountryProgress':
+        """Nouveau crawl du pays : l'avancement d'un éventuel crawl précédent est effacé"""
+        now = time.time()
+        with self._lock:
+            self._db.execute('DELETE FROM categories WHERE country = ?', (country,))
+            self._db.execute('DELETE FROM urls WHERE country = ?', (country,))
+            self._db.execute(
+                'INSERT OR REPLACE INTO countries VALUES (?, ?, ?, ?, ?, ?)',
+                (country, site_url, 'running', output_base, now, now)
+            )
+            self._db.commit()
+        shutil.rmtree(self.url_filter_dir(country), ignore_errors=True)
+        return CountryProgress(self, country)
+
+    def resume_country(self, country: str, site_url: str) -> Optional['CountryProgress']:
+        """Reprise d'un crawl interrompu du pays (None s'il n'y en a pas)"""
+        info = self.country(country)
+        if not info or info['status'] != 'running' or info['site_url'] != site_url:
+            return None
+        return CountryProgress(self, country)
+
+    def finish_country(self, country: str):
+        """Pays terminé : la frontière et son filtre ne sont plus utiles"""
+        with self._lock:
+            self._db.execute('DELETE FROM urls WHERE country = ?', (country,))
+            self._db.execute(
+                "UPDATE countries SET status = 'done', updated_at = ? WHERE country = ?",
+                (time.time(), country)
+            )
+            self._db.commit()
+        shutil.rmtree(self.url_filter_dir(country), ignore_errors=True)
+
+    # --- Crawl multi-pays ---
+
+    def run(self, name: str) -> Optional[Dict]:
+        """Crawl multi-pays en cours (données sauvegardées), None s'il n'y en a pas"""
+        rows = self._query("SELECT data, started_at FROM runs WHERE name = ? AND status = 'running'", (name,))
+        if not rows:
+            return None
+        data = json.loads(rows[0][0])
+        data['started_at'] = rows[0][1]
+        return data
+
+    def save_run(self, name: str, data: Dict, status: str = 'running'):
+        self._execute(
+            '''INSERT INTO runs VALUES (?, ?, ?, ?)
+               ON CONFLICT(name) DO UPDATE SET status = excluded.status, data = excluded.data''',
+            (name, status, time.time(), json.dumps(data, ensure_ascii=False))
+        )
+
+    def start_run(self, name: str, data: Dict):
+        self._execute('DELETE FROM runs WHERE name = ?', (name,))
+        self.save_run(name, data)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class CountryProgress:
+    """Avancement d'un pays : catégories terminées et frontière d'URLs d'annonces"""
+
+    def __init__(self, state: CrawlState, country: str):
+        self.state = state
+        self.country = country
+        self._done_buffer: List[str] = []
+        self._buffer_lock = threading.Lock()
+        # Annonces écrites (done), sauvegardées avec chaque catégorie terminée
+        self.written = self.visited_urls()
+
+    def visited_urls(self) -> ShardedUrlFilter:
+        """Filtre des annonces écrites avant l'interruption (vide pour un nouveau crawl)"""
+        directory = self.state.url_filter_dir(self.country)
+        if os.path.exists(os.path.join(directory, 'shards.json')):
+            return ShardedUrlFilter.load(directory)
+        return ShardedUrlFilter.from_env()
+
+    @property
+    def info(self) -> Dict:
+        return self.state.country(self.country)
+
+    def done_categories(self) -> List[Dict]:
+        """Catégories terminées lors des lancements précédents (ordre de fin)"""
+        rows = self.state._query(
+            'SELECT data FROM categories WHERE country = ? ORDER BY rowid', (self.country,)
+        )
+        return [json.loads(row[0]) for row in rows]
+
+    def category_done(self, cat_data: Dict):
+        """À appeler une fois les annonces de la catégorie sur disque"""
+        self.commit()
+        with self._buffer_lock:
+            self.written.save(self.state.url_filter_dir(self.country))
+        self.state._execute(
+            'INSERT OR REPLACE INTO categories VALUES (?, ?, ?)',
+            (self.country, cat_data['url'], json.dumps(cat_data, ensure_ascii=False))
+        )
+
+    def enqueue(self, category_url: str, urls: List[str]) -> Set[str]:
+        """Ajoute des URLs à la frontière, renvoie celles déjà écrites avant l'interruption"""
+        if not urls:
+            return set()
+        with self.state._lock:
+            self.state._db.executemany(
+                "INSERT OR IGNORE INTO urls VALUES (?, ?, ?, 'pending')",
+                [(self.country, url, category_url) for url in urls]
+            )
+            self.state._db.commit()
+            placeholders = ','.join('?' * len(urls))
+            rows = self.state._db.execute(
+                f"SELECT url FROM urls WHERE country = ? AND status = 'done' AND url IN ({placeholders})",
+                (self.country, *urls)
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def listing_done(self, url: str):
+        """Annonce écrite dans le flux (enregistrée au prochain commit, après le fsync)"""
+        with self._buffer_lock:
+            self._done_buffer.append(url)
+
+    def commit(self):
+        with self._buffer_lock:
+            urls, self._done_buffer = self._done_buffer, []
+        if not urls:
+            return
+        with self.state._lock:
+            self.state._db.executemany(
+                "UPDATE urls SET status = 'done' WHERE country = ? AND url = ?",
+                [(self.country, url) for url in urls]
+            )
+            self.state._db.commit()
+        with self._buffer_lock:
+            for url in urls:
+                self.written.add(url)
+
+    def pending_count(self) -> int:
+        return self.state._query(
+            "SELECT COUNT(*) FROM urls WHERE country = ? AND status = 'pending'", (self.country,)
+        )[0][0]
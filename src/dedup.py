@@ -0,0 +1,240 @@
+"""
+Déduplication des annonces pendant un crawl.
+
+    IDs       une annonce présente dans plusieurs catégories (parente et fille, ou pages qui glissent)
+              n'est téléchargée qu'une fois : la première catégorie qui la rencontre la réserve
+    reposts   une annonce republiée sous un nouvel ID est reconnue après extraction par son empreinte
+              SimHash (titre + description + téléphone) : à distance de Hamming <= DEDUP_DISTANCE
+              d'une annonce déjà vue, avec même prix, devise et ville, c'est un doublon, marqué
+              duplicateOf (DEDUP_NEAR=mark, défaut) ou écarté (drop)
+
+Les doublons forment des grappes rattachées à la première annonce vue (l'originale).
+Avec DEDUP_DB, les empreintes sont gardées dans une base SQLite partagée par les pays et les crawls :
+un repost est alors reconnu même si l'original a été vu dans un autre pays ou un crawl précédent.
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+from seen_index import listing_id
+from url_filter import Hash64Filter
+
+# En dessous, l'empreinte n'est pas assez discriminante (annonce quasi vide)
+MIN_TOKENS = 8
+SHINGLE_SIZE = 2
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS fingerprints (
+        domain TEXT NOT NULL,
+        listing_id TEXT NOT NULL,
+        url TEXT NOT NULL,
+        simhash INTEGER NOT NULL,
+        block TEXT NOT NULL,
+        original_url TEXT NOT NULL,
+        first_seen REAL NOT NULL,
+        PRIMARY KEY (domain, listing_id)
+    );
+    CREATE TABLE IF NOT EXISTS fingerprint_bands (
+        band INTEGER NOT NULL,
+        value INTEGER NOT NULL,
+        block TEXT NOT NULL,
+        domain TEXT NOT NULL,
+        listing_id TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS fingerprint_bands_lookup ON fingerprint_bands (band, value, block);
+'''
+
+
+def _tokens(text: str) -> List[str]:
+    text = unicodedata.normalize('NFKD', text.lower())
+    return re.findall(r'\w+', ''.join(c for c in text if not unicodedata.combining(c)))
+
+
+def _hash64(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def simhash(features: List[str]) -> int:
+    """SimHash 64 bits : chaque bit vaut 1 si la majorité des empreintes des features l'ont à 1"""
+    ones = [0] * 64
+    for feature in features:
+        h = _hash64(feature)
+        while h:
+            low = h & -h
+            ones[low.bit_length() - 1] += 1
+            h ^= low
+    half = len(features) / 2
+    return sum(1 << bit for bit, count in enumerate(ones) if count > half)
+
+
+def listing_features(listing: Dict) -> List[str]:
+    """Shingles de mots du titre et de la description, plus le téléphone (chiffres seuls)"""
+    words = _tokens(f"{listing.get('title') or ''} {listing.get('description') or ''}")
+    if len(words) < MIN_TOKENS:
+        return []
+    features = [' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)]
+    phone = re.sub(r'\D', '', (listing.get('contact') or {}).get('phone') or '')
+    if phone:
+        features.append(f"tel:{phone}")
+    return features
+
+
+def block_key(listing: Dict) -> str:
+    """Prix, devise et ville : deux annonces qui diffèrent sur l'un d'eux ne sont jamais des doublons"""
+    city = ' '.join(_tokens((listing.get('location') or {}).get('city') or ''))
+    return f"{listing.get('price')}|{listing.get('currency')}|{city}"
+
+
+def _signed(value: int) -> int:
+    """uint64 → int64 (entiers SQLite)"""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+class ListingDedup:
+    """
+    IDs réservés pendant le crawl (en mémoire) et empreintes des annonces (SQLite).
+
+    claim_listing_urls() écarte les annonces déjà réservées par une autre catégorie, release()
+    libère une annonce dont le téléchargement a échoué ; check() renvoie l'originale d'une
+    annonce republiée, ou None.
+    """
+
+    def __init__(self, path: str = ':memory:', max_distance: int = 7, near: str = 'mark'):
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.max_distance = max_distance
+        self.near = near
+        # max_distance + 1 bandes : deux empreintes à distance <= max_distance ont au moins une bande identique
+        self.bands = max_distance + 1
+        self.band_bits = 64 // self.bands
+        self.stats = {'claimed': 0, 'skipped': 0, 'near_duplicates': 0}
+        # URL de l'originale → URLs des doublons vus pendant ce crawl
+        self.clusters: Dict[str, List[str]] = defaultdict(list)
+        self._claimed = Hash64Filter()
+        # Réservations libérées après un échec (peu nombreuses : le filtre ne sait pas retirer)
+        self._released = set()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(SCHEMA)
+        self._db.commit()
+
+    @classmethod
+    def from_env(cls) -> Optional['ListingDedup']:
+        """Déduplication configurée par DEDUP / DEDUP_DB / DEDUP_DISTANCE / DEDUP_NEAR"""
+        if os.getenv('DEDUP', '1') != '1':
+            return None
+        return cls(
+            os.getenv('DEDUP_DB') or ':memory:',
+            max_distance=int(os.getenv('DEDUP_DISTANCE', 7)),
+            near=os.getenv('DEDUP_NEAR', 'mark')
+        )
+
+    @staticmethod
+    def _ref(url: str) -> Optional[str]:
+        ad_id = listing_id(url)
+        return f"{urlsplit(url).netloc}/{ad_id}" if ad_id else None
+
+    def claim_listing_urls(self, urls: List[str], limit: Optional[int] = None) -> List[str]:
+        """Garde les annonces pas encore réservées (au plus limit) et les réserve ; URLs sans ID gardées"""
+        kept = []
+        with self._lock:
+            for url in urls:
+                if limit is not None and len(kept) >= limit:
+                    break
+                ref = self._ref(url)
+                if ref is None:
+                    kept.append(url)
+                    continue
+                if ref in self._claimed and ref not in self._released:
+                    self.stats['skipped'] += 1
+                    continue
+                self._released.discard(ref)
+                self._claimed.add(ref)
+                self.stats['claimed'] += 1
+                kept.append(url)
+        return kept
+
+    def release(self, url: str):
+        """Annonce réservée mais pas obtenue (échec) : une autre catégorie pourra la prendre"""
+        ref = self._ref(url)
+        if ref is None:
+            return
+        with self._lock:
+            if ref in self._claimed and ref not in self._released:
+                self._released.add(ref)
+                self.stats['claimed'] -= 1
+
+    def _bands(self, value: int) -> List[int]:
+        mask = (1 << self.band_bits) - 1
+        return [(value >> (band * self.band_bits)) & mask for band in range(self.bands)]
+
+    def check(self, listing: Dict) -> Optional[Dict]:
+        """Enregistre l'empreinte d'une annonce ; {'url', 'distance'} de l'originale si c'est un repost"""
+        if self.near == '0':
+            return None
+        url = listing.get('url', '')
+        ad_id = listing.get('id') or listing_id(url)
+        features = listing_features(listing)
+        if not ad_id or not features:
+            return None
+
+        domain = urlsplit(url).netloc
+        value = simhash(features)
+        block = block_key(listing)
+        bands = self._bands(value)
+        with self._lock:
+            row = self._db.execute(
+                'SELECT original_url FROM fingerprints WHERE domain = ? AND listing_id = ?', (domain, ad_id)
+            ).fetchone()
+            if row is not None:
+                # Annonce revue (autre crawl) : même verdict que la première fois
+                if row[0] == url:
+                    return None
+                self.stats['near_duplicates'] += 1
+                self.clusters[row[0]].append(url)
+                return {'url': row[0], 'distance': None}
+
+            where = ' OR '.join('(b.band = ? AND b.value = ?)' for _ in bands)
+            candidates = self._db.execute(
+                f'SELECT DISTINCT f.simhash, f.original_url FROM fingerprint_bands b '
+                f'JOIN fingerprints f ON f.domain = b.domain AND f.listing_id = b.listing_id '
+                f'WHERE b.block = ? AND ({where})',
+                (block, *(v for band, band_value in enumerate(bands) for v in (band, band_value)))
+            ).fetchall()
+            original = None
+            for other, original_url in candidates:
+                distance = bin((value ^ other) & (1 << 64) - 1).count('1')
+                if distance <= self.max_distance and (original is None or distance < original['distance']):
+                    original = {'url': original_url, 'distance': distance}
+
+            self._db.execute(
+                'INSERT INTO fingerprints VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (domain, ad_id, url, _signed(value), block, original['url'] if original else url, time.time())
+            )
+            self._db.executemany(
+                'INSERT INTO fingerprint_bands VALUES (?, ?, ?, ?, ?)',
+                [(band, band_value, block, domain, ad_id) for band, band_value in enumerate(bands)]
+            )
+            self._db.commit()
+            if original:
+                self.stats['near_duplicates'] += 1
+                self.clusters[original['url']].append(url)
+        return original
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return dict(self.stats, clusters=len(self.clusters))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,240 @@
+"""
+Découverte des annonces par les plans de site et les flux, avant la pagination HTML.
+
+    robots.txt        lignes "Sitemap: ..." du site
+    sitemap index     liste de sitemaps (suivis dans la limite de DISCOVERY_MAX_DOCUMENTS par site)
+    sitemap           <urlset> : URLs d'annonces et <lastmod>, gzippé (.xml.gz) ou non
+    flux RSS / Atom   <link rel="alternate"> de la page d'accueil : items / entries et leur date
+
+Les documents sont parsés en flux (iterparse) : un sitemap de 50 000 URLs ne devient jamais un arbre.
+Une catégorie reçoit les annonces d'un document dont le nom contient son slug (sitemap_immobilier.xml.gz,
+/immobilier/rss) ou dont le chemin est sous le sien (/immobilier/ID_123/...). Sans document pour elle,
+la catégorie est parcourue page par page comme avant. Les annonces qui ne relèvent d'aucune catégorie
+forment une pseudo-catégorie "Plan du site" (au plus DISCOVERY_MAX_URLS, les plus récentes d'abord).
+"""
+import gzip
+import io
+import logging
+import os
+import re
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+
+from seen_index import listing_id
+
+logger = logging.getLogger(__name__)
+
+GZIP_MAGIC = b'\x1f\x8b'
+FEED_TYPES = ('application/rss+xml', 'application/atom+xml')
+# Au-delà, les sitemaps suivants ne sont plus lus (mémoire bornée)
+MAX_ENTRIES = 500_000
+
+
+def _local(tag: str) -> str:
+    """Nom d'une balise sans son espace de noms"""
+    return tag.rsplit('}', 1)[-1]
+
+
+def _child(elem, name: str):
+    return next((child for child in elem if _local(child.tag) == name), None)
+
+
+def _child_text(elem, name: str) -> str:
+    child = _child(elem, name)
+    return (child.text or '').strip() if child is not None else ''
+
+
+def _timestamp(text: str) -> str:
+    """Date W3C (sitemap, Atom) ou RFC 822 (RSS) → ISO UTC triable ('' si absente ou illisible)"""
+    if not text:
+        return ''
+    try:
+        date = datetime.fromisoformat(text.replace('Z', '+00:00'))
+    except ValueError:
+        try:
+            date = parsedate_to_datetime(text)
+        except (TypeError, ValueError):
+            return ''
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return date.astimezone(timezone.utc).isoformat()
+
+
+def _prefix(url: str) -> str:
+    """Chemin avant le segment /ID_ d'une URL d'annonce ('' pour /ID_123/slug.html)"""
+    path = urlsplit(url).path
+    return path[:path.find('/ID_')] if '/ID_' in path else ''
+
+
+def parse_robots(content: bytes, robots_url: str) -> List[str]:
+    """Sitemaps déclarés dans un robots.txt"""
+    sitemaps = []
+    for line in content.decode('utf-8', errors='replace').splitlines():
+        key, _, value = line.partition(':')
+        if key.strip().lower() == 'sitemap' and value.strip():
+            sitemaps.append(urljoin(robots_url, value.strip()))
+    return sitemaps
+
+
+def parse_xml_document(content: bytes) -> Tuple[str, List[str], List[Tuple[str, str]]]:
+    """
+    Sitemap, sitemap index ou flux, en flux : (type, sitemaps enfants, [(URL, date)]).
+
+    Le document peut être gzippé (sitemap .xml.gz servi sans Content-Encoding).
+    """
+    stream = io.BytesIO(content)
+    if content[:2] == GZIP_MAGIC:
+        stream = gzip.GzipFile(fileobj=stream)
+
+    kind = None
+    children: List[str] = []
+    entries: List[Tuple[str, str]] = []
+    # Éléments ouverts : le parent d'un élément terminé est le dernier
+    stack = []
+    try:
+        for event, elem in ET.iterparse(stream, events=('start', 'end')):
+            tag = _local(elem.tag)
+            if event == 'start':
+                kind = kind or tag
+                stack.append(elem)
+                continue
+            stack.pop()
+
+            if kind == 'sitemapindex' and tag == 'sitemap':
+                loc = _child_text(elem, 'loc')
+                if loc:
+                    children.append(loc)
+            elif kind == 'urlset' and tag == 'url':
+                entries.append((_child_text(elem, 'loc'), _timestamp(_child_text(elem, 'lastmod'))))
+            elif kind == 'rss' and tag == 'item':
+                entries.append((_child_text(elem, 'link'), _timestamp(_child_text(elem, 'pubDate'))))
+            elif kind == 'feed' and tag == 'entry':
+                link = _child(elem, 'link')
+                href = link.get('href', '') if link is not None else ''
+                entries.append((href, _timestamp(_child_text(elem, 'updated') or _child_text(elem, 'published'))))
+            else:
+                continue
+            # Élément traité : détaché de son parent, l'arbre ne grossit pas
+            if stack:
+                stack[-1].remove(elem)
+    except (ET.ParseError, OSError, EOFError) as e:
+        # Document tronqué ou invalide : ce qui a été lu est gardé
+        logger.warning(f"         ⚠️ Document illisible ({e}), {len(entries)} entrées gardées")
+
+    return kind or '', children, entries
+
+
+class ListingDiscovery:
+    """
+    Annonces connues par les sitemaps et flux de chaque site, regroupées par document source.
+
+    start() donne les premiers documents à télécharger (robots.txt, flux de la page d'accueil),
+    add_document() parse un document téléchargé et renvoie les suivants ; le téléchargement reste
+    au scraper (proxy, nouvelles tentatives, cache HTTP), synchrone ou asynchrone.
+    """
+
+    def __init__(self, max_documents: int = 50, max_urls: int = 1000):
+        self.max_documents = max_documents
+        self.max_urls = max_urls
+        self.stats = {'documents': 0, 'listing_urls': 0, 'categories': 0}
+        # Domaine → (document, chemin avant /ID_) → [(date, URL)]
+        self._groups: Dict[str, Dict[Tuple[str, str], List[Tuple[str, str]]]] = {}
+        self._ids: Dict[str, set] = {}
+        self._budget: Dict[str, int] = {}
+        self._feeds: Dict[str, List[str]] = {}
+
+    @classmethod
+    def from_env(cls) -> Optional['ListingDiscovery']:
+        """Découverte configurée par DISCOVERY (auto / pages) / DISCOVERY_MAX_DOCUMENTS / DISCOVERY_MAX_URLS"""
+        if os.getenv('DISCOVERY', 'auto') != 'auto':
+            return None
+        return cls(
+            max_documents=int(os.getenv('DISCOVERY_MAX_DOCUMENTS', 50)),
+            max_urls=int(os.getenv('DISCOVERY_MAX_URLS', 1000))
+        )
+
+    def add_feed_links(self, site_url: str, soup):
+        """Flux déclarés par la page d'accueil (<link rel="alternate" type="application/rss+xml">)"""
+        feeds = self._feeds.setdefault(urlsplit(site_url).netloc, [])
+        for link in soup.find_all('link', href=True):
+            if (link.get('type') or '').lower() in FEED_TYPES and urljoin(site_url, link['href']) not in feeds:
+                feeds.append(urljoin(site_url, link['href']))
+
+    def start(self, site_url: str) -> List[str]:
+        """Documents à lire en premier pour un site ([] s'il a déjà été exploré)"""
+        parts = urlsplit(site_url)
+        if parts.netloc in self._groups:
+            return []
+        self._groups[parts.netloc] = {}
+        self._ids[parts.netloc] = set()
+        self._budget[parts.netloc] = self.max_documents
+        return self._take(parts.netloc, [f"{parts.scheme}://{parts.netloc}/robots.txt"] + self._feeds.get(parts.netloc, []))
+
+    def _take(self, host: str, urls: List[str]) -> List[str]:
+        """Documents à télécharger, dans la limite du budget du site"""
+        urls = urls[:max(self._budget[host], 0)]
+        self._budget[host] -= len(urls)
+        return urls
+
+    def add_document(self, site_url: str, url: str, content: bytes) -> List[str]:
+        """Parse un document téléchargé pour un site, renvoie les documents à télécharger ensuite"""
+        host = urlsplit(site_url).netloc
+        self.stats['documents'] += 1
+        if urlsplit(url).path == '/robots.txt':
+            sitemaps = parse_robots(content, url)
+            logger.debug(f"         🗺️  robots.txt: {len(sitemaps)} sitemaps")
+            return self._take(host, sitemaps)
+
+        kind, children, entries = parse_xml_document(content)
+        groups, ids = self._groups[host], self._ids[host]
+        total = sum(len(ids) for ids in self._ids.values())
+        added = 0
+        for loc, date in entries:
+            ad_id = listing_id(loc)
+            if not ad_id or urlsplit(loc).netloc != host or ad_id in ids or total + added >= MAX_ENTRIES:
+                continue
+            ids.add(ad_id)
+            groups.setdefault((url, _prefix(loc)), []).append((date, loc))
+            added += 1
+        self.stats['listing_urls'] += added
+        logger.debug(f"         🗺️  {kind or 'document'} {url}: {len(children)} sitemaps, {added} annonces")
+        return self._take(host, children) if total + added < MAX_ENTRIES else []
+
+    @staticmethod
+    def _matches(category_url: str, document: str, prefix: str) -> bool:
+        path = urlsplit(category_url).path.rstrip('/')
+        slug = path.rsplit('/', 1)[-1].lower()
+        if not slug:
+            return False
+        if prefix == path or prefix.startswith(path + '/'):
+            return True
+        return re.search(rf'(^|[^a-z0-9]){re.escape(slug)}([^a-z0-9]|$)', urlsplit(document).path.lower()) is not None
+
+    @staticmethod
+    def _newest_first(entries: List[Tuple[str, str]]) -> List[str]:
+        return [url for _, url in sorted(entries, key=lambda entry: entry[0], reverse=True)]
+
+    def listing_urls(self, category_url: str) -> Optional[List[str]]:
+        """Annonces d'une catégorie (les plus récentes d'abord), None si aucun document ne la couvre"""
+        groups = self._groups.get(urlsplit(category_url).netloc, {})
+        entries = [
+            entry for (document, prefix), group in groups.items()
+            if self._matches(category_url, document, prefix) for entry in group
+        ]
+        if not entries:
+            return None
+        self.stats['categories'] += 1
+        return self._newest_first(entries)
+
+    def unassigned_urls(self, site_url: str, category_urls: List[str]) -> List[str]:
+        """Annonces qui ne relèvent d'aucune des catégories (au plus max_urls, les plus récentes d'abord)"""
+        groups = self._groups.get(urlsplit(site_url).netloc, {})
+        entries = [
+            entry for (document, prefix), group in groups.items()
+            if not any(self._matches(category_url, document, prefix) for category_url in category_urls)
+            for entry in group
+        ]
+        return self._newest_first(entries)[:self.max_urls]
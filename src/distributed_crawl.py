@@ -0,0 +1,429 @@
+"""
+Crawl distribué : un coordinateur remplit une file de travail partagée, des workers sans état
+la vident. Le débit augmente en ajoutant des workers (conteneurs, machines).
+
+    python src/distributed_crawl.py coordinator   # enfile les pays, attend, fusionne les résultats
+    python src/distributed_crawl.py worker        # traite les jobs jusqu'à ce que la file soit vide
+
+Trois files, traitées en profondeur d'abord (annonces, puis catégories, puis sites) :
+
+    sites       page d'accueil d'un pays → jobs catégories
+    categories  pages d'index d'une catégorie → jobs annonces
+    listings    page d'annonce → ligne NDJSON dans <output_dir>/work/<pays>/<worker>.ndjson
+
+Un job annonce n'est acquitté qu'après le fsync de sa ligne. Un worker arrêté ou planté
+ne perd rien : ses jobs non acquittés sont redistribués à l'expiration de leur bail.
+Le débit par domaine (HOST_RATE, RATE_MAX) est celui de l'ensemble des workers : chacun en a
+une part (WORKERS).
+"""
+import json
+import logging
+import os
+import socket
+import sys
+import time
+from datetime import datetime
+from glob import glob
+from typing import Dict, List
+from urllib.parse import urlsplit
+from dotenv import load_dotenv
+from proxy_manager import ProxyManager
+from locanto_scraper_final import LocantoScraperFinal
+from http_cache import ResponseCache
+from discovery import ListingDiscovery
+from metrics import Metrics
+from rate_limiter import AdaptiveRateLimiter
+from retry_policy import DeadLetterFile
+from log_setup import SUMMARY, log_context, setup_logging
+from listing_stream import CATEGORY_KEY, ListingStreamWriter, iter_listings, write_json_atomic
+from listing_store import ListingStore
+from scrape_all_countries import country_key, filter_countries, get_all_country_domains
+from scrape_full_country import load_config
+from work_queue import Job, queue_from_env
+
+QUEUES = ['listings', 'categories', 'sites']
+
+OUTPUT_DIR = '/app/data/distributed'
+
+logger = logging.getLogger(__name__)
+
+
+def work_dir(output_dir: str, country: str) -> str:
+    return os.path.join(output_dir, 'work', country)
+
+
+class CrawlWorker:
+    """Worker sans état : réserve un job, le traite, l'acquitte"""
+
+    def __init__(self, queue, scraper: LocantoScraperFinal, output_dir: str,
+                 flush_every: int = 100, idle_timeout: float = 120):
+        self.queue = queue
+        self.scraper = scraper
+        self.output_dir = output_dir
+        self.flush_every = flush_every
+        self.idle_timeout = idle_timeout
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}"
+        self.stats = {'sites': 0, 'categories': 0, 'listings': 0, 'failed': 0}
+        self._writers: Dict[str, ListingStreamWriter] = {}
+        self._unacked: Dict[str, List[Job]] = {}
+        self._oldest_unacked = None
+
+    def _writer(self, country: str) -> ListingStreamWriter:
+        writer = self._writers.get(country)
+        if writer and not os.path.exists(writer.paths['listings']):
+            # Fichier pris par la fusion du coordinateur : la suite va dans un nouveau fichier
+            writer.close()
+            del self._writers[country]
+        if country not in self._writers:
+            os.makedirs(work_dir(self.output_dir, country), exist_ok=True)
+            self._unacked[country] = []
+            self._writers[country] = ListingStreamWriter(
+                os.path.join(work_dir(self.output_dir, country), self.worker_id),
+                flush_every=self.flush_every,
+                on_sync=lambda: self._ack_written(country)
+            )
+        return self._writers[country]
+
+    def _ack_written(self, country: str):
+        """Annonces sur disque : leurs jobs peuvent être acquittés"""
+        jobs, self._unacked[country] = self._unacked[country], []
+        if jobs:
+            self.queue.ack(jobs)
+        if not any(self._unacked.values()):
+            self._oldest_unacked = None
+
+    def sync(self):
+        for writer in self._writers.values():
+            writer.sync()
+
+    def handle_site(self, job: Job):
+        payload = job.payload
+        categories = self.scraper.get_categories(payload['site_url'])
+        if not categories:
+            self.queue.fail(job, "aucune catégorie trouvée")
+            return
+
+        categories = categories[:payload['max_categories']]
+        # Noms des catégories pour la fusion (les jobs disparaissent une fois acquittés)
+        os.makedirs(work_dir(self.output_dir, payload['country']), exist_ok=True)
+        write_json_atomic(
+            {'site_url': payload['site_url'], 'categories': [{'name': c['name'], 'url': c['url']} for c in categories]},
+            os.path.join(work_dir(self.output_dir, payload['country']), 'categories.json')
+        )
+        self.queue.put('categories', [
+            (category['url'], {
+                'country': payload['country'],
+                'url': category['url'],
+                'max_pages': payload['max_pages'],
+                'max_listings': payload['max_listings']
+            })
+            for category in categories
+        ])
+        self.queue.ack([job])
+        self.stats['sites'] += 1
+
+    def handle_category(self, job: Job):
+        payload = job.payload
+        listing_urls, skipped = self.scraper.walk_category(payload['url'], max_pages=payload['max_pages'])
+        # Annonces des pages lues enfilées dans tous les cas (un job déjà présent n'est pas dupliqué)
+        self.queue.put('listings', [
+            (url, {'country': payload['country'], 'url': url, 'category_url': payload['url']})
+            for url in listing_urls[:payload['max_listings']]
+        ])
+        if skipped:
+            # Pages en échec (notées dans le dead-letter) : la catégorie sera reparcourue
+            self.stats['failed'] += 1
+            retry = self.queue.fail(job, f"pages d'index en échec: {', '.join(map(str, skipped))}")
+            logger.warning(f"      ⚠️ {payload['url']}: {len(skipped)} pages en échec ({'remise en file' if retry else 'abandonnée'})")
+            return
+        self.queue.ack([job])
+        self.stats['categories'] += 1
+
+    def _ack_after_sync(self, country: str, job: Job):
+        self._unacked[country].append(job)
+        if self._oldest_unacked is None:
+            self._oldest_unacked = time.time()
+
+    def handle_listing(self, job: Job):
+        payload = job.payload
+        writer = self._writer(payload['country'])
+        if payload['url'] in self.scraper.visited_urls:
+            # Job redistribué (bail expiré) déjà traité par ce worker : sa ligne est écrite
+            self._ack_after_sync(payload['country'], job)
+            return
+
+        details = self.scraper.get_listing_details(payload['url'])
+        if not details:
+            self.stats['failed'] += 1
+            self.queue.fail(job, "échec du téléchargement")
+            return
+
+        self._ack_after_sync(payload['country'], job)
+        writer.write_listing(details, payload['category_url'])
+        self.stats['listings'] += 1
+
+    def run(self):
+        handlers = {'sites': self.handle_site, 'categories': self.handle_category, 'listings': self.handle_listing}
+        idle_since = None
+
+        try:
+            while True:
+                # Acquitter avant l'expiration des baux des annonces en attente de fsync
+                if self._oldest_unacked and time.time() - self._oldest_unacked > self.queue.lease_seconds / 3:
+                    self.sync()
+
+                job = self.queue.lease(QUEUES)
+                if job is None:
+                    self.sync()
+                    idle_since = idle_since or time.time()
+                    if self.idle_timeout and time.time() - idle_since > self.idle_timeout:
+                        logger.info(f"\n💤 File vide depuis {self.idle_timeout:.0f}s, arrêt du worker")
+                        break
+                    time.sleep(2)
+                    continue
+                idle_since = None
+
+                try:
+                    with log_context(country=job.payload['country']):
+                        handlers[job.queue](job)
+                except Exception as e:
+                    self.stats['failed'] += 1
+                    retry = self.queue.fail(job, str(e)[:200])
+                    logger.error(f"      ❌ {job.queue} {job.id}: {str(e)[:60]} ({'remis en file' if retry else 'abandonné'})")
+
+        except KeyboardInterrupt:
+            logger.warning(f"\n\n⚠️ Interruption : les jobs en cours seront redistribués à l'expiration de leur bail")
+        finally:
+            for writer in self._writers.values():
+                writer.close()
+
+        return self.stats
+
+
+def queue_counts(queue) -> Dict[str, Dict[str, int]]:
+    return {name: queue.counts(name) for name in QUEUES}
+
+
+def merge_country(output_dir: str, country: str, timestamp: str, config: dict) -> Dict:
+    """
+    Fusionne les fichiers des workers d'un pays dans <output_dir>/<pays>_<date>.ndjson (+ .meta.json),
+    au même format que scrape_full_country.py. Une annonce traitée deux fois n'est gardée qu'une fois.
+
+    À appeler une fois tous les jobs acquittés. Les fichiers sont d'abord renommés (.merging) :
+    un worker encore actif n'écrit plus dans un fichier supprimé, il en ouvre un nouveau.
+    """
+    directory = work_dir(output_dir, country)
+    info = {'site_url': None, 'categories': []}
+    if os.path.exists(os.path.join(directory, 'categories.json')):
+        with open(os.path.join(directory, 'categories.json'), encoding='utf-8') as f:
+            info = json.load(f)
+
+    base = f"{output_dir}/{country}_{timestamp}"
+    counts: Dict[str, int] = {}
+    seen_urls = set()
+    for path in glob(os.path.join(directory, '*.ndjson')):
+        os.replace(path, f"{path}.merging")
+    # Fichiers renommés par une fusion interrompue compris
+    worker_files = sorted(glob(os.path.join(directory, '*.ndjson.merging')))
+    # Base SQLite (LISTING_DB) alimentée à la fusion : les workers n'y écrivent pas
+    store = ListingStore.from_env(urlsplit(info['site_url']).netloc) if info['site_url'] else None
+
+    with ListingStreamWriter(base, flush_every=10_000, store=store, ndjson=config['ndjson']) as writer:
+        for path in worker_files:
+            for listing in iter_listings(path):
+                if listing.get('url') in seen_urls:
+                    continue
+                seen_urls.add(listing.get('url'))
+                category_url = listing.pop(CATEGORY_KEY, None)
+                counts[category_url] = counts.get(category_url, 0) + 1
+                writer.write_listing(listing, category_url)
+
+        categories = [
+            {'name': c['name'], 'url': c['url'], 'listings_scraped': counts.get(c['url'], 0)}
+            for c in info['categories']
+        ]
+        result = {
+            'site_url': info['site_url'],
+            'country': country,
+            'scraped_at': datetime.now().isoformat(),
+            'config': config,
+            'categories': categories,
+            'stats': {
+                'total_categories': len(categories),
+                'total_listings': len(seen_urls),
+                'errors': 0
+            },
+            'output_base': base,
+            'listings_file': os.path.basename(writer.paths['listings']) if writer.ndjson else None
+        }
+        if store:
+            result['stats']['store'] = store.stats
+        writer.write_meta(result)
+
+    # Fichiers intermédiaires fusionnés : un prochain crawl repart de zéro
+    for path in worker_files + glob(os.path.join(directory, 'categories.json')):
+        os.remove(path)
+
+    return result
+
+
+def coordinator():
+    logger.log(SUMMARY, "="*70)
+    logger.log(SUMMARY, "🕷️  LOCANTO SCRAPER - CRAWL DISTRIBUÉ - COORDINATEUR")
+    logger.log(SUMMARY, "="*70)
+
+    proxy_manager = ProxyManager()
+    if not proxy_manager.test_proxy():
+        return 1
+
+    config = load_config()
+    queue = queue_from_env()
+    output_dir = OUTPUT_DIR
+    os.makedirs(output_dir, exist_ok=True)
+
+    logger.log(SUMMARY, f"\n⚙️  CONFIGURATION")
+    logger.log(SUMMARY, f"   File de travail: {type(queue).__name__} (bail {queue.lease_seconds}s, {queue.max_attempts} tentatives)")
+    logger.log(SUMMARY, f"   Catégories max: {config['max_categories'] if config['max_categories'] < 999 else 'TOUTES'}")
+    logger.log(SUMMARY, f"   Annonces/catégorie: {config['max_listings']}")
+    logger.log(SUMMARY, f"   Pages/catégorie: {config['max_pages']}")
+
+    # Pays : SITE_URL pour un seul site, sinon tous les pays de locanto.info
+    site_url = os.getenv('SITE_URL')
+    if site_url:
+        domain = site_url.split('//')[1].split('/')[0]
+        countries = [{'name': domain, 'domain': domain, 'url': site_url}]
+    else:
+        countries = get_all_country_domains(proxy_manager)
+        countries = filter_countries(countries, os.getenv('TARGET_COUNTRIES', ''), os.getenv('SKIP_COUNTRIES', ''))
+
+    if not countries:
+        logger.error("\n❌ Aucun pays trouvé")
+        return 1
+
+    # RESUME=1 : les jobs déjà terminés d'un crawl interrompu ne sont pas ré-enfilés
+    # (la file d'un crawl mené jusqu'à la fusion est vidée, le suivant repart de zéro)
+    if os.getenv('RESUME', '1') != '1':
+        for name in QUEUES:
+            queue.clear(name)
+
+    added = queue.put('sites', [
+        (country['url'], {
+            'country': country_key(country['domain']),
+            'site_url': country['url'],
+            'max_categories': config['max_categories'],
+            'max_pages': config['max_pages'],
+            'max_listings': config['max_listings']
+        })
+        for country in countries
+    ])
+    logger.log(SUMMARY, f"\n📥 {added} pays ajoutés à la file ({len(countries) - added} déjà présents)")
+    logger.log(SUMMARY, f"   Lancer des workers : python src/distributed_crawl.py worker")
+
+    # Attente : la file est vide quand plus aucun job n'est prêt ni en cours
+    start_time = time.time()
+    try:
+        while True:
+            counts = queue_counts(queue)
+            logger.info(f"   ⏳ " + " | ".join(
+                f"{name}: {c['done']} faits, {c['leased']} en cours, {c['ready']} en attente, {c['failed']} abandonnés"
+                for name, c in counts.items()
+            ))
+            if not any(c['ready'] + c['leased'] for c in counts.values()):
+                break
+            time.sleep(10)
+    except KeyboardInterrupt:
+        logger.warning(f"\n\n⚠️ Interruption : les workers continuent, relancer le coordinateur pour fusionner")
+        return 1
+
+    # Fusion des résultats des workers, par pays
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    results = []
+    for country in countries:
+        code = country_key(country['domain'])
+        if not os.path.isdir(work_dir(output_dir, code)):
+            continue
+        result = merge_country(output_dir, code, timestamp, config)
+        results.append({
+            'country': country['name'],
+            'domain': country['domain'],
+            'listings': result['stats']['total_listings'],
+            'categories': result['stats']['total_categories'],
+            'filename': f"{result['output_base']}.ndjson"
+        })
+        logger.log(SUMMARY, f"\n✅ {country['name']}: {result['stats']['total_listings']} annonces → {result['output_base']}.ndjson")
+
+    duration = time.time() - start_time
+    failed = {name: queue.failed(name) for name in QUEUES}
+    report_file = f"{output_dir}/distributed_report_{timestamp}.json"
+    write_json_atomic({
+        'duration_seconds': duration,
+        'config': config,
+        'queues': queue_counts(queue),
+        'countries': results,
+        'failed_jobs': failed
+    }, report_file)
+    # Crawl fusionné : jobs terminés et abandonnés sont dans le rapport, la file est vidée
+    for name in QUEUES:
+        queue.clear(name)
+    queue.close()
+
+    total_failed = sum(len(jobs) for jobs in failed.values())
+    logger.log(SUMMARY, f"\n{'='*70}")
+    logger.log(SUMMARY, f"🎉 CRAWL DISTRIBUÉ TERMINÉ")
+    logger.log(SUMMARY, "="*70)
+    logger.log(SUMMARY, f"   • Durée: {duration/60:.1f} minutes")
+    logger.log(SUMMARY, f"   • Annonces: {sum(r['listings'] for r in results)}")
+    logger.log(SUMMARY, f"   • Jobs abandonnés: {total_failed}")
+    logger.log(SUMMARY, f"\n💾 Rapport: {report_file}")
+    return 0
+
+
+def worker():
+    logger.log(SUMMARY, "="*70)
+    logger.log(SUMMARY, "🕷️  LOCANTO SCRAPER - CRAWL DISTRIBUÉ - WORKER")
+    logger.log(SUMMARY, "="*70)
+
+    config = load_config()
+    queue = queue_from_env()
+    workers = int(os.getenv('WORKERS', 1))  # Workers lancés (--scale) : débit par domaine partagé entre eux
+    # Dead-letter partagé : les échecs définitifs des workers y sont notés comme ceux de scrape_full_country.py
+    scraper = LocantoScraperFinal(ProxyManager(), extractor=config['extractor'], cache=ResponseCache.from_env(),
+                                  discovery=ListingDiscovery.from_env(), dead_letter=DeadLetterFile.from_env(),
+                                  rate_limiter=AdaptiveRateLimiter.from_env(share=workers),
+                                  page_workers=config['per_host_concurrency'])
+    crawl_worker = CrawlWorker(
+        queue,
+        scraper,
+        OUTPUT_DIR,
+        flush_every=config['flush_every'],
+        idle_timeout=float(os.getenv('WORKER_IDLE_TIMEOUT', 120))  # Secondes de file vide avant arrêt (0 = jamais)
+    )
+    logger.log(SUMMARY, f"\n👷 Worker {crawl_worker.worker_id} ({type(queue).__name__}, "
+               f"débit de départ {scraper.rate_limiter.initial_rate:.2f} req/s par domaine, 1/{workers} du total)")
+    Metrics.shared().export_from_env()
+
+    with log_context(worker=crawl_worker.worker_id):
+        stats = crawl_worker.run()
+    queue.close()
+    if scraper.cache:
+        scraper.cache.close()
+    Metrics.shared().flush()
+
+    logger.log(SUMMARY, f"\n📊 {stats['sites']} pays, {stats['categories']} catégories, "
+               f"{stats['listings']} annonces, {stats['failed']} échecs")
+    return 0
+
+
+def main():
+    load_dotenv()
+    setup_logging()
+
+    roles = {'coordinator': coordinator, 'worker': worker}
+    if len(sys.argv) != 2 or sys.argv[1] not in roles:
+        print(__doc__)
+        return 1
+    return roles[sys.argv[1]]()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,278 @@
+import re
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterator, Optional
+
+from bs4 import BeautifulSoup
+from bs4.dammit import EncodingDetector
+from lxml import etree
+
+from price_parser import parse_price
+
+def parse_relative_date(date_text: str) -> str:
+    """Convertit dates relatives en dates réelles"""
+    if not date_text:
+        return None
+
+    date_text_lower = date_text.lower()
+    today = datetime.now()
+
+    # Français
+    if 'aujourd\'hui' in date_text_lower or 'today' in date_text_lower:
+        return today.strftime('%Y-%m-%d')
+
+    if 'hier' in date_text_lower or 'yesterday' in date_text_lower:
+        return (today - timedelta(days=1)).strftime('%Y-%m-%d')
+
+    # "il y a X jours" / "X days ago"
+    days_match = re.search(r'(\d+)\s*(jour|day)', date_text_lower)
+    if days_match:
+        days = int(days_match.group(1))
+        return (today - timedelta(days=days)).strftime('%Y-%m-%d')
+
+    # "il y a X semaines" / "X weeks ago"
+    weeks_match = re.search(r'(\d+)\s*(semaine|week)', date_text_lower)
+    if weeks_match:
+        weeks = int(weeks_match.group(1))
+        return (today - timedelta(weeks=weeks)).strftime('%Y-%m-%d')
+
+    # "moins d'une semaine" / "less than a week"
+    if 'moins d\'une semaine' in date_text_lower or 'less than a week' in date_text_lower:
+        return (today - timedelta(days=3)).strftime('%Y-%m-%d')
+
+    # "il y a un mois" / "a month ago"
+    if 'mois' in date_text_lower or 'month' in date_text_lower:
+        return (today - timedelta(days=30)).strftime('%Y-%m-%d')
+
+    # Sinon retourner le texte original
+    return date_text
+
+def clean_city(text: str) -> str:
+    """Nettoie le texte de localisation"""
+    if not text:
+        return None
+
+    # Supprimer coordonnées GPS du début
+    text = re.sub(r'^[\d\.\-\s]+', '', text)
+    text = text.strip(',').strip()
+
+    return text if text else None
+
+def build_listing(listing_url: str, fields: Dict) -> Dict:
+    """
+    Construit le dict de l'annonce à partir des textes bruts trouvés dans la page.
+
+    Partagé par tous les backends d'extraction : seul le repérage des éléments
+    diffère, le post-traitement est identique.
+    """
+    # ID
+    id_match = re.search(r'ID_(\d+)', listing_url)
+    listing_id = id_match.group(1) if id_match else None
+
+    # Titre
+    title = fields['title']
+
+    # Description - CORRECTION MAJEURE
+    description = None
+    if fields['description'] is not None:
+        # Prendre tout le texte sauf les éléments de prix
+        desc_text = fields['description']
+        # Supprimer le prix s'il est dans la description
+        desc_text = re.sub(r'\d+[\s,.]?\d*\s*(FCFA|CFA|Taka|BDT|Cedi|GHS|USD|EUR|\$|€)', '', desc_text)
+        description = desc_text.strip()
+
+    # Prix - CORRECTION MAJEURE avec séparateurs
+    all_text = ' '.join(fields['price_texts'])
+    price_data = parse_price(all_text)
+
+    # Images
+    images = []
+    for src_attr, srcset_attr in fields['images']:
+        src = src_attr or (srcset_attr or '').split()[0]
+        if src and 'images.locanto' in src:
+            clean_src = src.split()[0] if ' ' in src else src
+            if clean_src not in images:
+                images.append(clean_src)
+
+    # Contact - téléphone
+    phone = None
+    phone_text = fields['phone']
+    if phone_text is not None:
+        if re.search(r'\d{3,}', phone_text) and len(phone_text) < 50:
+            phone = phone_text
+
+    # Localisation - nettoyée
+    city = clean_city(fields['city'])
+
+    # Date - CORRECTION MAJEURE
+    date_posted = None
+    text = fields['posted']
+    if text is not None:
+        if 'Publié' in text or 'Posted' in text:
+            date_text = text.replace('Publiée: ', '').replace('Posted: ', '')
+            date_posted = parse_relative_date(date_text)
+
+    return {
+        'id': listing_id,
+        'url': listing_url,
+        'title': title,
+        'price': price_data['price'],
+        'currency': price_data['currency'],
+        'description': description,
+        'images': images,
+        'mainImage': images[0] if images else None,
+        'contact': {
+            'username': fields['username'],
+            'phone': phone
+        },
+        'location': {
+            'city': city,
+            'latitude': fields['latitude'],
+            'longitude': fields['longitude']
+        },
+        'category': fields['category'],
+        'datePosted': date_posted,
+        'scrapedAt': datetime.now().isoformat()
+    }
+
+# --- Backend BeautifulSoup (référence) ---
+
+def _bs4_text(soup: BeautifulSoup, selector: str) -> Optional[str]:
+    elem = soup.select_one(selector)
+    return elem.get_text(strip=True) if elem else None
+
+def extract_listing(soup: BeautifulSoup, listing_url: str) -> Dict:
+    """Extrait les champs d'une page d'annonce (lève une exception si la page est inexploitable)"""
+    price_sources = [
+        soup.select_one('.simple__description'),
+        soup.select_one('.simple__price'),
+        soup.select_one('[class*="price"]')
+    ]
+    breadcrumb = soup.select('.breadcrumb__link')
+
+    fields = {
+        'title': _bs4_text(soup, 'h1.h1__title, h1'),
+        'description': _bs4_text(soup, '.simple__description'),
+        'price_texts': [elem.get_text() for elem in price_sources if elem],
+        'images': [(img.get('src'), img.get('srcset')) for img in soup.select('.user_images__img, img[alt*="Image"]')],
+        'phone': _bs4_text(soup, '.button__element_label.js-button_element_label'),
+        'username': _bs4_text(soup, '.userprofile__nickname_label'),
+        'city': _bs4_text(soup, '[itemprop="addressLocality"]'),
+        'latitude': _bs4_text(soup, '[itemprop="latitude"]'),
+        'longitude': _bs4_text(soup, '[itemprop="longitude"]'),
+        'posted': _bs4_text(soup, '.list__element_label'),
+        'category': breadcrumb[-1].get_text(strip=True) if breadcrumb else None
+    }
+
+    return build_listing(listing_url, fields)
+
+def extract_listing_from_html(content: bytes, listing_url: str) -> Dict:
+    """
+    Parse le HTML brut puis extrait l'annonce.
+
+    Fonction de module (picklable) : c'est elle qui tourne dans les workers de ParsePool,
+    seul le dict de l'annonce repasse au processus principal.
+    """
+    return extract_listing(BeautifulSoup(content, 'lxml'), listing_url)
+
+# --- Backend lxml (chemin rapide, sans arbre BeautifulSoup) ---
+
+def _has_class(name: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+# Mêmes sélecteurs que le backend BeautifulSoup, traduits et compilés une seule fois
+_XPATH_FIRST = {
+    'title': etree.XPath('(//h1)[1]'),
+    'description': etree.XPath(f"(//*[{_has_class('simple__description')}])[1]"),
+    'price': etree.XPath(f"(//*[{_has_class('simple__price')}])[1]"),
+    'price_any': etree.XPath("(//*[contains(@class, 'price')])[1]"),
+    'phone': etree.XPath(f"(//*[{_has_class('button__element_label')} and {_has_class('js-button_element_label')}])[1]"),
+    'username': etree.XPath(f"(//*[{_has_class('userprofile__nickname_label')}])[1]"),
+    'city': etree.XPath("(//*[@itemprop='addressLocality'])[1]"),
+    'latitude': etree.XPath("(//*[@itemprop='latitude'])[1]"),
+    'longitude': etree.XPath("(//*[@itemprop='longitude'])[1]"),
+    'posted': etree.XPath(f"(//*[{_has_class('list__element_label')}])[1]"),
+}
+_XPATH_IMAGES = etree.XPath(f"//*[{_has_class('user_images__img')} or (self::img and contains(@alt, 'Image'))]")
+_XPATH_BREADCRUMB = etree.XPath(f"(//*[{_has_class('breadcrumb__link')}])[last()]")
+
+# Comme BeautifulSoup.get_text : le contenu de ces balises n'est pas du texte affiché
+_SKIPPED_TEXT_TAGS = {'script', 'style', 'template', 'rt', 'rp'}
+
+_parsers: Dict[str, etree.HTMLParser] = {}
+
+def _iter_text(elem) -> Iterator[str]:
+    if elem.text and elem.tag not in _SKIPPED_TEXT_TAGS:
+        yield elem.text
+    if elem.tag not in _SKIPPED_TEXT_TAGS:
+        for child in elem:
+            # Commentaires et instructions : pas de texte propre, mais la queue compte
+            if isinstance(child.tag, str):
+                yield from _iter_text(child)
+            if child.tail:
+                yield child.tail
+
+def _lxml_text(elem, strip: bool = True) -> str:
+    if not strip:
+        return ''.join(_iter_text(elem))
+    return ''.join(part.strip() for part in _iter_text(elem) if part.strip())
+
+def _lxml_first_text(root, key: str) -> Optional[str]:
+    found = _XPATH_FIRST[key](root)
+    return _lxml_text(found[0]) if found else None
+
+def _lxml_root(content: bytes):
+    """Parse avec le même encodage que celui retenu par BeautifulSoup"""
+    for encoding in EncodingDetector(content, is_html=True).encodings:
+        try:
+            if encoding not in _parsers:
+                _parsers[encoding] = etree.HTMLParser(encoding=encoding, recover=True)
+            # BeautifulSoup passe à l'encodage suivant si le décodage échoue
+            content.decode(encoding)
+        except (LookupError, UnicodeDecodeError):
+            continue
+        return etree.fromstring(content, _parsers[encoding])
+    return etree.fromstring(content, etree.HTMLParser(recover=True))
+
+def extract_listing_from_html_lxml(content: bytes, listing_url: str) -> Dict:
+    """Même résultat que extract_listing_from_html, via XPath précompilés sur lxml"""
+    root = _lxml_root(content)
+    if root is None:
+        root = etree.Element('html')
+
+    price_sources = [
+        _XPATH_FIRST[key](root)
+        for key in ('description', 'price', 'price_any')
+    ]
+    breadcrumb = _XPATH_BREADCRUMB(root)
+
+    fields = {
+        'title': _lxml_first_text(root, 'title'),
+        'description': _lxml_first_text(root, 'description'),
+        'price_texts': [_lxml_text(found[0], strip=False) for found in price_sources if found],
+        'images': [(img.get('src'), img.get('srcset')) for img in _XPATH_IMAGES(root)],
+        'phone': _lxml_first_text(root, 'phone'),
+        'username': _lxml_first_text(root, 'username'),
+        'city': _lxml_first_text(root, 'city'),
+        'latitude': _lxml_first_text(root, 'latitude'),
+        'longitude': _lxml_first_text(root, 'longitude'),
+        'posted': _lxml_first_text(root, 'posted'),
+        'category': _lxml_text(breadcrumb[0]) if breadcrumb else None
+    }
+
+    return build_listing(listing_url, fields)
+
+# Backends disponibles (variable EXTRACTOR)
+EXTRACTORS: Dict[str, Callable[[bytes, str], Dict]] = {
+    'bs4': extract_listing_from_html,
+    'lxml': extract_listing_from_html_lxml,
+}
+
+def get_extractor(name: str) -> Callable[[bytes, str], Dict]:
+    """Retourne la fonction d'extraction du backend demandé"""
+    if name not in EXTRACTORS:
+        raise ValueError(f"Extracteur inconnu: {name} (disponibles: {', '.join(EXTRACTORS)})")
+    return EXTRACTORS[name]
+
+def extract_with(backend: str, content: bytes, listing_url: str) -> Dict:
+    """Point d'entrée picklable pour ParsePool : le backend est passé par son nom"""
+    return get_extractor(backend)(content, listing_url)
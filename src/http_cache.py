@@ -0,0 +1,171 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from metrics import Metrics
+
+# Classes d'URL : une page d'annonce change rarement, une page d'index tous les jours
+LISTING_URL_RE = re.compile(r'/ID_\d+/')
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def normalize_url(url: str) -> str:
+    """Clé de cache : schéma/hôte en minuscules, port par défaut et fragment retirés, paramètres triés"""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, parts.path or '/', query, ''))
+
+
+def url_class(url: str) -> str:
+    return 'listing' if LISTING_URL_RE.search(url) else 'index'
+
+
+class CacheEntry:
+    def __init__(self, body: bytes, etag: Optional[str], last_modified: Optional[str], fresh: bool):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fresh = fresh
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """En-têtes pour une requête conditionnelle (304 si la page n'a pas changé)"""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    """
+    Cache disque des réponses HTTP (SQLite, corps compressés).
+
+    - Entrée fraîche (âge < TTL de sa classe d'URL) : servie sans requête.
+    - Entrée périmée avec ETag/Last-Modified : requête conditionnelle, un 304 la rafraîchit.
+    - Taille totale plafonnée : les entrées les moins récemment utilisées sont évincées.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 2 * 1024**3,
+                 ttl_index: int = 3600, ttl_listing: int = 7 * 86400):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, 'http_cache.sqlite')
+        self.max_bytes = max_bytes
+        self.ttls = {'index': ttl_index, 'listing': ttl_listing}
+        self.stats = {'hits': 0, 'revalidated': 0, 'misses': 0, 'evicted': 0}
+        self.metrics = Metrics.shared()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('''
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                body BLOB NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL
+            )
+        ''')
+        self._db.execute('CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)')
+        self._db.commit()
+        self._total = self._size_on_disk()
+
+    @classmethod
+    def from_env(cls) -> Optional['ResponseCache']:
+        """Cache configuré par HTTP_CACHE / CACHE_DIR / CACHE_MAX_MB / CACHE_TTL_*"""
+        if os.getenv('HTTP_CACHE', '1') != '1':
+            return None
+        return cls(
+            os.getenv('CACHE_DIR', '/app/data/cache'),
+            max_bytes=int(os.getenv('CACHE_MAX_MB', 2048)) * 1024**2,
+            ttl_index=int(os.getenv('CACHE_TTL_INDEX', 3600)),
+            ttl_listing=int(os.getenv('CACHE_TTL_LISTING', 7 * 86400))
+        )
+
+    def lookup(self, url: str) -> Optional[CacheEntry]:
+        key = normalize_url(url)
+        with self._lock:
+            row = self._db.execute(
+                'SELECT body, etag, last_modified, fetched_at FROM responses WHERE key = ?', (key,)
+            ).fetchone()
+            fresh = row is not None and time.time() - row[3] < self.ttls[url_class(url)]
+            if fresh:
+                self.stats['hits'] += 1
+                self.metrics.count('cache', result='hit')
+                self._db.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (time.time(), key))
+                self._db.commit()
+            else:
+                # Pas d'entrée fraîche : requête (conditionnelle si l'entrée périmée a un validateur)
+                self.stats['misses'] += 1
+                self.metrics.count('cache', result='miss')
+
+        if row is None:
+            return None
+        body, etag, last_modified, _ = row
+        return CacheEntry(zlib.decompress(body), etag, last_modified, fresh)
+
+    def revalidated(self, url: str):
+        """Le serveur a répondu 304 : l'entrée redevient fraîche (comptée aussi en miss à la consultation)"""
+        now = time.time()
+        with self._lock:
+            self.stats['revalidated'] += 1
+            self.metrics.count('cache', result='revalidated')
+            self._db.execute(
+                'UPDATE responses SET fetched_at = ?, accessed_at = ? WHERE key = ?',
+                (now, now, normalize_url(url))
+            )
+            self._db.commit()
+
+    def store(self, url: str, body: bytes, headers) -> None:
+        compressed = zlib.compress(body, 1)
+        key = normalize_url(url)
+        now = time.time()
+        with self._lock:
+            previous = self._db.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+            self._total += len(compressed) - (previous[0] if previous else 0)
+            self._db.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (key, compressed, headers.get('ETag'), headers.get('Last-Modified'),
+                 now, now, len(compressed))
+            )
+            self._db.commit()
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def _size_on_disk(self) -> int:
+        return self._db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    def _evict(self):
+        """LRU : supprime les entrées les plus anciennement utilisées jusqu'à 90 % du plafond"""
+        # Recalcul exact : d'autres processus peuvent partager le même fichier
+        total = self._size_on_disk()
+        if total <= self.max_bytes:
+            self._total = total
+            return
+
+        target = int(self.max_bytes * 0.9)
+        for key, size in self._db.execute('SELECT key, size FROM responses ORDER BY accessed_at').fetchall():
+            if total <= target:
+                break
+            self._db.execute('DELETE FROM responses WHERE key = ?', (key,))
+            total -= size
+            self.stats['evicted'] += 1
+        self._db.commit()
+        self._total = total
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,198 @@
+"""
+Base SQLite des annonces, mise à jour à chaque crawl (en plus ou à la place du flux NDJSON).
+
+    listings          une ligne par (domaine du pays, ID d'annonce) : dernier état connu
+    listing_history   un changement de prix, de devise ou de titre entre deux crawls
+
+Les annonces sont mises en tampon puis écrites par lots (une transaction par lot, au rythme
+des fsync du flux, FLUSH_EVERY), plusieurs processus pays peuvent partager la base (WAL).
+
+    SELECT price, currency FROM listings WHERE domain = 'www.locanto.ci' AND listing_id = '4123456789';
+    SELECT * FROM listing_history WHERE domain = 'www.locanto.ci' AND listing_id = '4123456789';
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+from seen_index import listing_id
+
+# Colonnes de listings remplies depuis l'annonce (dans l'ordre de l'INSERT)
+LISTING_COLUMNS = [
+    'url', 'title', 'price', 'currency', 'description', 'images', 'main_image', 'username', 'phone',
+    'city', 'latitude', 'longitude', 'category', 'crawl_category', 'date_posted', 'scraped_at'
+]
+# Changements gardés dans l'historique
+TRACKED_COLUMNS = ('price', 'currency', 'title')
+SELECT_CHUNK = 500
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS listings (
+        domain TEXT NOT NULL,
+        listing_id TEXT NOT NULL,
+        url TEXT NOT NULL,
+        title TEXT,
+        price REAL,
+        currency TEXT,
+        description TEXT,
+        images TEXT,
+        main_image TEXT,
+        username TEXT,
+        phone TEXT,
+        city TEXT,
+        latitude REAL,
+        longitude REAL,
+        category TEXT,
+        crawl_category TEXT,
+        date_posted TEXT,
+        scraped_at TEXT,
+        first_seen REAL NOT NULL,
+        last_seen REAL NOT NULL,
+        times_seen INTEGER NOT NULL DEFAULT 1,
+        PRIMARY KEY (domain, listing_id)
+    );
+    CREATE INDEX IF NOT EXISTS listings_category ON listings (domain, category);
+    CREATE INDEX IF NOT EXISTS listings_city ON listings (domain, city);
+    CREATE INDEX IF NOT EXISTS listings_price ON listings (currency, price);
+    CREATE INDEX IF NOT EXISTS listings_date_posted ON listings (date_posted);
+
+    CREATE TABLE IF NOT EXISTS listing_history (
+        domain TEXT NOT NULL,
+        listing_id TEXT NOT NULL,
+        changed_at REAL NOT NULL,
+        old_price REAL,
+        new_price REAL,
+        old_currency TEXT,
+        new_currency TEXT,
+        old_title TEXT,
+        new_title TEXT
+    );
+    CREATE INDEX IF NOT EXISTS listing_history_listing ON listing_history (domain, listing_id, changed_at);
+'''
+
+UPSERT = f'''
+    INSERT INTO listings (domain, listing_id, {', '.join(LISTING_COLUMNS)}, first_seen, last_seen)
+    VALUES (?, ?, {', '.join('?' * len(LISTING_COLUMNS))}, ?, ?)
+    ON CONFLICT (domain, listing_id) DO UPDATE SET
+        {', '.join(f'{column} = excluded.{column}' for column in LISTING_COLUMNS)},
+        last_seen = excluded.last_seen,
+        times_seen = times_seen + 1
+'''
+
+
+def _float(value) -> Optional[float]:
+    try:
+        return float(value) if value not in (None, '') else None
+    except (TypeError, ValueError):
+        return None
+
+
+def listing_row(listing: Dict, category_url: Optional[str]) -> Dict:
+    """Annonce (dict de l'extracteur) → colonnes de listings"""
+    contact = listing.get('contact') or {}
+    location = listing.get('location') or {}
+    return {
+        'url': listing.get('url', ''),
+        'title': listing.get('title'),
+        'price': _float(listing.get('price')),
+        'currency': listing.get('currency'),
+        'description': listing.get('description'),
+        'images': json.dumps(listing.get('images') or [], ensure_ascii=False),
+        'main_image': listing.get('mainImage'),
+        'username': contact.get('username'),
+        'phone': contact.get('phone'),
+        'city': location.get('city'),
+        'latitude': _float(location.get('latitude')),
+        'longitude': _float(location.get('longitude')),
+        'category': listing.get('category'),
+        'crawl_category': category_url,
+        'date_posted': listing.get('datePosted'),
+        'scraped_at': listing.get('scrapedAt')
+    }
+
+
+class ListingStore:
+    """
+    Annonces d'un pays dans la base partagée, écrites par lots.
+
+    add() met en tampon ; commit() écrit le lot (une transaction) et l'historique des changements.
+    """
+
+    def __init__(self, path: str, domain: str):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.domain = domain
+        self.stats = {'new': 0, 'changed': 0, 'unchanged': 0}
+        self._pending: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(SCHEMA)
+        self._db.commit()
+
+    @classmethod
+    def from_env(cls, domain: str) -> Optional['ListingStore']:
+        """Base configurée par LISTING_DB (vide = désactivée)"""
+        path = os.getenv('LISTING_DB')
+        if not path:
+            return None
+        return cls(path, domain)
+
+    def add(self, listing: Dict, category_url: Optional[str] = None):
+        """Met une annonce en attente du prochain commit (la dernière version d'un ID l'emporte)"""
+        ad_id = listing.get('id') or listing_id(listing.get('url', ''))
+        if not ad_id:
+            return
+        with self._lock:
+            self._pending[ad_id] = listing_row(listing, category_url)
+
+    def commit(self):
+        with self._lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, {}
+            now = time.time()
+            ids = list(batch)
+            tracked = ', '.join(TRACKED_COLUMNS)
+            with self._db:
+                previous = {}
+                # Limite de paramètres par requête SQLite
+                for start in range(0, len(ids), SELECT_CHUNK):
+                    chunk = ids[start:start + SELECT_CHUNK]
+                    previous.update((row[0], row[1:]) for row in self._db.execute(
+                        f"SELECT listing_id, {tracked} FROM listings "
+                        f"WHERE domain = ? AND listing_id IN ({','.join('?' * len(chunk))})",
+                        (self.domain, *chunk)
+                    ))
+                history = []
+                for ad_id, row in batch.items():
+                    if ad_id not in previous:
+                        self.stats['new'] += 1
+                        continue
+                    old = previous[ad_id]
+                    new = tuple(row[column] for column in TRACKED_COLUMNS)
+                    if old == new:
+                        self.stats['unchanged'] += 1
+                        continue
+                    self.stats['changed'] += 1
+                    history.append((self.domain, ad_id, now) + tuple(v for pair in zip(old, new) for v in pair))
+                self._db.executemany(UPSERT, [
+                    (self.domain, ad_id, *(row[column] for column in LISTING_COLUMNS), now, now)
+                    for ad_id, row in batch.items()
+                ])
+                if history:
+                    self._db.executemany(
+                        'INSERT INTO listing_history VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', history
+                    )
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM listings WHERE domain = ?', (self.domain,)).fetchone()[0]
+
+    def close(self):
+        self.commit()
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,172 @@
+"""
+Sortie en flux : une annonce par ligne JSON (NDJSON) + un petit fichier de métadonnées.
+
+    <base>.ndjson     une annonce par ligne, ajoutée au fil de l'eau
+    <base>.meta.json  config, catégories (sans les annonces) et stats, réécrit à chaque checkpoint
+    LISTING_DB        base SQLite optionnelle (listing_store.py), en plus ou à la place du NDJSON
+
+La mémoire et le coût d'un checkpoint ne dépendent plus du nombre d'annonces.
+L'ancien JSON imbriqué se reconstruit à la demande :
+
+    python src/listing_stream.py /app/data/full_scrapes/abidjan_20240101_120000
+"""
+import json
+import os
+import sys
+import time
+from typing import Callable, Dict, Iterator, Optional
+
+from listing_store import ListingStore
+from metrics import Metrics
+
+# Catégorie de crawl d'une annonce (URL), retirée lors de la reconstruction
+CATEGORY_KEY = 'crawlCategory'
+
+
+def stream_paths(base: str) -> Dict[str, str]:
+    base = base[:-len('.ndjson')] if base.endswith('.ndjson') else base
+    return {
+        'listings': f"{base}.ndjson",
+        'meta': f"{base}.meta.json",
+        'nested': f"{base}.json"
+    }
+
+
+def write_json_atomic(data: Dict, filename: str):
+    """Écrit un JSON via un fichier temporaire : jamais de fichier à moitié écrit"""
+    tmp = f"{filename}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, filename)
+
+
+class ListingStreamWriter:
+    """
+    Ajoute les annonces au fichier NDJSON, flush + fsync tous les flush_every enregistrements.
+
+    on_sync est appelé après chaque fsync : tout ce qui a été écrit avant est alors sur disque.
+    Avec une base (store), chaque fsync commite aussi le lot d'annonces en attente, avant on_sync ;
+    ndjson=False n'écrit plus que dans la base.
+    """
+
+    def __init__(self, base: str, flush_every: int = 100, on_sync: Optional[Callable[[], None]] = None,
+                 store: Optional[ListingStore] = None, ndjson: bool = True):
+        self.paths = stream_paths(base)
+        self.flush_every = flush_every
+        self.on_sync = on_sync
+        self.store = store
+        self.metrics = Metrics.shared()
+        self.written = 0
+        self._unsynced = 0
+        self._closed = False
+        self.ndjson = ndjson or store is None
+        self._file = open(self.paths['listings'], 'a', encoding='utf-8') if self.ndjson else None
+        # Reprise après un crash : la dernière ligne a pu être tronquée
+        if self._file and self._file.tell() and not self._ends_with_newline():
+            self._file.write('\n')
+
+    def _ends_with_newline(self) -> bool:
+        with open(self.paths['listings'], 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b'\n'
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def write_listing(self, listing: Dict, category_url: str):
+        start = time.perf_counter()
+        if self._file:
+            line = dict(listing)
+            line[CATEGORY_KEY] = category_url
+            self._file.write(json.dumps(line, ensure_ascii=False) + '\n')
+        if self.store:
+            self.store.add(listing, category_url)
+        self.metrics.observe('serialize', time.perf_counter() - start)
+        self.metrics.count('listings')
+        self.written += 1
+        self._unsynced += 1
+        if self._unsynced >= self.flush_every:
+            self.sync()
+
+    def write_meta(self, meta: Dict):
+        """Checkpoint : annonces sur disque puis métadonnées (petites, réécrites en entier)"""
+        self.sync()
+        write_json_atomic(meta, self.paths['meta'])
+
+    def sync(self):
+        if self._closed:
+            return
+        if self._file:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        if self.store:
+            self.store.commit()
+        self._unsynced = 0
+        if self.on_sync:
+            self.on_sync()
+
+    def close(self):
+        self.sync()
+        self._closed = True
+        if self._file:
+            self._file.close()
+        if self.store:
+            self.store.close()
+
+
+def iter_listings(path: str) -> Iterator[Dict]:
+    """Relit un fichier NDJSON (une dernière ligne tronquée par un crash est ignorée)"""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def build_nested_result(base: str) -> Dict:
+    """Reconstruit le résultat imbriqué historique (categories[*].listings) depuis le flux"""
+    paths = stream_paths(base)
+    with open(paths['meta'], encoding='utf-8') as f:
+        result = json.load(f)
+
+    categories = {cat['url']: cat for cat in result.get('categories', [])}
+    for cat in categories.values():
+        cat['listings'] = []
+
+    # Une annonce écrite juste avant un crash peut être ré-écrite à la reprise
+    seen_urls = set()
+    for listing in iter_listings(paths['listings']):
+        if listing.get('url') in seen_urls:
+            continue
+        seen_urls.add(listing.get('url'))
+        category_url = listing.pop(CATEGORY_KEY, None)
+        if category_url not in categories:
+            # Catégorie en cours au moment d'un arrêt : pas encore dans les métadonnées
+            categories[category_url] = {'name': None, 'url': category_url, 'listings': []}
+            result.setdefault('categories', []).append(categories[category_url])
+        categories[category_url]['listings'].append(listing)
+
+    return result
+
+
+def main():
+    if len(sys.argv) != 2:
+        print(__doc__)
+        return 1
+
+    paths = stream_paths(sys.argv[1])
+    result = build_nested_result(sys.argv[1])
+    write_json_atomic(result, paths['nested'])
+    total = sum(len(cat['listings']) for cat in result['categories'])
+    print(f"✅ {total} annonces → {paths['nested']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,145 +1,236 @@
 import requests
 from bs4 import BeautifulSoup
-from fake_useragent import UserAgent
 import time
-import random
-from typing import Dict, List, Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 import urllib3
+import logging
 import re
-from urllib.parse import urljoin
-from datetime import datetime, timedelta
+from urllib.parse import urljoin, urlsplit
+from datetime import datetime
+
+from extractors import clean_city, extract_listing, get_extractor, parse_relative_date
+from price_parser import parse_price
+from http_cache import ResponseCache, url_class
+from seen_index import SeenIndex
+from dedup import ListingDedup
+from discovery import ListingDiscovery
+from url_filter import ShardedUrlFilter
+from rate_limiter import AdaptiveRateLimiter, parse_retry_after
+from retry_policy import CircuitBreaker, DeadLetterFile, FetchError, RetryPolicy, classify_exception, classify_status
+from metrics import Metrics
+from transport import Transport
+from user_agents import HeaderProfiles
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+logger = logging.getLogger(__name__)
+
+PAGE_LINK_RE = re.compile(r'[?&]page=(\d+)')
+TOTAL_RESULTS_RE = re.compile(r'(\d{1,3}(?:[ .,\u00a0\u202f]\d{3})+|\d+)\s+(?:annonces|résultats|results|ads)\b', re.IGNORECASE)
+
 class LocantoScraperFinal:
-    def __init__(self, proxy_manager):
+    def __init__(self, proxy_manager, extractor: str = 'bs4', cache: Optional[ResponseCache] = None,
+                 seen: Optional[SeenIndex] = None, rate_limiter: Optional[AdaptiveRateLimiter] = None,
+                 dead_letter: Optional[DeadLetterFile] = None, transport: Optional[Transport] = None,
+                 header_profiles: Optional[HeaderProfiles] = None, dedup: Optional[ListingDedup] = None,
+                 discovery: Optional[ListingDiscovery] = None, page_workers: int = 5):
         self.proxy_manager = proxy_manager
-        self.ua = UserAgent()
-        self.session = requests.Session()
-        self.session.proxies = proxy_manager.get_proxy()
-        self.session.verify = False
-        self.visited_urls = set()
-    
-    def get_headers(self) -> Dict[str, str]:
-        return {
-            'User-Agent': self.ua.random,
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-            'Accept-Language': 'fr-FR,fr;q=0.9,en;q=0.8',
-        }
+        # Pages d'index 2..N d'une catégorie téléchargées en parallèle (PER_HOST_CONCURRENCY)
+        self.page_workers = max(1, page_workers)
+        self.cache = cache
+        self.seen = seen
+        # IDs réservés entre catégories et reposts (DEDUP)
+        self.dedup = dedup
+        # Sitemaps et flux lus avant la pagination HTML (DISCOVERY)
+        self.discovery = discovery
+        self.extractor = extractor
+        self.extract_html = get_extractor(extractor)
+        self.metrics = Metrics.shared()
+        # Profils navigateur embarqués (UA_STICKY, UA_SEED)
+        self.header_profiles = header_profiles or HeaderProfiles.from_env()
+        # Session et pool de connexions partagés par tous les scrapers du processus
+        self.transport = transport or Transport.shared()
+        self.session = self.transport.session
+        # Proxy choisi à chaque requête selon la charge et la santé (PROXY_ENDPOINTS)
+        self.proxy_pool = proxy_manager.pool
+        # Annonces déjà téléchargées, filtre compact par domaine (URL_FILTER = set / hash64 / bloom)
+        self.visited_urls = ShardedUrlFilter.from_env()
+        # Débit adaptatif par domaine (remplace la pause fixe de 2-4 s)
+        self.rate_limiter = rate_limiter or AdaptiveRateLimiter.from_env()
+        # Nouvelles tentatives, disjoncteur par domaine, URLs abandonnées (DEAD_LETTER)
+        self.retry_policy = RetryPolicy.from_env()
+        self.breaker = CircuitBreaker.from_env()
+        self.dead_letter = dead_letter
+        self.failures: Dict[str, int] = {}
     
-    def scrape_page(self, url: str) -> Optional[BeautifulSoup]:
-        if url in self.visited_urls:
-            return None
-        
+    def get_headers(self, host: str = '') -> Dict[str, str]:
+        return self.header_profiles.pick(host)
+    
+    def fetch(self, url: str) -> Optional[bytes]:
+        """Télécharge une page et retourne le HTML brut (None si déjà visitée ou en échec)"""
         try:
-            print(f"      🔍 {url[:80]}")
-            response = self.session.get(url, headers=self.get_headers(), timeout=30)
-            response.raise_for_status()
-            self.visited_urls.add(url)
-            time.sleep(random.uniform(2, 4))
-            return BeautifulSoup(response.content, 'lxml')
-        except Exception as e:
-            print(f"         ❌ {str(e)[:60]}")
+            return self.fetch_or_raise(url)
+        except FetchError:
             return None
     
-    def parse_price(self, text: str) -> Dict:
-        """Parse prix avec gestion correcte des séparateurs de milliers"""
-        if not text:
-            return {'price': None, 'currency': None}
-        
-        # Patterns avec séparateurs
-        patterns = [
-            # Format français : 16,450 CFA ou 16.450 CFA
-            (r'(\d{1,3}(?:[,.\s]\d{3})+)\s*(FCFA|CFA|F\s*CFA|XOF)', lambda m: (m.group(1).replace(',', '').replace('.', '').replace(' ', ''), 'XOF')),
-            # Format simple : 16450 CFA
-            (r'(\d+)\s*(FCFA|CFA|F\s*CFA|XOF)', lambda m: (m.group(1), 'XOF')),
-            # Taka
-            (r'(\d{1,3}(?:[,.\s]\d{3})+)\s*(Taka|BDT|৳)', lambda m: (m.group(1).replace(',', '').replace('.', '').replace(' ', ''), 'BDT')),
-            (r'(\d+)\s*(Taka|BDT|৳)', lambda m: (m.group(1), 'BDT')),
-            # Cedi
-            (r'(\d{1,3}(?:[,.\s]\d{3})+)\s*(Cedi|GHS|GH₵)', lambda m: (m.group(1).replace(',', '').replace('.', '').replace(' ', ''), 'GHS')),
-            (r'(\d+)\s*(Cedi|GHS|GH₵)', lambda m: (m.group(1), 'GHS')),
-            # USD
-            (r'\$\s*(\d{1,3}(?:[,]\d{3})+)', lambda m: (m.group(1).replace(',', ''), 'USD')),
-            (r'\$\s*(\d+)', lambda m: (m.group(1), 'USD')),
-            # EUR
-            (r'€\s*(\d{1,3}(?:[,]\d{3})+)', lambda m: (m.group(1).replace(',', ''), 'EUR')),
-            (r'€\s*(\d+)', lambda m: (m.group(1), 'EUR')),
-        ]
-        
-        for pattern, processor in patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                price_str, currency = processor(match)
-                try:
-                    price = float(price_str)
-                    return {'price': price, 'currency': currency}
-                except:
-                    continue
-        
-        return {'price': None, 'currency': None}
+    def already_visited(self, url: str) -> bool:
+        """
+        Annonce déjà téléchargée. Les pages d'index ne sont jamais filtrées : un faux positif
+        du filtre (bloom) tronquerait la pagination de la catégorie sans bruit.
+        """
+        return url_class(url) == 'listing' and url in self.visited_urls
     
-    def parse_relative_date(self, date_text: str) -> str:
-        """Convertit dates relatives en dates réelles"""
-        if not date_text:
+    def mark_visited(self, url: str):
+        if url_class(url) == 'listing':
+            self.visited_urls.add(url)
+    
+    def fetch_or_raise(self, url: str) -> Optional[bytes]:
+        """Comme fetch, mais un échec définitif (après les nouvelles tentatives) lève FetchError"""
+        if self.already_visited(url):
             return None
         
-        date_text_lower = date_text.lower()
-        today = datetime.now()
+        cached = self.cache.lookup(url) if self.cache else None
+        if cached and cached.fresh:
+            self.mark_visited(url)
+            return cached.body
         
-        # Français
-        if 'aujourd\'hui' in date_text_lower or 'today' in date_text_lower:
-            return today.strftime('%Y-%m-%d')
+        host = urlsplit(url).netloc
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                content = self._fetch_once(url, host, cached)
+                self.breaker.record_success(host)
+                self.mark_visited(url)
+                return content
+            except FetchError as e:
+                error = e
+            
+            if not self.retry_later(error, host, attempt):
+                raise error
+            delay = self.retry_policy.delay(attempt, error.retry_after)
+            logger.debug("         🔁 %s: tentative %d/%d dans %.1fs", error.kind, attempt + 1, self.retry_policy.max_retries + 1, delay)
+            time.sleep(delay)
+    
+    def _fetch_once(self, url: str, host: str, cached) -> bytes:
+        if not self.breaker.allow(host):
+            raise FetchError(url, 'circuit_open', host)
         
-        if 'hier' in date_text_lower or 'yesterday' in date_text_lower:
-            return (today - timedelta(days=1)).strftime('%Y-%m-%d')
+        self.rate_limiter.wait(host)
+        logger.debug("      🔍 %s", url[:80])
+        headers = self.get_headers(host)
+        if cached:
+            headers.update(cached.conditional_headers())
+        endpoint = self.proxy_pool.acquire()
+        status, error_kind = None, None
+        start = time.monotonic()
+        try:
+            response = self.session.get(url, headers=headers, timeout=30, proxies=endpoint.proxies)
+            status = response.status_code
+        except requests.RequestException as e:
+            error_kind = classify_exception(e)
+            self.metrics.count('fetch_errors', kind=error_kind)
+            raise FetchError(url, error_kind, str(e)[:200]) from e
+        finally:
+            self.proxy_pool.release(endpoint, time.monotonic() - start, status, error_kind)
         
-        # "il y a X jours" / "X days ago"
-        days_match = re.search(r'(\d+)\s*(jour|day)', date_text_lower)
-        if days_match:
-            days = int(days_match.group(1))
-            return (today - timedelta(days=days)).strftime('%Y-%m-%d')
+        # requests lit le corps d'emblée : elapsed = jusqu'aux en-têtes, le reste = téléchargement
+        elapsed = response.elapsed.total_seconds()
+        # ttfb sans l'ouverture de connexion (mesurée à part), comme pour le moteur asynchrone
+        self.metrics.observe('ttfb', max(0.0, elapsed - self.transport.take_connect_seconds()))
+        self.metrics.observe('download', max(0.0, time.monotonic() - start - elapsed))
+        self.metrics.count('responses', status=status)
+        self.metrics.count('bytes', len(response.content))
         
-        # "il y a X semaines" / "X weeks ago"
-        weeks_match = re.search(r'(\d+)\s*(semaine|week)', date_text_lower)
-        if weeks_match:
-            weeks = int(weeks_match.group(1))
-            return (today - timedelta(weeks=weeks)).strftime('%Y-%m-%d')
+        if cached and response.status_code == 304:
+            self.cache.revalidated(url)
+            self.rate_limiter.success(host, time.monotonic() - start)
+            return cached.body
         
-        # "moins d'une semaine" / "less than a week"
-        if 'moins d\'une semaine' in date_text_lower or 'less than a week' in date_text_lower:
-            return (today - timedelta(days=3)).strftime('%Y-%m-%d')
+        kind = classify_status(response.status_code)
+        if kind:
+            raise FetchError(url, kind, f"HTTP {response.status_code}", response.status_code,
+                             parse_retry_after(response.headers.get('Retry-After')))
         
-        # "il y a un mois" / "a month ago"
-        if 'mois' in date_text_lower or 'month' in date_text_lower:
-            return (today - timedelta(days=30)).strftime('%Y-%m-%d')
+        content = response.content
+        if self.cache:
+            self.cache.store(url, content, response.headers)
+        self.rate_limiter.success(host, time.monotonic() - start)
+        return content
+    
+    def retry_later(self, error: FetchError, host: str, attempt: int) -> bool:
+        """Après un échec : ajuste débit et disjoncteur, indique s'il faut réessayer"""
+        if error.kind in ('timeout', 'proxy', 'throttled', 'banned'):
+            self.rate_limiter.backoff(host, error.retry_after)
+        if error.retryable and error.kind != 'proxy':
+            # Un 404 ne dit rien de la santé du domaine, une erreur de proxy non plus (gérée par le pool)
+            self.breaker.record_failure(host)
+        elif error.kind != 'circuit_open':
+            # Requête d'essai (circuit semi-ouvert) sans verdict : la suivante la refait
+            self.breaker.release_trial(host)
         
-        # Sinon retourner le texte original
-        return date_text
+        if self.retry_policy.should_retry(error, attempt):
+            return True
+        self.record_failure(error, attempt)
+        return False
+    
+    def record_failure(self, error: FetchError, attempts: int = 1):
+        """Échec définitif : compté et mis de côté pour un prochain lancement (sauf 4xx)"""
+        self.failures[error.kind] = self.failures.get(error.kind, 0) + 1
+        logger.warning(f"         ❌ {error.url[:60]}: {str(error)[:60]} ({attempts} tentative{'s' if attempts > 1 else ''})")
+        if self.dead_letter is None:
+            return
+        if error.kind == 'client':
+            # Page disparue : une reprise du dead-letter s'arrête là
+            self.dead_letter.retried(error.url)
+        else:
+            self.dead_letter.add(error, attempts, url_class(error.url))
+    
+    def scrape_page(self, url: str) -> Optional[BeautifulSoup]:
+        content = self.fetch(url)
+        if not content:
+            return None
+        return self.parse_html(content)
+    
+    def parse_html(self, content: bytes) -> BeautifulSoup:
+        with self.metrics.timer('parse'):
+            return BeautifulSoup(content, 'lxml')
+    
+    def parse_price(self, text: str) -> Dict:
+        """Parse prix avec gestion correcte des séparateurs de milliers"""
+        return parse_price(text)
+    
+    def parse_relative_date(self, date_text: str) -> str:
+        """Convertit dates relatives en dates réelles"""
+        return parse_relative_date(date_text)
     
     def clean_city(self, text: str) -> str:
         """Nettoie le texte de localisation"""
-        if not text:
-            return None
-        
-        # Supprimer coordonnées GPS du début
-        text = re.sub(r'^[\d\.\-\s]+', '', text)
-        text = text.strip(',').strip()
-        
-        return text if text else None
+        return clean_city(text)
     
     def get_categories(self, site_url: str) -> List[Dict]:
         """Extrait les catégories"""
-        print(f"\n{'='*60}")
-        print(f"📂 Extraction catégories")
-        print("="*60)
+        logger.info(f"\n{'='*60}")
+        logger.info(f"📂 Extraction catégories")
+        logger.info("="*60)
         
         soup = self.scrape_page(site_url)
         if not soup:
             return []
         
+        categories = self.parse_categories(soup, site_url)
+        
+        logger.info(f"\n      Total: {len(categories)} catégories")
+        return categories
+    
+    def parse_categories(self, soup: BeautifulSoup, site_url: str) -> List[Dict]:
+        """Extrait les catégories d'une page d'accueil déjà chargée"""
         categories = []
         
+        if self.discovery is not None:
+            self.discovery.add_feed_links(site_url, soup)
+        
         # Chercher dans le menu
         cat_links = soup.select('.catlist a, .header_menu a[href*="/"]:not([href*="post"]):not([href*="my"])')
         
@@ -159,164 +250,263 @@ class LocantoScraperFinal:
                         'name': text,
                         'url': full_url
                     })
-                    print(f"      ✓ {text}")
+                    logger.debug("      ✓ %s", text)
         
-        print(f"\n      Total: {len(categories)} catégories")
         return categories
     
     def get_listings_from_category(self, category_url: str, max_pages: int = 2) -> List[str]:
         """Extrait URLs des annonces"""
+        return self.walk_category(category_url, max_pages)[0]
+    
+    def walk_category(self, category_url: str, max_pages: int = 2) -> Tuple[List[str], List[int]]:
+        """
+        URLs des annonces d'une catégorie et pages d'index ignorées après un échec passager.
+        
+        La page 1 indique la dernière page : les suivantes sont alors téléchargées ensemble
+        (au plus page_workers à la fois) et traitées dans l'ordre, comme iter_listing_pages du moteur async.
+        """
+        discovered = self.discover_listing_urls(category_url)
+        if discovered is not None:
+            return discovered, []
+        
         listing_urls = []
+        skipped = []
+        previous = None
+        # Dernière page : indiquée par la page 1, max_pages sinon (pages alors lues une à une)
+        last_page, page_size, exact = max_pages, 0, False
+        futures: Dict[int, Future] = {}
+        page = 0
         
-        for page in range(1, max_pages + 1):
-            page_url = f"{category_url}?page={page}" if page > 1 else category_url
-            
-            soup = self.scrape_page(page_url)
-            if not soup:
-                break
-            
-            ad_links = soup.find_all('a', href=re.compile(r'/ID_\d+/.*\.html'))
-            
-            print(f"         Page {page}: {len(ad_links)} annonces trouvées")
+        with ThreadPoolExecutor(max_workers=self.page_workers) as executor:
+            try:
+                while page < last_page:
+                    page += 1
+                    if page not in futures:
+                        window = last_page - page + 1 if page_size else 1
+                        for next_page in range(page, page + window):
+                            futures[next_page] = executor.submit(self.fetch_or_raise, self.page_url(category_url, next_page))
+                    
+                    try:
+                        content = futures.pop(page).result()
+                    except FetchError as e:
+                        if e.kind == 'client':
+                            break
+                        # Échec passager : la page est mise de côté, la pagination continue
+                        logger.warning(f"         ⚠️ Page {page} ignorée ({e.kind})")
+                        skipped.append(page)
+                        continue
+                    if not content:
+                        break
+                    
+                    soup = self.parse_html(content)
+                    page_urls = self.parse_listing_urls(soup, category_url)
+                    
+                    logger.debug("         Page %d: %d annonces trouvées", page, len(page_urls))
+                    
+                    if not page_urls or self.repeated_page(page, page_urls, previous):
+                        break
+                    previous = page_urls
+                    if page == 1:
+                        page_size = len(page_urls)
+                        last_page, exact = self.last_page_hint(soup, category_url, page_size, max_pages)
+                    if not exact:
+                        last_page = self.extend_last_page(page, last_page, max_pages, len(page_urls), page_size)
+                    
+                    new_urls = self.unseen_listing_urls(page_urls)
+                    listing_urls.extend(new_urls)
+                    
+                    # Mode incrémental : tri du plus récent au plus ancien, la suite est déjà connue
+                    if not new_urls:
+                        logger.info(f"         🛑 Page entièrement connue, arrêt de la pagination")
+                        break
+            finally:
+                # Fin de catégorie : pages restantes pas encore parties abandonnées
+                for future in futures.values():
+                    future.cancel()
+        
+        return listing_urls, skipped
+    
+    @staticmethod
+    def page_url(category_url: str, page: int) -> str:
+        return f"{category_url}?page={page}" if page > 1 else category_url
+    
+    def last_page_hint(self, soup: BeautifulSoup, category_url: str, page_size: int, max_pages: int) -> Tuple[int, bool]:
+        """
+        Dernière page d'une catégorie d'après sa page 1 (au plus max_pages) et si elle est sûre.
+        
+        Le nombre total d'annonces ("1 234 annonces") donne la dernière page exacte ; les liens de
+        pagination (?page=N) seulement un minimum, la pagination pouvant être tronquée (1 2 3 … suivant).
+        """
+        links = []
+        category_path = urlsplit(category_url).path
+        for link in soup.find_all('a', href=PAGE_LINK_RE):
+            href = urljoin(category_url, link['href'])
+            if urlsplit(href).path == category_path:
+                links.append(int(PAGE_LINK_RE.search(href).group(1)))
+        
+        total = TOTAL_RESULTS_RE.search(soup.get_text(' '))
+        if total and page_size:
+            count = int(re.sub(r'\D', '', total.group(1)))
+            last_page = max([-(-count // page_size)] + links)
+            logger.debug("         %d annonces, %d pages d'après la page 1", count, last_page)
+            return min(last_page, max_pages), True
+        if links:
+            logger.debug("         Au moins %d pages d'après la page 1", max(links))
+            return min(max(links + [1]), max_pages), False
+        return max_pages, False
+    
+    @staticmethod
+    def repeated_page(page: int, page_urls: List[str], previous: Optional[List[str]]) -> bool:
+        """Au-delà de la dernière page, Locanto renvoie encore la dernière"""
+        if page_urls != previous:
+            return False
+        logger.debug("         Page %d identique à la précédente, fin de la catégorie", page)
+        return True
+    
+    @staticmethod
+    def extend_last_page(page: int, last_page: int, max_pages: int, count: int, page_size: int) -> int:
+        """Dernière page d'après les liens mais pleine : la pagination était tronquée, on regarde la suivante"""
+        if 1 < page == last_page < max_pages and count >= page_size:
+            return last_page + 1
+        return last_page
+    
+    def explore_site(self, site_url: str):
+        """Télécharge robots.txt, sitemaps et flux d'un site (une fois par site)"""
+        documents = self.discovery.start(site_url)
+        while documents:
+            url = documents.pop(0)
+            content = self.fetch(url)
+            if content:
+                documents.extend(self.discovery.add_document(site_url, url, content))
+    
+    def discover_listing_urls(self, category_url: str) -> Optional[List[str]]:
+        """Annonces d'une catégorie d'après les sitemaps et flux, None s'ils ne la couvrent pas"""
+        if self.discovery is None:
+            return None
+        
+        parts = urlsplit(category_url)
+        self.explore_site(f"{parts.scheme}://{parts.netloc}/")
+        listing_urls = self.discovery.listing_urls(category_url)
+        if listing_urls is None:
+            return None
+        
+        logger.debug("         🗺️  %d annonces dans les sitemaps et flux, sans pagination", len(listing_urls))
+        return self.unseen_listing_urls(listing_urls)
+    
+    def parse_listing_urls(self, soup: BeautifulSoup, category_url: str) -> List[str]:
+        """Extrait les URLs d'annonces d'une page de catégorie (dédupliquées par ID)"""
+        ad_links = soup.find_all('a', href=re.compile(r'/ID_\d+/.*\.html'))
+        
+        listing_urls = []
+        seen_ids = set()
+        for link in ad_links:
+            href = link.get('href', '')
+            id_match = re.search(r'ID_(\d+)', href)
+            if not id_match:
+                continue
             
-            seen_ids = set()
-            for link in ad_links:
-                href = link.get('href', '')
-                id_match = re.search(r'ID_(\d+)', href)
-                if not id_match:
-                    continue
-                
-                ad_id = id_match.group(1)
-                if ad_id in seen_ids:
-                    continue
-                seen_ids.add(ad_id)
-                
-                full_url = urljoin(category_url, href)
-                listing_urls.append(full_url)
+            ad_id = id_match.group(1)
+            if ad_id in seen_ids:
+                continue
+            seen_ids.add(ad_id)
             
-            if not ad_links:
-                break
+            full_url = urljoin(category_url, href)
+            listing_urls.append(full_url)
         
         return listing_urls
     
+    def unseen_listing_urls(self, page_urls: List[str]) -> List[str]:
+        """Mode incrémental : retire les annonces déjà présentes dans l'index"""
+        if self.seen is None:
+            return page_urls
+        
+        new_urls = self.seen.filter_new(page_urls)
+        if len(new_urls) < len(page_urls):
+            logger.debug("         ⏭️  %d déjà connues", len(page_urls) - len(new_urls))
+        return new_urls
+    
+    def claim_listing_urls(self, urls: List[str], limit: Optional[int] = None) -> List[str]:
+        """Retire les annonces déjà prises par une autre catégorie, réserve les autres (au plus limit)"""
+        if self.dedup is None:
+            return urls if limit is None else urls[:limit]
+        
+        claimed = self.dedup.claim_listing_urls(urls, limit)
+        skipped = len(urls if limit is None else urls[:limit]) - len(claimed)
+        if skipped > 0:
+            logger.debug("         ⏭️  %d déjà prises par une autre catégorie", skipped)
+        return claimed
+    
+    def release_listing_url(self, url: str):
+        """Échec du téléchargement ou de l'extraction : l'annonce n'est plus réservée par sa catégorie"""
+        if self.dedup is not None:
+            self.dedup.release(url)
+    
     def get_listing_details(self, listing_url: str) -> Optional[Dict]:
         """Extrait détails complets - VERSION CORRIGÉE"""
-        soup = self.scrape_page(listing_url)
-        if not soup:
+        content = self.fetch(listing_url)
+        listing = self.parse_listing_content(content, listing_url) if content else None
+        if not listing:
+            self.release_listing_url(listing_url)
+            return None
+        return self.check_duplicate(listing)
+    
+    def parse_listing_content(self, content: bytes, listing_url: str) -> Optional[Dict]:
+        """Extrait l'annonce du HTML brut avec le backend configuré (bs4 ou lxml)"""
+        try:
+            with self.metrics.timer('extract'):
+                listing = self.extract_html(content, listing_url)
+        except Exception as e:
+            self.record_failure(FetchError(listing_url, 'parse', str(e)))
             return None
         
+        self.log_listing(listing)
+        return listing
+    
+    def extract_listing_details(self, soup: BeautifulSoup, listing_url: str) -> Optional[Dict]:
+        """Extrait les champs d'une page d'annonce déjà chargée"""
         try:
-            # ID
-            id_match = re.search(r'ID_(\d+)', listing_url)
-            listing_id = id_match.group(1) if id_match else None
-            
-            # Titre
-            title_elem = soup.select_one('h1.h1__title, h1')
-            title = title_elem.get_text(strip=True) if title_elem else None
-            
-            # Description - CORRECTION MAJEURE
-            desc_elem = soup.select_one('.simple__description')
-            description = None
-            if desc_elem:
-                # Prendre tout le texte sauf les éléments de prix
-                desc_text = desc_elem.get_text(strip=True)
-                # Supprimer le prix s'il est dans la description
-                desc_text = re.sub(r'\d+[\s,.]?\d*\s*(FCFA|CFA|Taka|BDT|Cedi|GHS|USD|EUR|\$|€)', '', desc_text)
-                description = desc_text.strip()
-            
-            # Prix - CORRECTION MAJEURE avec séparateurs
-            price_data = {'price': None, 'currency': None}
-            
-            # Chercher dans plusieurs endroits
-            price_sources = [
-                soup.select_one('.simple__description'),
-                soup.select_one('.simple__price'),
-                soup.select_one('[class*="price"]')
-            ]
-            
-            all_text = ' '.join([elem.get_text() for elem in price_sources if elem])
-            price_data = self.parse_price(all_text)
-            
-            # Images
-            images = []
-            for img in soup.select('.user_images__img, img[alt*="Image"]'):
-                src = img.get('src') or img.get('srcset', '').split()[0]
-                if src and 'images.locanto' in src:
-                    clean_src = src.split()[0] if ' ' in src else src
-                    if clean_src not in images:
-                        images.append(clean_src)
-            
-            # Contact - téléphone
-            phone = None
-            phone_elem = soup.select_one('.button__element_label.js-button_element_label')
-            if phone_elem:
-                phone_text = phone_elem.get_text(strip=True)
-                if re.search(r'\d{3,}', phone_text) and len(phone_text) < 50:
-                    phone = phone_text
-            
-            # Username
-            username_elem = soup.select_one('.userprofile__nickname_label')
-            username = username_elem.get_text(strip=True) if username_elem else None
-            
-            # Localisation - nettoyée
-            location_elem = soup.select_one('[itemprop="addressLocality"]')
-            city_raw = location_elem.get_text(strip=True) if location_elem else None
-            city = self.clean_city(city_raw)
-            
-            # GPS
-            lat_elem = soup.select_one('[itemprop="latitude"]')
-            lon_elem = soup.select_one('[itemprop="longitude"]')
-            latitude = lat_elem.get_text(strip=True) if lat_elem else None
-            longitude = lon_elem.get_text(strip=True) if lon_elem else None
-            
-            # Date - CORRECTION MAJEURE
-            posted_elem = soup.select_one('.list__element_label')
-            date_posted = None
-            if posted_elem:
-                text = posted_elem.get_text(strip=True)
-                if 'Publié' in text or 'Posted' in text:
-                    date_text = text.replace('Publiée: ', '').replace('Posted: ', '')
-                    date_posted = self.parse_relative_date(date_text)
-            
-            # Catégorie
-            category_elem = soup.select('.breadcrumb__link')
-            category = category_elem[-1].get_text(strip=True) if category_elem else None
-            
-            listing = {
-                'id': listing_id,
-                'url': listing_url,
-                'title': title,
-                'price': price_data['price'],
-                'currency': price_data['currency'],
-                'description': description,
-                'images': images,
-                'mainImage': images[0] if images else None,
-                'contact': {
-                    'username': username,
-                    'phone': phone
-                },
-                'location': {
-                    'city': city,
-                    'latitude': latitude,
-                    'longitude': longitude
-                },
-                'category': category,
-                'datePosted': date_posted,
-                'scrapedAt': datetime.now().isoformat()
-            }
-            
-            print(f"            ✅ {title[:40] if title else 'Sans titre'} | {price_data['price']} {price_data['currency']}")
-            return listing
-            
+            listing = extract_listing(soup, listing_url)
         except Exception as e:
-            print(f"            ⚠️ Erreur: {e}")
+            self.record_failure(FetchError(listing_url, 'parse', str(e)))
             return None
+        
+        self.log_listing(listing)
+        return listing
+    
+    def mark_seen(self, listing: Dict):
+        """Mode incrémental : annonce écrite, enregistrée dans l'index (ID, date, empreinte) après le fsync"""
+        if self.seen is not None:
+            self.seen.listing_done(listing)
+    
+    def check_duplicate(self, listing: Dict) -> Optional[Dict]:
+        """Repost d'une annonce déjà vue : marqué duplicateOf (DEDUP_NEAR=mark, défaut) ou écarté (drop)"""
+        if self.dedup is None:
+            return listing
+        
+        original = self.dedup.check(listing)
+        if original is None:
+            return listing
+        if self.dedup.near == 'drop':
+            logger.debug(f"            ♊ Doublon de {original['url']} écarté")
+            if self.seen is not None:
+                # Rien à écrire : connue dès maintenant
+                self.seen.record(listing)
+            if self.dead_letter:
+                self.dead_letter.retried(listing['url'])
+            return None
+        listing['duplicateOf'] = original['url']
+        return listing
+    
+    def log_listing(self, listing: Dict):
+        if logger.isEnabledFor(logging.DEBUG):
+            title = listing['title']
+            logger.debug(f"            ✅ {title[:40] if title else 'Sans titre'} | {listing['price']} {listing['currency']}")
     
     def scrape_site(self, site_url: str, max_categories: int = 3, max_listings: int = 5, max_pages: int = 2) -> Dict:
         """Scrape complet"""
-        print(f"\n{'='*60}")
-        print(f"🌍 SCRAPING: {site_url}")
-        print("="*60)
+        logger.info(f"\n{'='*60}")
+        logger.info(f"🌍 SCRAPING: {site_url}")
+        logger.info("="*60)
         
         result = {
             'site_url': site_url,
@@ -332,20 +522,20 @@ class LocantoScraperFinal:
         categories = self.get_categories(site_url)
         
         for i, category in enumerate(categories[:max_categories], 1):
-            print(f"\n{'='*60}")
-            print(f"📁 [{i}/{min(max_categories, len(categories))}] {category['name']}")
-            print(f"   {category['url']}")
-            print("="*60)
+            logger.info(f"\n{'='*60}")
+            logger.info(f"📁 [{i}/{min(max_categories, len(categories))}] {category['name']}")
+            logger.info(f"   {category['url']}")
+            logger.info("="*60)
             
             listing_urls = self.get_listings_from_category(category['url'], max_pages=max_pages)
-            print(f"\n   📋 {len(listing_urls)} URLs collectées")
+            logger.info(f"\n   📋 {len(listing_urls)} URLs collectées")
             
             if not listing_urls:
                 continue
             
             listings = []
             for j, url in enumerate(listing_urls[:max_listings], 1):
-                print(f"   [{j}/{min(max_listings, len(listing_urls))}]", end=' ')
+                logger.debug("   [%d/%d]", j, min(max_listings, len(listing_urls)))
                 details = self.get_listing_details(url)
                 if details:
                     listings.append(details)
@@ -358,6 +548,6 @@ class LocantoScraperFinal:
                 'listings': listings
             })
             
-            print(f"\n   ✅ {len(listings)} annonces extraites")
+            logger.info(f"\n   ✅ {len(listings)} annonces extraites")
         
         return result
\ No newline at end of file
@@ -0,0 +1,123 @@
+"""
+Journalisation : niveaux, contexte (pays, worker), sortie texte ou JSON, écriture hors du chemin critique.
+
+Niveaux (LOG_LEVEL) :
+    DEBUG    tout l'ancien affichage : chaque requête, chaque page, chaque annonce
+    INFO     progression par catégorie, ralentissements, proxies (défaut)
+    SUMMARY  mode production silencieux : configuration, bilans, avertissements et erreurs
+    WARNING  avertissements et erreurs seulement
+
+Les modules journalisent via logging.getLogger(__name__) ; les enregistrements passent par une
+file (QueueHandler) et sont écrits par un thread dédié (QueueListener), les workers
+n'attendent jamais la console.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+# Bilans et configuration : visibles en mode silencieux
+SUMMARY = 25
+logging.addLevelName(SUMMARY, 'SUMMARY')
+
+_context: contextvars.ContextVar[Dict[str, str]] = contextvars.ContextVar('log_context', default={})
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+@contextmanager
+def log_context(**fields) -> Iterator[None]:
+    """Champs ajoutés à tous les messages émis dans ce bloc (tâches asyncio comprises)"""
+    token = _context.set({**_context.get(), **{k: str(v) for k, v in fields.items()}})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    """Capture le contexte au moment de l'émission (avant le passage dans la file)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.context = _context.get()
+        return True
+
+
+class TextFormatter(logging.Formatter):
+    """Affichage console historique, préfixé du contexte : [ci] 📁 [3/40] Immobilier"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = super().format(record)
+        context = getattr(record, 'context', None)
+        if not context:
+            return message
+        prefix = '[' + ' '.join(context.values()) + '] '
+        stripped = message.lstrip('\n')
+        return message[:len(message) - len(stripped)] + prefix + stripped
+
+
+class JsonFormatter(logging.Formatter):
+    """Une ligne JSON par message (ts, level, logger, msg + champs de contexte)"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage().strip()
+        }
+        entry.update(getattr(record, 'context', None) or {})
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def is_decoration(record: logging.LogRecord) -> bool:
+    """Lignes de séparation (=====) : utiles à l'œil, inutiles en JSON"""
+    return not record.getMessage().strip().strip('=-─ ')
+
+
+def setup_logging(level: Optional[str] = None, fmt: Optional[str] = None, stream=None):
+    """Configure la journalisation du processus (LOG_LEVEL, LOG_FORMAT = text | json) ; rappel sans effet"""
+    global _listener
+    if _listener is not None:
+        return
+
+    level = (level or os.getenv('LOG_LEVEL', 'INFO')).upper()
+    fmt = (fmt or os.getenv('LOG_FORMAT', 'text')).lower()
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    if fmt == 'json':
+        output.setFormatter(JsonFormatter())
+        output.addFilter(lambda record: not is_decoration(record))
+    else:
+        output.setFormatter(TextFormatter('%(message)s'))
+
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    handler = logging.handlers.QueueHandler(records)
+    handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+    # Bibliothèques tierces : avertissements seulement
+    for name in ('urllib3', 'asyncio', 'aiohttp', 'charset_normalizer', 'chardet'):
+        logging.getLogger(name).setLevel(max(logging.WARNING, root.level))
+
+    _listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Vide la file (fin de processus)"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,212 @@
+"""
+Métriques du crawl : histogrammes de latence par étape et compteurs, partagés par tout le processus.
+
+Étapes (secondes) :
+    dns        résolution DNS (moteur async ; incluse dans connect pour le moteur historique)
+    connect    ouverture de connexion, tunnel CONNECT et TLS à travers le proxy compris
+    pool_wait  attente d'une connexion libre du connecteur (moteur async, limites CONCURRENCY)
+    ttfb       connexion obtenue → en-têtes de la réponse reçus (même intervalle pour les deux moteurs)
+    download   en-têtes reçus → corps complet
+    parse      HTML → arbre (pages de catégories et d'index)
+    extract    page d'annonce → dict (parsing compris, ou aller-retour du pool de processus)
+    serialize  annonce → ligne NDJSON écrite
+
+Exposition : résumé JSON (stats.metrics du .meta.json), texte Prometheus dans un fichier
+(METRICS_FILE, réécrit toutes les METRICS_INTERVAL s) et/ou sur http://0.0.0.0:METRICS_PORT/metrics.
+"""
+import bisect
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from log_setup import SUMMARY
+
+logger = logging.getLogger(__name__)
+
+PREFIX = 'locanto'
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+COUNTER_HELP = {
+    'bytes': "Octets reçus (corps des réponses)",
+    'responses': "Réponses HTTP par code",
+    'fetch_errors': "Requêtes sans réponse exploitable, par type d'erreur",
+    'cache': "Consultations du cache HTTP (hit, revalidated, miss)",
+    'listings': "Annonces écrites"
+}
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # dernière case : au-delà du dernier seuil
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Estimation par interpolation linéaire dans le seau concerné"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[i - 1] if i else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+class Metrics:
+    _shared: Optional['Metrics'] = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self):
+        self._stages: Dict[str, Histogram] = {}
+        self._counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+        self._lock = threading.Lock()
+        self._exporting = False
+
+    @classmethod
+    def shared(cls) -> 'Metrics':
+        """Métriques uniques du processus (créées au premier appel)"""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def observe(self, stage: str, seconds: float):
+        with self._lock:
+            if stage not in self._stages:
+                self._stages[stage] = Histogram()
+            self._stages[stage].observe(seconds)
+
+    @contextmanager
+    def timer(self, stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def count(self, name: str, value: float = 1, **labels):
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def snapshot(self) -> Dict:
+        """Résumé JSON : latences par étape (ms) et compteurs"""
+        with self._lock:
+            stages = {
+                stage: {
+                    'count': h.count,
+                    'mean_ms': round(1000 * h.sum / h.count, 2) if h.count else 0.0,
+                    'p50_ms': round(1000 * h.quantile(0.5), 2),
+                    'p95_ms': round(1000 * h.quantile(0.95), 2),
+                    'p99_ms': round(1000 * h.quantile(0.99), 2)
+                }
+                for stage, h in self._stages.items()
+            }
+            counters: Dict[str, Dict[str, float]] = {}
+            for (name, labels), value in sorted(self._counters.items()):
+                label = ','.join(v for _, v in labels) or 'total'
+                counters.setdefault(name, {})[label] = value
+        return {'stages': stages, 'counters': counters}
+
+    def render(self) -> str:
+        """Format texte Prometheus (exposition 0.0.4)"""
+        lines: List[str] = []
+        with self._lock:
+            name = f"{PREFIX}_stage_seconds"
+            lines += [f"# HELP {name} Latence par étape du crawl", f"# TYPE {name} histogram"]
+            for stage, h in sorted(self._stages.items()):
+                cumulative = 0
+                for bound, count in zip(self.bucket_labels(h), h.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {h.sum:.6f}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {h.count}')
+
+            by_name: Dict[str, List[str]] = {}
+            for (counter, labels), value in sorted(self._counters.items()):
+                label_text = ','.join(f'{k}="{v}"' for k, v in labels)
+                by_name.setdefault(counter, []).append(
+                    f"{PREFIX}_{counter}_total{{{label_text}}} {value:g}" if label_text
+                    else f"{PREFIX}_{counter}_total {value:g}"
+                )
+            for counter, samples in by_name.items():
+                lines += [f"# HELP {PREFIX}_{counter}_total {COUNTER_HELP.get(counter, counter)}",
+                          f"# TYPE {PREFIX}_{counter}_total counter"] + samples
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def bucket_labels(h: Histogram) -> List[str]:
+        return [f"{bound:g}" for bound in h.buckets] + ['+Inf']
+
+    def write(self, path: str):
+        """Écriture atomique (collecteur "textfile" de node_exporter)"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(tmp, path)
+
+    def serve(self, port: int) -> ThreadingHTTPServer:
+        """Point de collecte /metrics dans un thread (daemon)"""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer(('0.0.0.0', port), Handler)
+        threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+        return server
+
+    def export_from_env(self):
+        """Lance les exports configurés par METRICS_PORT / METRICS_FILE / METRICS_INTERVAL (une seule fois)"""
+        if self._exporting:
+            return
+        self._exporting = True
+
+        port = int(os.getenv('METRICS_PORT', 0))
+        if port:
+            try:
+                self.serve(port)
+                logger.log(SUMMARY, f"📈 Métriques: http://0.0.0.0:{port}/metrics")
+            except OSError as e:
+                logger.warning(f"⚠️ Métriques HTTP indisponibles sur le port {port}: {e}")
+
+        path = os.getenv('METRICS_FILE')
+        if path:
+            interval = float(os.getenv('METRICS_INTERVAL', 15))
+
+            def loop():
+                while True:
+                    self.write(path)
+                    time.sleep(interval)
+
+            threading.Thread(target=loop, name='metrics-file', daemon=True).start()
+            logger.log(SUMMARY, f"📈 Métriques: {path} (toutes les {interval:.0f}s)")
+
+    def flush(self):
+        """Dernière écriture du fichier de métriques (fin de crawl)"""
+        path = os.getenv('METRICS_FILE')
+        if path:
+            self.write(path)
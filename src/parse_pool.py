@@ -0,0 +1,48 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+
+from extractors import extract_with, get_extractor
+
+
+class ParsePool:
+    """
+    Parsing HTML hors du thread principal.
+
+    Les octets bruts de la réponse partent dans un worker ProcessPoolExecutor qui
+    construit l'arbre et extrait les champs ; seul le dict de l'annonce revient.
+    Les téléchargements continuent pendant que les autres cœurs parsent.
+    """
+
+    def __init__(self, workers: int = 2, extractor: str = 'bs4'):
+        self.workers = workers
+        self.extractor = extractor
+        get_extractor(extractor)  # backend inconnu : erreur dès la construction
+        self.executor: Optional[ProcessPoolExecutor] = None
+
+    def start(self):
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown()
+
+    def parse_listing(self, content: bytes, listing_url: str) -> Dict:
+        """Version bloquante (moteur synchrone)"""
+        self.start()
+        return self.executor.submit(extract_with, self.extractor, content, listing_url).result()
+
+    async def parse_listing_async(self, content: bytes, listing_url: str) -> Dict:
+        """Version awaitable : la boucle asyncio reste libre pendant le parsing"""
+        self.start()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, extract_with, self.extractor, content, listing_url)
@@ -0,0 +1,184 @@
+import asyncio
+import logging
+from contextlib import aclosing
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CategoryState:
+    """Avancement d'une catégorie dans le pipeline"""
+
+    def __init__(self, index: int, category: Dict, keep_listings: bool = True):
+        self.index = index
+        self.category = category
+        self.listings_found = 0
+        self.queued = 0
+        self.pending = 0
+        self.scraped = 0
+        # Sans on_listing, les annonces restent en mémoire jusqu'à la fin de la catégorie
+        self.keep_listings = keep_listings
+        self.listings: List[Dict] = []
+        self.errors = 0
+        self.index_done = False
+
+    def to_dict(self) -> Dict:
+        data = {
+            'name': self.category['name'],
+            'url': self.category['url'],
+            'listings_found': self.listings_found,
+            'listings_scraped': self.scraped,
+            'errors': self.errors
+        }
+        if self.keep_listings:
+            data['listings'] = self.listings
+        return data
+
+
+class CrawlPipeline:
+    """
+    Pipeline catégories → pages d'index → annonces.
+
+    Chaque étage a ses propres workers et communique par une file bornée :
+    les annonces de la page 1 sont téléchargées pendant que la page 2 de
+    l'index est encore en cours, et la catégorie suivante démarre sans attendre
+    la fin de la précédente.
+    """
+
+    def __init__(self, scraper, max_pages: int = 2, max_listings: int = 5,
+                 index_workers: int = 2, detail_workers: int = 10, queue_size: int = 100,
+                 on_category: Optional[Callable[[Dict], None]] = None,
+                 on_listing: Optional[Callable[[Dict, Dict], None]] = None,
+                 progress=None):
+        self.scraper = scraper
+        self.max_pages = max_pages
+        self.max_listings = max_listings
+        self.index_workers = index_workers
+        self.detail_workers = detail_workers
+        self.queue_size = queue_size
+        self.on_category = on_category
+        # on_listing(annonce, catégorie) : sortie en flux, les annonces ne sont pas conservées
+        self.on_listing = on_listing
+        # progress (crawl_state.CountryProgress) : reprise après interruption
+        self.progress = progress
+        self.total = 0
+        self.completed = 0
+
+    async def run(self, categories: List[Dict]) -> int:
+        """Traite toutes les catégories, renvoie le nombre de catégories terminées"""
+        category_queue = asyncio.Queue(maxsize=self.queue_size)
+        detail_queue = asyncio.Queue(maxsize=self.queue_size)
+        self.total = len(categories)
+        done = {cat['url'] for cat in self.progress.done_categories()} if self.progress else set()
+
+        index_tasks = [
+            asyncio.create_task(self._index_worker(category_queue, detail_queue))
+            for _ in range(self.index_workers)
+        ]
+        detail_tasks = [
+            asyncio.create_task(self._detail_worker(detail_queue))
+            for _ in range(self.detail_workers)
+        ]
+
+        try:
+            # Étage 1 : producteur de catégories
+            for i, category in enumerate(categories, 1):
+                if category['url'] in done:
+                    logger.info(f"\n⏭️  [{i}/{self.total}] {category['name']} (terminée avant l'interruption)")
+                    continue
+                await category_queue.put(CategoryState(i, category, keep_listings=self.on_listing is None))
+            for _ in index_tasks:
+                await category_queue.put(None)
+
+            await asyncio.gather(*index_tasks)
+            for _ in detail_tasks:
+                await detail_queue.put(None)
+            await asyncio.gather(*detail_tasks)
+        finally:
+            for task in index_tasks + detail_tasks:
+                task.cancel()
+
+        return self.completed
+
+    async def _index_worker(self, category_queue: asyncio.Queue, detail_queue: asyncio.Queue):
+        """Étage 2 : parcourt les pages d'index et pousse les URLs d'annonces au fil de l'eau"""
+        while True:
+            state = await category_queue.get()
+            if state is None:
+                return
+
+            logger.info(f"\n📁 [{state.index}/{self.total}] {state.category['name']}")
+            logger.info(f"   {state.category['url']}")
+
+            try:
+                async with aclosing(self._listing_pages(state.category)) as pages:
+                    async for page_urls in pages:
+                        state.listings_found += len(page_urls)
+                        # Annonces déjà prises par une autre catégorie écartées avant d'appliquer la limite
+                        limit = None if 'listing_urls' in state.category else max(self.max_listings - state.queued, 0)
+                        page_urls = self.scraper.claim_listing_urls(page_urls, limit)
+                        already_done = self.progress.enqueue(state.category['url'], page_urls) if self.progress else set()
+                        for url in page_urls:
+                            state.queued += 1
+                            if url in already_done:
+                                # Écrite dans le flux avant l'interruption
+                                state.scraped += 1
+                                continue
+                            state.pending += 1
+                            await detail_queue.put((state, url))
+                        # Quota atteint : les pages suivantes ne sont pas téléchargées
+                        if limit is not None and state.queued >= self.max_listings:
+                            break
+            except Exception as e:
+                logger.error(f"\n   ❌ Erreur catégorie {state.category['name']}: {e}")
+                state.errors += 1
+
+            state.index_done = True
+            self._maybe_finish(state)
+
+    async def _listing_pages(self, category: Dict):
+        # Catégorie aux annonces déjà connues (reprise des échecs) : une seule "page", sans limite
+        if 'listing_urls' in category:
+            yield category['listing_urls']
+            return
+        async with aclosing(self.scraper.iter_listing_pages(category['url'], max_pages=self.max_pages,
+                                                             max_listings=self.max_listings)) as pages:
+            async for page_urls in pages:
+                yield page_urls
+
+    async def _detail_worker(self, detail_queue: asyncio.Queue):
+        """Étage 3 : télécharge et extrait chaque annonce"""
+        while True:
+            item = await detail_queue.get()
+            if item is None:
+                return
+
+            state, url = item
+            try:
+                details = await self.scraper.get_listing_details(url)
+                if details:
+                    state.scraped += 1
+                    if self.on_listing:
+                        self.on_listing(details, state.category)
+                        if self.progress:
+                            self.progress.listing_done(url)
+                    else:
+                        state.listings.append(details)
+            except Exception as e:
+                state.errors += 1
+                logger.error(f"      ❌ Erreur: {str(e)[:40]}")
+
+            state.pending -= 1
+            self._maybe_finish(state)
+
+    def _maybe_finish(self, state: CategoryState):
+        if not state.index_done or state.pending:
+            return
+
+        self.completed += 1
+        logger.info(f"\n   ✅ [{state.index}/{self.total}] {state.category['name']}: "
+                    f"{state.scraped}/{state.listings_found} annonces ({state.errors} erreurs)")
+
+        # Catégorie vide comprise : le destinataire décide de ce qu'il en garde (checkpoint, dead-letter)
+        if self.on_category:
+            self.on_category(state.to_dict())
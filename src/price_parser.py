@@ -0,0 +1,172 @@
+import re
+from typing import Dict, Iterable, List, Optional
+
+# Table des devises, par ordre de priorité quand un texte en contient plusieurs.
+#   code     : code ISO retourné
+#   markers  : (regex du marqueur, position du montant[, 'exact']) ; 'before' = "16 450 FCFA",
+#              'after' = "$ 1,200", 'around' = les deux ("NGN 5,000" ou "5,000 NGN").
+#              Les marqueurs sont écrits en MAJUSCULES (recherche insensible à la casse),
+#              sauf ceux marqués 'exact' qui doivent apparaître tels quels.
+#   grouped  : montant avec séparateurs de milliers (prioritaire sur le montant simple)
+# Les marqueurs d'une même devise sont essayés dans l'ordre à une même position.
+# Pour ajouter une devise : une ligne ici, rien d'autre.
+CURRENCIES = [
+    {'code': 'XOF', 'markers': [('FCFA', 'before'), ('CFA', 'before'), (r'F\s*CFA', 'before'), ('XOF', 'before')],
+     'grouped': r'\d{1,3}(?:[,.\s]\d{3})+'},
+    {'code': 'BDT', 'markers': [('TAKA', 'before'), ('BDT', 'before'), ('৳', 'before')],
+     'grouped': r'\d{1,3}(?:[,.\s]\d{3})+'},
+    {'code': 'GHS', 'markers': [('CEDI', 'before'), ('GHS', 'before'), ('GH₵', 'before')],
+     'grouped': r'\d{1,3}(?:[,.\s]\d{3})+'},
+    {'code': 'USD', 'markers': [(r'\$', 'after')],
+     'grouped': r'\d{1,3}(?:[,]\d{3})+'},
+    {'code': 'EUR', 'markers': [('€', 'after')],
+     'grouped': r'\d{1,3}(?:[,]\d{3})+'},
+    {'code': 'NGN', 'markers': [('₦', 'after'), (r'\bNGN\b', 'around'), (r'\bNAIRA\b', 'before')],
+     'grouped': r'\d{1,3}(?:[,.\s]\d{3})+'},
+    {'code': 'KES', 'markers': [(r'\bKSH(?![A-Z])', 'after'), (r'\bKES\b', 'around'), (r'\bSHILLINGS\b', 'before')],
+     'grouped': r'\d{1,3}(?:[,.\s]\d{3})+'},
+    # "R 1 500" : R majuscule isolé, collé au montant
+    {'code': 'ZAR', 'markers': [(r'\bR(?=\s?\d)', 'after', 'exact'), (r'\bZAR\b', 'around'), (r'\bRAND\b', 'before')],
+     'grouped': r'\d{1,3}(?:[,.\s]\d{3})+'},
+    {'code': 'INR', 'markers': [('₹', 'after'), (r'\bRS(?![A-Z])\.?', 'after'), (r'\bINR\b', 'around'), (r'\bRUPEES\b', 'before')],
+     # Groupement indien : 1,50,000
+     'grouped': r'\d{1,3}(?:,\d{3})+|\d{1,2}(?:,\d{2})+,\d{3}'},
+]
+
+_SIMPLE = r'\d+'
+
+
+def _first_char(marker: str) -> Optional[str]:
+    """Premier caractère littéral d'un marqueur (None si ce n'est pas un littéral)"""
+    marker = re.sub(r'^(\\b)+', '', marker)
+    if marker.startswith('\\'):
+        return marker[1] if len(marker) > 1 and not marker[1].isalnum() else None
+    return marker[0] if marker and marker[0] not in '[(.' else None
+
+
+def _compile_table():
+    scan = []
+    by_char: Dict[Optional[str], List] = {}
+    currencies = []
+    for priority, currency in enumerate(CURRENCIES):
+        grouped = currency['grouped']
+        currencies.append({
+            'code': currency['code'],
+            # Montant collé à la fin du texte qui précède le marqueur (avec milliers, simple)
+            'before': (re.compile(rf'(?:{grouped})\s*$'), re.compile(rf'{_SIMPLE}\s*$')),
+            # Montant au début du texte qui suit le marqueur
+            'after': (re.compile(rf'\s*({grouped})'), re.compile(rf'\s*({_SIMPLE})')),
+        })
+        for marker, position, *options in currency['markers']:
+            # Balayage : alternatives commençant toutes par un littéral, sans groupe
+            # ni \b, pour que le moteur re saute directement aux caractères candidats
+            scan.append(marker.replace(r'\b', ''))
+            exact = 'exact' in options
+            by_char.setdefault(_first_char(marker), []).append((priority, position, exact, re.compile(marker)))
+    return re.compile('|'.join(scan)), by_char, currencies
+
+
+# Compilé une seule fois à l'import
+_SCAN_RE, _MARKERS_BY_CHAR, _CURRENCIES = _compile_table()
+_ANY_CHAR_MARKERS = _MARKERS_BY_CHAR.pop(None, [])
+_NO_MARKERS: List = []
+_DIGIT_RE = re.compile(r'\d')
+_RUN_CHARS = '0123456789,. \t\n\r\f\v\xa0'
+
+
+def _upper(text: str) -> str:
+    """Majuscules sans changer les positions (ß → SS ferait tout décaler)"""
+    upper = text.upper()
+    if len(upper) == len(text):
+        return upper
+    return ''.join(c.upper() if len(c.upper()) == 1 else c for c in text)
+
+
+def _marker_at(text: str, upper: str, pos: int):
+    """Premier marqueur de la table qui commence exactement à pos (ou None)"""
+    for markers in (_MARKERS_BY_CHAR.get(upper[pos], _NO_MARKERS), _ANY_CHAR_MARKERS):
+        for priority, position, exact, pattern in markers:
+            match = pattern.match(text if exact else upper, pos)
+            if match:
+                return priority, position, match
+    return None
+
+
+def _run_start(text: str, end: int) -> int:
+    """Début de la séquence chiffres/séparateurs/espaces qui se termine à end"""
+    start = len(text[:end].rstrip(_RUN_CHARS))
+    # Chiffres ou espaces non ASCII : on continue caractère par caractère
+    while start > 0 and (text[start - 1].isdigit() or text[start - 1] in ',.' or text[start - 1].isspace()):
+        start -= 1
+    return start
+
+
+def _to_price(amount: str) -> Optional[float]:
+    try:
+        return float(amount.replace(',', '').replace('.', '').replace(' ', ''))
+    except ValueError:
+        return None
+
+
+def parse_price(text: str) -> Dict:
+    """Parse prix avec gestion correcte des séparateurs de milliers"""
+    if not text or not _DIGIT_RE.search(text):
+        return {'price': None, 'currency': None}
+
+    # 1. Un seul passage sur le texte pour trouver les marqueurs de devise
+    # 2. Lecture du montant collé à chaque marqueur
+    # best[(priorité, format)] = (position, prix) ; format 0 = avec milliers, 1 = simple.
+    # Le premier montant trouvé pour une clé est aussi le plus à gauche (comme re.search).
+    upper = _upper(text)
+    best = {}
+    pos = 0
+    while True:
+        scan = _SCAN_RE.search(upper, pos)
+        if not scan:
+            break
+        pos = scan.start() + 1
+
+        marker = _marker_at(text, upper, scan.start())
+        if marker is None:
+            continue
+        priority, position, match = marker
+        currency = _CURRENCIES[priority]
+        pos = max(match.end(), pos)
+
+        if position != 'after':
+            run_start = _run_start(text, match.start())
+            if run_start < match.start():
+                for kind, pattern in enumerate(currency['before']):
+                    if (priority, kind) not in best:
+                        amount = pattern.search(text, run_start, match.start())
+                        if amount:
+                            best[(priority, kind)] = (amount.start(), _to_price(amount.group(0).rstrip()))
+
+        if position != 'before':
+            for kind, pattern in enumerate(currency['after']):
+                if (priority, kind) not in best:
+                    amount = pattern.match(text, match.end())
+                    if amount:
+                        best[(priority, kind)] = (match.start(), _to_price(amount.group(1)))
+
+        # Devise prioritaire avec séparateurs de milliers : rien ne peut la battre
+        if best.get((0, 0), (None, None))[1] is not None:
+            break
+
+    for priority, kind in sorted(best):
+        price = best[(priority, kind)][1]
+        if price is not None:
+            return {'price': price, 'currency': _CURRENCIES[priority]['code']}
+
+    return {'price': None, 'currency': None}
+
+
+def parse_prices(texts: Iterable[str]) -> List[Dict]:
+    """
+    Version batch de parse_price (retraitement de données stockées).
+
+    Les textes identiques, très fréquents sur un gros export, ne sont parsés qu'une fois.
+    """
+    texts = list(texts)
+    parsed = {text: parse_price(text) for text in set(texts)}
+    return [dict(parsed[text]) for text in texts]
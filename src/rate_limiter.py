@@ -0,0 +1,135 @@
+"""
+Limiteur de débit adaptatif par domaine (AIMD), remplaçant la pause fixe de 2-4 s.
+
+Chaque hôte a son propre débit (requêtes/seconde) :
+- réponse 2xx rapide       → débit + increase (hausse additive, jusqu'à max_rate)
+- 429 / 503, timeout,
+  erreur de proxy          → débit × decrease (baisse multiplicative, jusqu'à min_rate)
+- Retry-After              → plus aucune requête vers l'hôte avant l'heure indiquée
+
+Utilisable par le moteur historique (wait) comme par le moteur asynchrone (wait_async).
+"""
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+# Réponses qui signifient "trop de requêtes"
+THROTTLE_STATUSES = {429, 503}
+
+logger = logging.getLogger(__name__)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """En-tête Retry-After (secondes ou date HTTP) → secondes d'attente"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class _HostState:
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.next_slot = 0.0
+        self.blocked_until = 0.0
+        self.last_backoff = 0.0
+        self.successes = 0
+        self.backoffs = 0
+
+
+class AdaptiveRateLimiter:
+    def __init__(self, initial_rate: float = 2.0, min_rate: float = 0.1, max_rate: float = 10.0,
+                 increase: float = 0.1, decrease: float = 0.5, slow_after: float = 3.0, jitter: float = 0.3):
+        self.initial_rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.slow_after = slow_after
+        self.jitter = jitter
+        self._hosts: Dict[str, _HostState] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, share: int = 1) -> 'AdaptiveRateLimiter':
+        """
+        Limiteur configuré par HOST_RATE (débit de départ) / RATE_MIN / RATE_MAX / RATE_INCREASE / RATE_DECREASE.
+        share : processus qui visent les mêmes domaines (workers distribués), chacun n'a que sa part des débits.
+        """
+        share = max(1, share)
+        return cls(
+            initial_rate=float(os.getenv('HOST_RATE', 2.0)) / share,
+            min_rate=float(os.getenv('RATE_MIN', 0.1)) / share,
+            max_rate=float(os.getenv('RATE_MAX', 10.0)) / share,
+            increase=float(os.getenv('RATE_INCREASE', 0.1)) / share,
+            decrease=float(os.getenv('RATE_DECREASE', 0.5)),
+            slow_after=float(os.getenv('RATE_SLOW_SECONDS', 3.0))
+        )
+
+    def _host(self, host: str) -> _HostState:
+        if host not in self._hosts:
+            self._hosts[host] = _HostState(self.initial_rate)
+        return self._hosts[host]
+
+    def reserve(self, host: str) -> float:
+        """Réserve le prochain créneau de l'hôte, renvoie le délai à attendre (secondes)"""
+        if self.initial_rate <= 0:
+            # HOST_RATE=0 : pas de limite
+            return 0.0
+        with self._lock:
+            state = self._host(host)
+            now = time.monotonic()
+            slot = max(now, state.next_slot, state.blocked_until)
+            state.next_slot = slot + random.uniform(1 - self.jitter, 1 + self.jitter) / state.rate
+        return slot - now
+
+    def wait(self, host: str):
+        delay = self.reserve(host)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def wait_async(self, host: str):
+        delay = self.reserve(host)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def success(self, host: str, elapsed: float):
+        """Réponse reçue : le débit ne monte que si le serveur répond vite"""
+        with self._lock:
+            state = self._host(host)
+            state.successes += 1
+            if elapsed < self.slow_after:
+                state.rate = min(self.max_rate, state.rate + self.increase)
+
+    def backoff(self, host: str, retry_after: Optional[float] = None):
+        """Serveur saturé ou blocage : débit divisé, pause imposée par Retry-After respectée"""
+        now = time.monotonic()
+        with self._lock:
+            state = self._host(host)
+            state.backoffs += 1
+            # Une seule baisse par intervalle : les requêtes déjà en vol ne divisent pas le débit à nouveau
+            if now - state.last_backoff > 1 / state.rate:
+                state.rate = max(self.min_rate, state.rate * self.decrease)
+                state.last_backoff = now
+            if retry_after:
+                state.blocked_until = max(state.blocked_until, now + retry_after)
+        logger.info(f"         🐢 {host}: ralentissement à {state.rate:.2f} req/s"
+                    + (f", reprise dans {retry_after:.0f}s" if retry_after else ""))
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Débit courant et compteurs par hôte (métriques)"""
+        with self._lock:
+            return {
+                host: {'rate': round(state.rate, 3), 'successes': state.successes, 'backoffs': state.backoffs}
+                for host, state in self._hosts.items()
+            }
@@ -0,0 +1,279 @@
+"""
+Gestion des échecs de téléchargement : classification, nouvelles tentatives, disjoncteur, dead-letter.
+
+    timeout      délai dépassé                      → réessayé
+    proxy        proxy injoignable / erreur proxy    → réessayé
+    connection   connexion refusée / coupée          → réessayé
+    throttled    429 / 503                           → réessayé (après Retry-After)
+    banned       403 : IP de sortie bloquée          → réessayé (par un autre proxy)
+    server       autre 5xx                           → réessayé
+    proxy_auth   407 : identifiants du proxy refusés → abandon
+    client       autre 4xx (404, 410…)               → abandon
+    parse        page reçue mais illisible           → abandon
+    circuit_open domaine en panne (disjoncteur)      → abandon immédiat, sans requête
+
+Les abandons (hors 4xx) vont dans un fichier dead-letter NDJSON, repris au lancement suivant.
+"""
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import aiohttp
+import requests
+
+from rate_limiter import THROTTLE_STATUSES
+
+RETRYABLE = {'timeout', 'proxy', 'connection', 'throttled', 'banned', 'server'}
+
+logger = logging.getLogger(__name__)
+
+
+class FetchError(Exception):
+    def __init__(self, url: str, kind: str, message: str = '', status: Optional[int] = None,
+                 retry_after: Optional[float] = None):
+        super().__init__(f"{kind}: {message}" if message else kind)
+        self.url = url
+        self.kind = kind
+        self.message = message
+        self.status = status
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self) -> bool:
+        return self.kind in RETRYABLE
+
+
+def classify_status(status: int) -> Optional[str]:
+    """Type d'erreur d'un code HTTP (None si la réponse est exploitable)"""
+    if status == 407:
+        return 'proxy_auth'
+    if status in THROTTLE_STATUSES:
+        return 'throttled'
+    if status == 403:
+        return 'banned'
+    if 400 <= status < 500:
+        return 'client'
+    if status >= 500:
+        return 'server'
+    return None
+
+
+def classify_exception(exc: Exception) -> str:
+    """Type d'erreur d'une exception requests / aiohttp"""
+    if isinstance(exc, aiohttp.ClientHttpProxyError):
+        return 'proxy_auth' if exc.status == 407 else 'proxy'
+    if isinstance(exc, (requests.exceptions.ProxyError, aiohttp.ClientProxyConnectionError)):
+        return 'proxy'
+    if isinstance(exc, (requests.Timeout, asyncio.TimeoutError)):
+        return 'timeout'
+    if isinstance(exc, (requests.ConnectionError, aiohttp.ClientConnectionError, ConnectionError)):
+        return 'connection'
+    if isinstance(exc, aiohttp.ClientResponseError):
+        return classify_status(exc.status) or 'server'
+    return 'connection'
+
+
+class RetryPolicy:
+    """Attente exponentielle plafonnée avec "full jitter" : uniforme entre 0 et base × 2^tentative"""
+
+    def __init__(self, max_retries: int = 3, base_delay: float = 1.0, max_delay: float = 60.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    @classmethod
+    def from_env(cls) -> 'RetryPolicy':
+        return cls(
+            max_retries=int(os.getenv('RETRY_MAX', 3)),
+            base_delay=float(os.getenv('RETRY_BASE_DELAY', 1.0)),
+            max_delay=float(os.getenv('RETRY_MAX_DELAY', 60.0))
+        )
+
+    def should_retry(self, error: FetchError, attempt: int) -> bool:
+        """attempt = nombre de tentatives déjà faites"""
+        return error.retryable and attempt <= self.max_retries
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        return max(delay, retry_after or 0)
+
+
+class CircuitBreaker:
+    """
+    Disjoncteur par domaine : après failure_threshold échecs consécutifs, plus aucune requête
+    vers le domaine pendant reset_timeout secondes ; ensuite une requête d'essai (semi-ouvert)
+    referme le circuit si elle réussit, le rouvre sinon. Toute issue de l'essai le tranche :
+    succès, échec, ou release_trial() quand elle ne dit rien du domaine.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures: Dict[str, int] = {}
+        self._opened_at: Dict[str, float] = {}
+        self._trial: Dict[str, bool] = {}
+        self._trips: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'CircuitBreaker':
+        return cls(
+            failure_threshold=int(os.getenv('BREAKER_THRESHOLD', 5)),
+            reset_timeout=float(os.getenv('BREAKER_RESET_SECONDS', 60))
+        )
+
+    def allow(self, host: str) -> bool:
+        with self._lock:
+            opened_at = self._opened_at.get(host)
+            if opened_at is None:
+                return True
+            if time.monotonic() - opened_at < self.reset_timeout or self._trial.get(host):
+                return False
+            # Semi-ouvert : une seule requête d'essai
+            self._trial[host] = True
+            return True
+
+    def record_success(self, host: str):
+        with self._lock:
+            self._failures[host] = 0
+            if self._opened_at.pop(host, None) is not None:
+                logger.info(f"         🔌 {host}: circuit refermé")
+            self._trial.pop(host, None)
+
+    def release_trial(self, host: str):
+        """Issue qui ne dit rien de la santé du domaine (4xx, proxy, requête annulée) : l'essai est à refaire"""
+        with self._lock:
+            self._trial.pop(host, None)
+
+    def record_failure(self, host: str):
+        with self._lock:
+            self._failures[host] = self._failures.get(host, 0) + 1
+            if self._trial.pop(host, None) or (
+                    host not in self._opened_at and self._failures[host] >= self.failure_threshold):
+                self._opened_at[host] = time.monotonic()
+                self._trips[host] = self._trips.get(host, 0) + 1
+                logger.warning(f"         ⛔ {host}: circuit ouvert pour {self.reset_timeout:.0f}s "
+                               f"({self._failures[host]} échecs consécutifs)")
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {
+                host: {'open': host in self._opened_at, 'trips': trips}
+                for host, trips in self._trips.items()
+            }
+
+
+class DeadLetterFile:
+    """
+    URLs abandonnées (une ligne JSON par échec), à reprendre lors d'un prochain lancement.
+
+    Le fichier est partagé par les processus pays : ajouts et reprises passent par un verrou
+    fcntl sur un fichier voisin (.lock), le fichier lui-même étant remplacé à chaque réécriture.
+    Une entrée reprise (claim) reste dans le fichier jusqu'à ce que sa reprise aboutisse
+    (retried puis commit, après le fsync de la sortie) : un crash pendant la reprise ne perd rien.
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        # URL reprise → entrée (une entrée plus récente, nouvel échec, n'est pas retirée)
+        self._claimed: Dict[str, Dict] = {}
+        self._retried: Dict[str, float] = {}
+
+    @contextmanager
+    def _locked(self):
+        with self._lock, open(f"{self.path}.lock", 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    @classmethod
+    def from_env(cls) -> Optional['DeadLetterFile']:
+        """Fichier configuré par DEAD_LETTER (défaut STATE_DIR/dead_letter.ndjson, 0 pour désactiver)"""
+        path = os.getenv('DEAD_LETTER', os.path.join(os.getenv('STATE_DIR', '/app/data/state'), 'dead_letter.ndjson'))
+        if path == '0':
+            return None
+        return cls(path)
+
+    def add(self, error: FetchError, attempts: int, url_class: str):
+        entry = {
+            'url': error.url,
+            'url_class': url_class,
+            'kind': error.kind,
+            'status': error.status,
+            'error': error.message[:200],
+            'attempts': attempts,
+            'failed_at': time.time()
+        }
+        with self._locked():
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    def _read(self) -> Dict[str, Dict]:
+        """Entrées du fichier (verrou pris), la plus récente par URL"""
+        entries = {}
+        if os.path.exists(self.path):
+            with open(self.path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    entries[entry['url']] = entry
+        return entries
+
+    def _rewrite(self, entries):
+        fd, tmp = tempfile.mkstemp(prefix=os.path.basename(self.path), dir=os.path.dirname(self.path) or '.')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.writelines(json.dumps(entry, ensure_ascii=False) + '\n' for entry in entries)
+        os.replace(tmp, self.path)
+
+    def claim(self, host: str) -> List[Dict]:
+        """
+        Échecs d'un domaine à reprendre. Ils restent dans le fichier : retirés par commit()
+        une fois marqués retried(), sinon repris au lancement suivant.
+        """
+        with self._locked():
+            entries = self._read()
+            # Une URL en échec plusieurs fois n'y reste qu'une fois
+            self._rewrite(entries.values())
+        claimed = [entry for entry in entries.values() if entry['url'].partition('//')[2].partition('/')[0] == host]
+        with self._lock:
+            self._claimed.update((entry['url'], entry) for entry in claimed)
+        return claimed
+
+    def retried(self, url: str):
+        """Reprise aboutie (annonce écrite, ou disparue) : entrée retirée au prochain commit"""
+        with self._lock:
+            entry = self._claimed.pop(url, None)
+            if entry is not None:
+                self._retried[url] = entry['failed_at']
+
+    def retried_category(self, category_url: str):
+        """Catégorie reparcourue jusqu'au bout : ses pages d'index en échec sont reprises"""
+        with self._lock:
+            urls = [url for url, entry in self._claimed.items()
+                    if entry['url_class'] == 'index' and url.partition('?')[0] == category_url]
+        for url in urls:
+            self.retried(url)
+
+    def commit(self):
+        """À appeler après le fsync de la sortie : retire les entrées reprises avec succès"""
+        with self._lock:
+            retried, self._retried = self._retried, {}
+        if not retried:
+            return
+        with self._locked():
+            entries = self._read()
+            self._rewrite(entry for url, entry in entries.items() if retried.get(url) != entry['failed_at'])
@@ -1,35 +1,46 @@
 import os
+import sys
+import json
+import logging
+import multiprocessing
+from glob import glob
+from queue import Empty
 from dotenv import load_dotenv
 from proxy_manager import ProxyManager
 from locanto_scraper_final import LocantoScraperFinal
-import json
+from listing_stream import write_json_atomic
+from crawl_state import CrawlState
+from scrape_full_country import load_config, print_config, scrape_country as scrape_country_files
+from log_setup import SUMMARY, log_context, setup_logging
 import time
 from datetime import datetime
 import re
-from urllib.parse import urljoin
+
+RUN_NAME = 'all_countries'
+
+logger = logging.getLogger(__name__)
 
 def save_checkpoint(data: dict, filename: str):
-    """Sauvegarde progressive"""
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    """Sauvegarde progressive (fichier temporaire + renommage : jamais de JSON tronqué)"""
+    write_json_atomic(data, filename)
 
 def get_all_country_domains(proxy_manager) -> list:
     """
     Step 1: Récupère TOUS les domaines de pays depuis locanto.info
     """
-    print("="*70)
-    print("🌍 ÉTAPE 1 : RÉCUPÉRATION DES DOMAINES DE TOUS LES PAYS")
-    print("="*70)
+    logger.log(SUMMARY, "="*70)
+    logger.log(SUMMARY, "🌍 ÉTAPE 1 : RÉCUPÉRATION DES DOMAINES DE TOUS LES PAYS")
+    logger.log(SUMMARY, "="*70)
     
     scraper = LocantoScraperFinal(proxy_manager)
     
     # Page index globale
-    index_url = "https://www.locanto.info"
-    print(f"\n📍 Récupération depuis : {index_url}")
+    index_url = os.getenv('INDEX_URL', "https://www.locanto.info")
+    logger.info(f"\n📍 Récupération depuis : {index_url}")
     
     soup = scraper.scrape_page(index_url)
     if not soup:
-        print("❌ Impossible de charger l'index global")
+        logger.error("❌ Impossible de charger l'index global")
         return []
     
     countries = []
@@ -48,9 +59,9 @@ def get_all_country_domains(proxy_manager) -> list:
         # Exemples : www.locanto.ci, www.locanto.com.ng, fr.locanto.be, etc.
         if 'locanto' in href and not 'locanto.info' in href:
             # Extraire le domaine complet
-            domain_match = re.search(r'https?://([^/]+)', href)
+            domain_match = re.search(r'(https?)://([^/]+)', href)
             if domain_match:
-                domain = domain_match.group(1)
+                scheme, domain = domain_match.groups()
                 
                 # Éviter les doublons
                 if domain in seen_domains:
@@ -62,8 +73,8 @@ def get_all_country_domains(proxy_manager) -> list:
                 
                 seen_domains.add(domain)
                 
-                # Construire l'URL complète
-                full_url = f"https://{domain}/"
+                # Construire l'URL complète (schéma du lien : http pour le site de substitution des benchmarks)
+                full_url = f"{scheme}://{domain}/"
                 
                 countries.append({
                     'name': text or domain,
@@ -71,83 +82,76 @@ def get_all_country_domains(proxy_manager) -> list:
                     'url': full_url
                 })
                 
-                print(f"   ✓ {text or domain} → {domain}")
+                logger.debug(f"   ✓ {text or domain} → {domain}")
     
-    print(f"\n📊 Total : {len(countries)} pays trouvés")
+    logger.info(f"\n📊 Total : {len(countries)} pays trouvés")
+    
+    return countries
+
+def filter_countries(countries: list, target_countries: str, skip_countries: str) -> list:
+    """Filtres TARGET_COUNTRIES / SKIP_COUNTRIES (fragments de domaine séparés par des virgules)"""
+    if target_countries:
+        target_list = [c.strip().lower() for c in target_countries.split(',')]
+        countries = [c for c in countries if any(t in c['domain'].lower() for t in target_list)]
+        logger.info(f"\n🎯 {len(countries)} pays après filtre TARGET_COUNTRIES")
+    
+    if skip_countries:
+        skip_list = [c.strip().lower() for c in skip_countries.split(',')]
+        countries = [c for c in countries if not any(s in c['domain'].lower() for s in skip_list)]
+        logger.info(f"\n⏭️  {len(countries)} pays après filtre SKIP_COUNTRIES")
     
     return countries
 
-def scrape_country(scraper, country: dict, config: dict, output_dir: str):
+def country_key(domain: str) -> str:
+    """
+    Clé d'un pays : état de crawl, index des annonces vues, journaux et fichiers de sortie.
+    Le domaine complet, car fr.locanto.be et nl.locanto.be partagent le code pays "be".
+    """
+    return domain.lower()
+
+def scrape_country(country: dict, config: dict, output_dir: str) -> dict:
     """
-    Scrape un pays complet
+    Scrape un pays complet (flux NDJSON + métadonnées, reprise possible)
     """
-    print(f"\n{'='*70}")
-    print(f"🌍 SCRAPING : {country['name']}")
-    print(f"   URL : {country['url']}")
-    print("="*70)
+    logger.info(f"\n{'='*70}")
+    logger.info(f"🌍 SCRAPING : {country['name']}")
+    logger.info(f"   URL : {country['url']}")
+    logger.info("="*70)
     
     start_time = time.time()
     
     try:
-        # Scraper le pays
-        result = scraper.scrape_site(
-            country['url'],
-            max_categories=config['max_categories'],
-            max_listings=config['max_listings'],
-            max_pages=config['max_pages']
-        )
+        # Session, proxy et limiteur de débit propres au pays
+        proxy_manager = ProxyManager()
+        result = scrape_country_files(proxy_manager, country['url'], country_key(country['domain']), output_dir, config)
+        if not result:
+            raise RuntimeError("aucune catégorie trouvée")
+        if result.get('interrupted'):
+            raise RuntimeError("interrompu (reprise au prochain lancement)")
         
-        # Ajouter métadonnées
-        result['country_name'] = country['name']
-        result['country_domain'] = country['domain']
-        
-        # Stats
-        total_listings = sum(len(cat['listings']) for cat in result['categories'])
+        total_listings = result['stats']['total_listings']
         duration = time.time() - start_time
+        filename = f"{result['output_base']}.ndjson"
         
-        result['stats'] = {
-            'total_listings': total_listings,
-            'total_categories': len(result['categories']),
-            'duration_seconds': round(duration, 2),
-            'listings_per_minute': round(total_listings / (duration/60), 2) if duration > 0 else 0
-        }
-        
-        # Nom de fichier basé sur le domaine
-        # Ex: locanto.ci → ci.json, www.locanto.com.ng → ng.json
-        domain_parts = country['domain'].replace('www.', '').split('.')
-        if len(domain_parts) >= 2:
-            if 'locanto' in domain_parts:
-                # Prendre ce qui est après 'locanto'
-                country_code = '.'.join(domain_parts[domain_parts.index('locanto')+1:])
-            else:
-                country_code = domain_parts[-1]
-        else:
-            country_code = country['domain'].replace('.', '_')
-        
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"{output_dir}/{country_code}_{timestamp}.json"
-        
-        # Sauvegarder
-        save_checkpoint(result, filename)
-        
-        print(f"\n{'='*70}")
-        print(f"✅ {country['name']} TERMINÉ")
-        print(f"   📊 {total_listings} annonces en {duration/60:.1f} minutes")
-        print(f"   💾 {filename}")
-        print("="*70)
+        logger.log(SUMMARY, f"\n{'='*70}")
+        logger.log(SUMMARY, f"✅ {country['name']} TERMINÉ")
+        logger.log(SUMMARY, f"   📊 {total_listings} annonces en {duration/60:.1f} minutes")
+        logger.log(SUMMARY, f"   💾 {filename}")
+        logger.log(SUMMARY, "="*70)
         
         return {
             'country': country['name'],
             'domain': country['domain'],
             'success': True,
             'listings': total_listings,
-            'categories': len(result['categories']),
+            'categories': result['stats']['total_categories'],
             'duration': duration,
+            'listings_per_minute': round(total_listings / (duration/60), 2) if duration > 0 else 0,
             'filename': filename
         }
         
     except Exception as e:
-        print(f"\n❌ ERREUR pour {country['name']}: {e}")
+        logger.error(f"\n❌ ERREUR pour {country['name']}: {e}")
         return {
             'country': country['name'],
             'domain': country['domain'],
@@ -155,129 +159,251 @@ def scrape_country(scraper, country: dict, config: dict, output_dir: str):
             'error': str(e)
         }
 
+def country_worker(country: dict, config: dict, output_dir: str, log_file: str, results):
+    """Processus dédié à un pays : un crash ou un blocage n'affecte pas les autres pays"""
+    if log_file:
+        sys.stdout = sys.stderr = open(log_file, 'a', encoding='utf-8', buffering=1)
+    setup_logging()
+    with log_context(country=country_key(country['domain'])):
+        results.put(scrape_country(country, config, output_dir))
+
+def schedule_countries(countries: list, output_dir: str, order: str) -> list:
+    """
+    Ordre de lancement des pays.
+    
+    largest : plus longs d'abord (durée du dernier rapport), pour que les gros pays ne
+    finissent pas seuls en fin de crawl ; les pays jamais crawlés passent en tête.
+    listed  : ordre de locanto.info
+    """
+    if order != 'largest':
+        return countries
+    
+    durations = {}
+    reports = sorted(glob(f"{output_dir}/scraping_report_*.json"))
+    if reports:
+        with open(reports[-1], encoding='utf-8') as f:
+            for r in json.load(f).get('countries', []):
+                if r.get('success'):
+                    durations[r['domain']] = r.get('duration', 0)
+    
+    return sorted(countries, key=lambda c: (c['domain'] in durations, -durations.get(c['domain'], 0)))
+
+def run_countries(countries: list, config: dict, output_dir: str, workers: int, timeout: float, on_result):
+    """
+    Orchestrateur : jusqu'à `workers` pays en parallèle, chacun dans son processus.
+    
+    Un pays qui plante est signalé en erreur, un pays qui dépasse `timeout` secondes
+    est arrêté (son état de crawl permet de le reprendre) ; les autres continuent.
+    """
+    # spawn : interpréteur neuf par pays (aucune session ni connexion héritée)
+    ctx = multiprocessing.get_context('spawn')
+    results = ctx.Queue()
+    pending = list(countries)
+    running = {}
+    received = {}
+    log_dir = os.path.join(output_dir, 'logs')
+    os.makedirs(log_dir, exist_ok=True)
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    
+    def failure(country: dict, error: str) -> dict:
+        return {'country': country['name'], 'domain': country['domain'], 'success': False, 'error': error}
+    
+    try:
+        while pending or running:
+            # Lancer des pays tant qu'il reste des places
+            while pending and len(running) < workers:
+                country = pending.pop(0)
+                log_file = f"{log_dir}/{country_key(country['domain'])}_{timestamp}.log" if workers > 1 else None
+                process = ctx.Process(
+                    target=country_worker,
+                    args=(country, config, output_dir, log_file, results),
+                    name=f"pays-{country['domain']}"
+                )
+                process.start()
+                running[country['domain']] = (process, country, time.time())
+                logger.info(f"\n▶️  {country['name']} lancé ({len(running)}/{workers} en cours, {len(pending)} en attente)"
+                            + (f"\n   📝 {log_file}" if log_file else ""))
+            
+            # Résultats reçus
+            try:
+                result = results.get(timeout=1)
+                received[result['domain']] = result
+            except Empty:
+                pass
+            
+            for domain, (process, country, started) in list(running.items()):
+                if domain in received:
+                    process.join()
+                    del running[domain]
+                    on_result(received.pop(domain))
+                elif not process.is_alive():
+                    # Terminé sans résultat : le résultat est peut-être encore dans la file
+                    try:
+                        while True:
+                            result = results.get(timeout=1)
+                            received[result['domain']] = result
+                    except Empty:
+                        pass
+                    if domain not in received:
+                        del running[domain]
+                        on_result(failure(country, f"processus arrêté (code {process.exitcode})"))
+                elif timeout and time.time() - started > timeout:
+                    logger.warning(f"\n⏱️  {country['name']} : délai de {timeout/60:.0f} min dépassé, arrêt du processus")
+                    process.terminate()
+                    process.join(10)
+                    if process.is_alive():
+                        process.kill()
+                        process.join()
+                    del running[domain]
+                    on_result(failure(country, f"délai dépassé ({timeout:.0f}s)"))
+    finally:
+        # Interruption : chaque pays en cours reprendra grâce à son état de crawl
+        for process, country, _ in running.values():
+            process.terminate()
+        for process, country, _ in running.values():
+            process.join(10)
+
 def main():
     load_dotenv()
+    setup_logging()
     
-    print("="*70)
-    print("🕷️  LOCANTO SCRAPER - SCRAPING MULTI-PAYS AUTOMATIQUE")
-    print("="*70)
+    logger.log(SUMMARY, "="*70)
+    logger.log(SUMMARY, "🕷️  LOCANTO SCRAPER - SCRAPING MULTI-PAYS AUTOMATIQUE")
+    logger.log(SUMMARY, "="*70)
     
     # Init proxy
     proxy_manager = ProxyManager()
     if not proxy_manager.test_proxy():
         return
     
-    scraper = LocantoScraperFinal(proxy_manager)
+    # Config (mêmes variables que scrape_full_country.py)
+    config = load_config()
     
-    # Config
-    config = {
-        'max_categories': int(os.getenv('MAX_CATEGORIES', 999)),
-        'max_listings': int(os.getenv('MAX_LISTINGS', 50)),
-        'max_pages': int(os.getenv('MAX_PAGES', 5))
-    }
+    # Orchestrateur
+    workers = int(os.getenv('COUNTRY_WORKERS', 4))  # Pays scrapés en parallèle (un processus chacun)
+    global_concurrency = int(os.getenv('GLOBAL_CONCURRENCY', 0))  # Plafond de requêtes simultanées, tous pays confondus
+    country_timeout = float(os.getenv('COUNTRY_TIMEOUT', 12 * 3600))  # Secondes max par pays (0 = illimité)
+    schedule = os.getenv('SCHEDULE', 'largest')  # largest = plus gros pays d'abord, listed = ordre de locanto.info
+    
+    if global_concurrency:
+        # Répartition du plafond global entre les pays en cours
+        config['concurrency'] = max(1, global_concurrency // workers)
+        config['detail_workers'] = min(config['detail_workers'], config['concurrency'])
     
     # Filtres optionnels
     target_countries = os.getenv('TARGET_COUNTRIES', '')  # Ex: "ci,ng,gh" pour filtrer
     skip_countries = os.getenv('SKIP_COUNTRIES', '')  # Ex: "de,fr" pour ignorer
     
-    print(f"\n⚙️  CONFIGURATION")
-    print(f"   Catégories max: {config['max_categories'] if config['max_categories'] < 999 else 'TOUTES'}")
-    print(f"   Annonces/catégorie: {config['max_listings']}")
-    print(f"   Pages/catégorie: {config['max_pages']}")
+    logger.log(SUMMARY, f"\n⚙️  CONFIGURATION")
+    print_config(config)
+    logger.log(SUMMARY, f"   Pays en parallèle: {workers} (ordre: {schedule}, délai max/pays: "
+               f"{f'{country_timeout/3600:.1f}h' if country_timeout else 'illimité'})")
+    if global_concurrency:
+        logger.log(SUMMARY, f"   Concurrence globale: {global_concurrency} ({config['concurrency']} par pays)")
     
     if target_countries:
-        print(f"   Filtre pays: {target_countries}")
+        logger.log(SUMMARY, f"   Filtre pays: {target_countries}")
     if skip_countries:
-        print(f"   Ignorer pays: {skip_countries}")
+        logger.log(SUMMARY, f"   Ignorer pays: {skip_countries}")
     
     # Output directory
-    output_dir = '/app/data/countries'
+    output_dir = os.getenv('OUTPUT_DIR', '/app/data/countries')
     os.makedirs(output_dir, exist_ok=True)
     
     # ÉTAPE 1 : Récupérer tous les pays
     countries = get_all_country_domains(proxy_manager)
     
     if not countries:
-        print("\n❌ Aucun pays trouvé")
+        logger.error("\n❌ Aucun pays trouvé")
         return
     
     # Appliquer filtres
-    if target_countries:
-        target_list = [c.strip().lower() for c in target_countries.split(',')]
-        countries = [c for c in countries if any(t in c['domain'].lower() for t in target_list)]
-        print(f"\n🎯 {len(countries)} pays après filtre TARGET_COUNTRIES")
-    
-    if skip_countries:
-        skip_list = [c.strip().lower() for c in skip_countries.split(',')]
-        countries = [c for c in countries if not any(s in c['domain'].lower() for s in skip_list)]
-        print(f"\n⏭️  {len(countries)} pays après filtre SKIP_COUNTRIES")
-    
-    print(f"\n{'='*70}")
-    print(f"🚀 LANCEMENT DU SCRAPING DE {len(countries)} PAYS")
-    print("="*70)
-    
-    # ÉTAPE 2 : Scraper chaque pays
-    results = []
-    global_start = time.time()
-    
-    for i, country in enumerate(countries, 1):
-        print(f"\n\n{'#'*70}")
-        print(f"# PAYS {i}/{len(countries)}")
-        print(f"{'#'*70}")
-        
-        result = scrape_country(scraper, country, config, output_dir)
+    countries = filter_countries(countries, target_countries, skip_countries)
+    
+    logger.log(SUMMARY, f"\n{'='*70}")
+    logger.log(SUMMARY, f"🚀 LANCEMENT DU SCRAPING DE {len(countries)} PAYS")
+    logger.log(SUMMARY, "="*70)
+    
+    # ÉTAPE 2 : Scraper les pays en parallèle
+    # Reprise (RESUME=1) : les pays réussis d'un crawl interrompu ne sont pas refaits
+    state = CrawlState.from_env()
+    previous_run = state.run(RUN_NAME) if state else None
+    if previous_run:
+        results = [r for r in previous_run['results'] if r.get('success')]
+        global_start = previous_run['started_at']
+        logger.log(SUMMARY, f"\n♻️  Reprise du crawl multi-pays : {len(results)} pays déjà terminés")
+    else:
+        results = []
+        global_start = time.time()
+        if state:
+            state.start_run(RUN_NAME, {'config': config, 'results': results})
+    done_domains = {r['domain'] for r in results}
+    
+    todo = [c for c in countries if c['domain'] not in done_domains]
+    todo = schedule_countries(todo, output_dir, schedule)
+    
+    def on_result(result: dict):
         results.append(result)
-        
-        # Pause entre pays
-        if i < len(countries):
-            print(f"\n⏸️  Pause 5 secondes avant le prochain pays...")
-            time.sleep(5)
+        status = f"✅ {result['listings']} annonces en {result['duration']/60:.1f} min" if result.get('success') \
+            else f"❌ {result.get('error')}"
+        logger.log(SUMMARY, f"\n🏁 [{len(results)}/{len(countries)}] {result['country']} : {status}")
+        if state:
+            state.save_run(RUN_NAME, {'config': config, 'results': results})
+    
+    try:
+        run_countries(todo, config, output_dir, workers, country_timeout, on_result)
+    except KeyboardInterrupt:
+        logger.warning(f"\n\n⚠️ Interruption utilisateur : relancer pour reprendre")
+        return
     
     # RAPPORT FINAL
     global_duration = time.time() - global_start
     
-    print(f"\n\n{'='*70}")
-    print(f"🎉 SCRAPING MULTI-PAYS TERMINÉ")
-    print("="*70)
+    logger.log(SUMMARY, f"\n\n{'='*70}")
+    logger.log(SUMMARY, f"🎉 SCRAPING MULTI-PAYS TERMINÉ")
+    logger.log(SUMMARY, "="*70)
     
     success_count = sum(1 for r in results if r.get('success'))
     total_listings = sum(r.get('listings', 0) for r in results if r.get('success'))
     
-    print(f"\n📊 STATISTIQUES GLOBALES:")
-    print(f"   • Durée totale: {global_duration/60:.1f} minutes ({global_duration/3600:.1f}h)")
-    print(f"   • Pays réussis: {success_count}/{len(countries)}")
-    print(f"   • Annonces totales: {total_listings}")
-    print(f"   • Vitesse moyenne: {total_listings/(global_duration/60):.1f} annonces/min")
+    logger.log(SUMMARY, f"\n📊 STATISTIQUES GLOBALES:")
+    logger.log(SUMMARY, f"   • Durée totale: {global_duration/60:.1f} minutes ({global_duration/3600:.1f}h)")
+    logger.log(SUMMARY, f"   • Pays réussis: {success_count}/{len(countries)}")
+    logger.log(SUMMARY, f"   • Annonces totales: {total_listings}")
+    logger.log(SUMMARY, f"   • Vitesse moyenne: {total_listings/(global_duration/60):.1f} annonces/min")
     
-    print(f"\n📈 TOP 10 PAYS PAR NOMBRE D'ANNONCES:")
+    logger.log(SUMMARY, f"\n📈 TOP 10 PAYS PAR NOMBRE D'ANNONCES:")
     top_countries = sorted([r for r in results if r.get('success')], 
                           key=lambda x: x.get('listings', 0), reverse=True)[:10]
     for i, r in enumerate(top_countries, 1):
-        print(f"   {i}. {r['country']}: {r['listings']} annonces")
+        logger.log(SUMMARY, f"   {i}. {r['country']}: {r['listings']} annonces")
     
     # Pays en erreur
     failed = [r for r in results if not r.get('success')]
     if failed:
-        print(f"\n⚠️  PAYS EN ERREUR ({len(failed)}):")
+        logger.log(SUMMARY, f"\n⚠️  PAYS EN ERREUR ({len(failed)}):")
         for r in failed:
-            print(f"   • {r['country']}: {r.get('error', 'Unknown error')}")
+            logger.log(SUMMARY, f"   • {r['country']}: {r.get('error', 'Unknown error')}")
     
     # Sauvegarder rapport global
     report_file = f"{output_dir}/scraping_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
     report = {
-        'start_time': datetime.now().isoformat(),
+        'start_time': datetime.fromtimestamp(global_start).isoformat(),
         'duration_seconds': global_duration,
-        'config': config,
+        'config': dict(config, country_workers=workers, global_concurrency=global_concurrency, schedule=schedule),
         'total_countries': len(countries),
         'successful_countries': success_count,
         'total_listings': total_listings,
         'countries': results
     }
     save_checkpoint(report, report_file)
+    if state:
+        state.save_run(RUN_NAME, {'config': config, 'results': results, 'report': report_file}, status='done')
+        state.close()
     
-    print(f"\n💾 Rapport global: {report_file}")
-    print(f"📁 Données pays: {output_dir}/")
-    print("="*70)
+    logger.log(SUMMARY, f"\n💾 Rapport global: {report_file}")
+    logger.log(SUMMARY, f"📁 Données pays: {output_dir}/")
+    logger.log(SUMMARY, "="*70)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,182 +1,585 @@
+import logging
 import os
 from dotenv import load_dotenv
 from proxy_manager import ProxyManager
 from locanto_scraper_final import LocantoScraperFinal
-import json
+from async_scraper import AsyncLocantoScraper
+from pipeline import CrawlPipeline
+from http_cache import ResponseCache
+from seen_index import SeenIndex
+from dedup import ListingDedup
+from discovery import ListingDiscovery
+from listing_stream import ListingStreamWriter
+from listing_store import ListingStore
+from crawl_state import CountryProgress, CrawlState
+from rate_limiter import AdaptiveRateLimiter
+from retry_policy import DeadLetterFile
+from metrics import Metrics
+from columnar_export import ColumnarExporter
+from log_setup import SUMMARY, setup_logging
+import asyncio
 import time
 from datetime import datetime
+from typing import List, Optional
+from urllib.parse import urlsplit
 
-def save_checkpoint(data: dict, filename: str):
-    """Sauvegarde progressive"""
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+logger = logging.getLogger(__name__)
 
-def main():
-    load_dotenv()
-    
-    print("="*70)
-    print("🕷️  LOCANTO SCRAPER - PRODUCTION - SCRAPING COMPLET")
-    print("="*70)
-    
-    # Init
-    proxy_manager = ProxyManager()
-    if not proxy_manager.test_proxy():
+def add_category(result: dict, cat_data: dict) -> bool:
+    """Ajoute une catégorie aux métadonnées (sauf si elle n'a aucune annonce)"""
+    if not cat_data['listings_found']:
+        return False
+    result['categories'].append(cat_data)
+    result['stats']['total_listings'] += cat_data['listings_scraped']
+    result['stats']['total_categories'] += 1
+    result['stats']['errors'] += cat_data['errors']
+    return True
+
+def record_category(result: dict, cat_data: dict, index: int, writer: ListingStreamWriter,
+                    progress: Optional[CountryProgress] = None, dead_letter: Optional[DeadLetterFile] = None):
+    """
+    Catégorie terminée (sans ses annonces, déjà écrites en flux) : checkpoint et dead-letter,
+    même vide (catégorie reprise sans nouvelle annonce), puis métadonnées si elle a des annonces
+    """
+    if dead_letter:
+        # Pages d'index en échec lors d'un lancement précédent : relues avec la catégorie
+        dead_letter.retried_category(cat_data['url'])
+    if progress:
+        # Annonces sur disque avant de marquer la catégorie terminée
+        writer.sync()
+        progress.category_done(cat_data)
+    if not add_category(result, cat_data):
         return
     
-    scraper = LocantoScraperFinal(proxy_manager)
-    
-    # Config
-    site_url = os.getenv('SITE_URL', 'https://abidjan.locanto.ci/')
-    max_categories = int(os.getenv('MAX_CATEGORIES', 999))  # Toutes les catégories
-    max_listings = int(os.getenv('MAX_LISTINGS', 50))  # 50 annonces par catégorie
-    max_pages = int(os.getenv('MAX_PAGES', 5))  # 5 pages par catégorie
-    
-    print(f"\n⚙️  CONFIGURATION")
-    print(f"   Site: {site_url}")
-    print(f"   Catégories max: {max_categories if max_categories < 999 else 'TOUTES'}")
-    print(f"   Annonces/catégorie: {max_listings}")
-    print(f"   Pages/catégorie: {max_pages}")
-    
-    # Timestamp
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    country = site_url.split('//')[1].split('.')[0].replace('www', 'main')
-    
-    output_dir = '/app/data/full_scrapes'
-    os.makedirs(output_dir, exist_ok=True)
-    
-    filename = f"{output_dir}/{country}_{timestamp}.json"
-    
-    print(f"   Sortie: {filename}")
-    print(f"\n{'='*70}")
-    
-    start_time = time.time()
-    
-    # Début du scraping
-    result = {
-        'site_url': site_url,
-        'scrape_date': datetime.now().isoformat(),
-        'config': {
-            'max_categories': max_categories,
-            'max_listings_per_category': max_listings,
-            'max_pages_per_category': max_pages
-        },
-        'categories': [],
-        'stats': {
-            'total_listings': 0,
-            'total_categories': 0,
-            'errors': 0
-        }
-    }
-    
-    print(f"\n🌍 SCRAPING: {site_url}\n")
-    print("="*70)
+    # Sauvegarde progressive tous les 5 catégories (métadonnées seulement)
+    if index % 5 == 0:
+        writer.write_meta(result)
+        logger.info(f"\n   💾 Checkpoint sauvegardé ({index} catégories)")
+
+def retry_categories(site_url: str, failed: List[dict]) -> List[dict]:
+    """
+    Reprise des échecs d'un lancement précédent (dead-letter) : pseudo-catégorie des annonces
+    abandonnées, puis catégories dont une page d'index a échoué (reparcourues en entier).
+    """
+    listing_urls = [entry['url'] for entry in failed if entry['url_class'] == 'listing']
+    retry = [{'name': 'Reprise des échecs précédents', 'url': f"{site_url}#dead-letter", 'listing_urls': listing_urls}] if listing_urls else []
+    for category_url in dict.fromkeys(entry['url'].partition('?')[0] for entry in failed if entry['url_class'] == 'index'):
+        retry.append({'name': f"Reprise de {urlsplit(category_url).path}", 'url': category_url})
+    return retry
+
+def plan_categories(scraper, site_url: str, categories: List[dict], max_categories: int,
+                    retry: List[dict]) -> List[dict]:
+    """Ordre de crawl : reprises du dead-letter, catégories retenues, annonces des sitemaps hors catégories"""
+    selected = categories[:max_categories]
+    names = {cat['url']: cat['name'] for cat in categories}
+    urls = {cat['url'] for cat in selected}
+    retry_first = []
+    for cat in retry:
+        if 'listing_urls' not in cat and cat['url'] not in names:
+            # Page d'accueil, sitemap ou catégorie disparue : déjà relue (ou à nouveau en échec, donc réinscrite)
+            scraper.dead_letter.retried_category(cat['url'])
+        elif cat['url'] not in urls:
+            # Catégorie à reprendre déjà retenue : parcourue à sa place habituelle
+            retry_first.append(dict(cat, name=names.get(cat['url'], cat['name'])))
+    sitemap = sitemap_category(scraper, site_url, categories)
+    return retry_first + selected + ([sitemap] if sitemap else [])
+
+def write_listing(writer: ListingStreamWriter, listing: dict, category: dict, scraper):
+    """Écrit une annonce ; index incrémental et dead-letter mis à jour au prochain fsync"""
+    # Mis en attente avant l'écriture : le fsync qu'elle peut déclencher les enregistre aussi
+    scraper.mark_seen(listing)
+    if scraper.dead_letter:
+        # Annonce du dead-letter reprise : retirée du fichier
+        scraper.dead_letter.retried(listing['url'])
+    writer.write_listing(listing, category['url'])
+
+def sitemap_category(scraper, site_url: str, categories: List[dict]) -> Optional[dict]:
+    """Pseudo-catégorie des annonces des sitemaps et flux qui ne relèvent d'aucune catégorie du site"""
+    if scraper.discovery is None:
+        return None
+    listing_urls = scraper.discovery.unassigned_urls(site_url, [cat['url'] for cat in categories])
+    listing_urls = scraper.unseen_listing_urls(listing_urls)
+    if not listing_urls:
+        return None
+    logger.info(f"   🗺️  {len(listing_urls)} annonces des sitemaps hors catégories")
+    return {'name': 'Plan du site', 'url': f"{site_url}#sitemap", 'listing_urls': listing_urls}
+
+def record_failures(result: dict, scraper):
+    result['stats']['failures'] = dict(scraper.failures)
+    result['stats']['circuit_breaker'] = scraper.breaker.snapshot()
+    result['stats']['proxies'] = scraper.proxy_pool.snapshot()
+    result['stats']['transport'] = scraper.transport.snapshot()
+
+def scrape_categories(scraper, site_url: str, result: dict, writer: ListingStreamWriter, config: dict,
+                      progress: Optional[CountryProgress] = None, retry: Optional[List[dict]] = None) -> bool:
+    """Moteur historique : une requête à la fois"""
+    max_categories = config['max_categories']
+    max_listings = config['max_listings']
+    max_pages = config['max_pages']
     
-    # Extraire catégories
     categories = scraper.get_categories(site_url)
     
     if not categories:
-        print("❌ Aucune catégorie trouvée")
-        return
+        return False
     
-    total_cats = min(len(categories), max_categories)
+    if scraper.discovery:
+        scraper.explore_site(site_url)
+    categories = plan_categories(scraper, site_url, categories, max_categories, retry or [])
+    total_cats = len(categories)
+    done = {cat['url'] for cat in progress.done_categories()} if progress else set()
     
-    # Scraper chaque catégorie
-    for i, category in enumerate(categories[:max_categories], 1):
+    for i, category in enumerate(categories, 1):
+        if category['url'] in done:
+            logger.info(f"\n⏭️  [{i}/{total_cats}] {category['name']} (terminée avant l'interruption)")
+            continue
+        
         try:
-            print(f"\n{'='*70}")
-            print(f"📁 [{i}/{total_cats}] {category['name']}")
-            print(f"   {category['url']}")
-            print("="*70)
+            logger.info(f"\n{'='*70}")
+            logger.info(f"📁 [{i}/{total_cats}] {category['name']}")
+            logger.info(f"   {category['url']}")
+            logger.info("="*70)
             
             # Extraire URLs annonces
-            listing_urls = scraper.get_listings_from_category(category['url'], max_pages=max_pages)
-            print(f"\n   📋 {len(listing_urls)} URLs collectées")
+            if 'listing_urls' in category:
+                listing_urls = category['listing_urls']
+            else:
+                listing_urls = scraper.get_listings_from_category(category['url'], max_pages=max_pages)
+            logger.info(f"\n   📋 {len(listing_urls)} URLs collectées")
             
             if not listing_urls:
-                print(f"   ⚠️ Aucune annonce dans cette catégorie")
-                continue
+                logger.warning(f"   ⚠️ Aucune {'nouvelle ' if scraper.seen else ''}annonce dans cette catégorie")
             
-            # Extraire détails
-            listings = []
+            # Extraire détails (écrits en flux, seul le compteur reste en mémoire)
+            scraped = 0
             errors = 0
             
-            for j, url in enumerate(listing_urls[:max_listings], 1):
-                print(f"   [{j}/{min(max_listings, len(listing_urls))}]", end=' ')
+            # Annonces déjà prises par une autre catégorie écartées avant d'appliquer la limite
+            to_scrape = scraper.claim_listing_urls(listing_urls, None if 'listing_urls' in category else max_listings)
+            already_done = progress.enqueue(category['url'], to_scrape) if progress else set()
+            
+            for j, url in enumerate(to_scrape, 1):
+                if url in already_done:
+                    scraped += 1
+                    continue
+                
+                logger.debug(f"   [{j}/{len(to_scrape)}] {url}")
                 
                 try:
                     details = scraper.get_listing_details(url)
                     if details:
-                        listings.append(details)
+                        write_listing(writer, details, category, scraper)
+                        scraped += 1
+                        if progress:
+                            progress.listing_done(url)
                 except Exception as e:
                     errors += 1
-                    print(f"      ❌ Erreur: {str(e)[:40]}")
+                    logger.error(f"      ❌ Erreur: {str(e)[:40]}")
             
-            cat_data = {
+            record_category(result, {
                 'name': category['name'],
                 'url': category['url'],
                 'listings_found': len(listing_urls),
-                'listings_scraped': len(listings),
-                'listings': listings,
+                'listings_scraped': scraped,
                 'errors': errors
-            }
-            
-            result['categories'].append(cat_data)
-            result['stats']['total_listings'] += len(listings)
-            result['stats']['total_categories'] += 1
-            result['stats']['errors'] += errors
+            }, i, writer, progress, scraper.dead_letter)
             
-            # Sauvegarde progressive tous les 5 catégories
-            if i % 5 == 0:
-                save_checkpoint(result, filename)
-                print(f"\n   💾 Checkpoint sauvegardé ({i} catégories)")
-            
-            print(f"\n   ✅ {len(listings)} annonces extraites ({errors} erreurs)")
-            
-            # Pause entre catégories
-            if i < total_cats:
-                time.sleep(3)
+            logger.info(f"\n   ✅ {scraped} annonces extraites ({errors} erreurs)")
+            # Pas de pause entre catégories : le débit est réglé par rate_limiter, requête par requête
         
         except KeyboardInterrupt:
-            print(f"\n\n⚠️ Interruption utilisateur")
+            logger.warning(f"\n\n⚠️ Interruption utilisateur")
+            result['interrupted'] = True
             break
         except Exception as e:
-            print(f"\n   ❌ Erreur catégorie: {e}")
+            logger.error(f"\n   ❌ Erreur catégorie: {e}")
             result['stats']['errors'] += 1
             continue
     
-    # Sauvegarde finale
-    save_checkpoint(result, filename)
+    record_failures(result, scraper)
+    return True
+
+async def scrape_categories_async(proxy_manager, site_url: str, result: dict, writer: ListingStreamWriter, config: dict,
+                                  cache: Optional[ResponseCache] = None, seen: Optional[SeenIndex] = None,
+                                  progress: Optional[CountryProgress] = None,
+                                  rate_limiter: Optional[AdaptiveRateLimiter] = None,
+                                  dead_letter: Optional[DeadLetterFile] = None, retry: Optional[List[dict]] = None,
+                                  dedup: Optional[ListingDedup] = None,
+                                  discovery: Optional[ListingDiscovery] = None) -> bool:
+    """Moteur asynchrone : pipeline catégories → pages d'index → annonces"""
+    async with AsyncLocantoScraper(
+        proxy_manager,
+        concurrency=config['concurrency'],
+        per_host_concurrency=config['per_host_concurrency'],
+        host_rate=config['host_rate'],
+        parse_workers=config['parse_workers'],
+        extractor=config['extractor'],
+        cache=cache,
+        seen=seen,
+        rate_limiter=rate_limiter,
+        dead_letter=dead_letter,
+        dedup=dedup,
+        discovery=discovery
+    ) as scraper:
+        if progress:
+            # Reprise : annonces écrites avant l'interruption, d'après le dernier checkpoint
+            scraper.visited_urls = progress.visited_urls()
+        categories = await scraper.get_categories(site_url)
+        
+        if not categories:
+            return False
+        
+        pipeline = CrawlPipeline(
+            scraper,
+            max_pages=config['max_pages'],
+            max_listings=config['max_listings'],
+            index_workers=config['index_workers'],
+            detail_workers=config['detail_workers'],
+            queue_size=config['queue_size'],
+            on_category=lambda cat_data: record_category(
+                result, cat_data, result['stats']['total_categories'] + 1, writer, progress, dead_letter
+            ),
+            on_listing=lambda listing, category: write_listing(writer, listing, category, scraper),
+            progress=progress
+        )
+        if discovery:
+            await scraper.explore_site(site_url)
+        await pipeline.run(plan_categories(scraper, site_url, categories, config['max_categories'], retry or []))
+        record_failures(result, scraper)
+    
+    return True
+
+def load_config() -> dict:
+    """Configuration du crawl d'un pays (variables d'environnement)"""
+    concurrency = int(os.getenv('CONCURRENCY', 10))  # Requêtes simultanées (toutes destinations)
+    return {
+        'max_categories': int(os.getenv('MAX_CATEGORIES', 999)),  # Toutes les catégories
+        'max_listings': int(os.getenv('MAX_LISTINGS', 50)),  # 50 annonces par catégorie
+        'max_pages': int(os.getenv('MAX_PAGES', 5)),  # 5 pages par catégorie
+        'engine': os.getenv('ENGINE', 'async'),  # async = requêtes concurrentes, sync = historique
+        'concurrency': concurrency,
+        'per_host_concurrency': int(os.getenv('PER_HOST_CONCURRENCY', 5)),  # Requêtes simultanées par domaine
+        'host_rate': float(os.getenv('HOST_RATE', 2.0)),  # Requêtes/seconde par domaine au départ (adaptatif)
+        'index_workers': int(os.getenv('INDEX_WORKERS', 2)),  # Catégories parcourues en parallèle
+        'detail_workers': int(os.getenv('DETAIL_WORKERS', concurrency)),  # Annonces téléchargées en parallèle
+        'queue_size': int(os.getenv('QUEUE_SIZE', 100)),  # Taille des files entre étages
+        'parse_workers': int(os.getenv('PARSE_WORKERS', 0)),  # Processus de parsing (0 = dans la boucle principale)
+        'extractor': os.getenv('EXTRACTOR', 'bs4'),  # Backend d'extraction : bs4 (référence) ou lxml (rapide)
+        'flush_every': int(os.getenv('FLUSH_EVERY', 100)),  # Annonces écrites entre deux fsync du flux NDJSON
+        'ndjson': os.getenv('OUTPUT_NDJSON', '1') == '1'  # 0 = annonces dans LISTING_DB seulement
+    }
+
+def print_config(config: dict):
+    max_categories = config['max_categories']
+    logger.log(SUMMARY, f"   Catégories max: {max_categories if max_categories < 999 else 'TOUTES'}")
+    logger.log(SUMMARY, f"   Annonces/catégorie: {config['max_listings']}")
+    logger.log(SUMMARY, f"   Pages/catégorie: {config['max_pages']}")
+    logger.log(SUMMARY, f"   Moteur: {config['engine']}")
+    logger.log(SUMMARY, f"   Extracteur: {config['extractor']}")
+    if config['engine'] == 'async':
+        logger.log(SUMMARY, f"   Concurrence: {config['concurrency']} (max {config['per_host_concurrency']}/domaine, "
+                   f"{config['host_rate']} req/s/domaine au départ)")
+        logger.log(SUMMARY, f"   Pipeline: {config['index_workers']} workers index, {config['detail_workers']} workers annonces, "
+                   f"files de {config['queue_size']}")
+        parse_workers = config['parse_workers']
+        logger.log(SUMMARY, f"   Parsing: {f'{parse_workers} processus' if parse_workers else 'boucle principale'}")
+
+def scrape_country(proxy_manager, site_url: str, country: str, output_dir: str, config: dict) -> Optional[dict]:
+    """
+    Scrape un pays vers <output_dir>/<country>_<date>.ndjson (+ .meta.json).
     
-    # Stats finales
-    duration = time.time() - start_time
+    Reprend un crawl interrompu du même pays si l'état de crawl est activé.
+    Renvoie le résultat (métadonnées, sans les annonces) ou None si aucune catégorie.
+    """
+    engine = config['engine']
     
-    print(f"\n{'='*70}")
-    print(f"✅ SCRAPING TERMINÉ")
-    print("="*70)
-    print(f"\n📊 STATISTIQUES:")
-    print(f"   • Durée totale: {duration/60:.1f} minutes")
-    print(f"   • Catégories scrapées: {result['stats']['total_categories']}")
-    print(f"   • Annonces extraites: {result['stats']['total_listings']}")
-    print(f"   • Erreurs: {result['stats']['errors']}")
-    print(f"   • Vitesse: {result['stats']['total_listings']/(duration/60):.1f} annonces/min")
+    # Cache HTTP persistant (HTTP_CACHE=0 pour le désactiver)
+    cache = ResponseCache.from_env()
     
-    # Top catégories
-    print(f"\n📈 TOP 5 CATÉGORIES:")
-    top_cats = sorted(result['categories'], key=lambda x: len(x['listings']), reverse=True)[:5]
-    for i, cat in enumerate(top_cats, 1):
-        print(f"   {i}. {cat['name']}: {len(cat['listings'])} annonces")
+    # Timestamp
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     
-    print(f"\n💾 Fichier: {filename}")
-    print(f"\n{'='*70}")
+    # Mode incrémental (INCREMENTAL=1) : index persistant des annonces déjà scrapées
+    seen = SeenIndex.from_env(country)
     
-    # Générer rapport CSV
-    csv_filename = filename.replace('.json', '_summary.csv')
+    # Déduplication entre catégories (IDs) et des reposts (empreinte SimHash), DEDUP=0 pour la désactiver
+    dedup = ListingDedup.from_env()
+    
+    # Sitemaps et flux RSS/Atom avant la pagination HTML (DISCOVERY=pages pour s'en passer)
+    discovery = ListingDiscovery.from_env()
+    
+    # Débit adaptatif par domaine (HOST_RATE au départ, entre RATE_MIN et RATE_MAX)
+    rate_limiter = AdaptiveRateLimiter.from_env()
+    
+    # Échecs d'un lancement précédent : repris en premier, retirés du fichier une fois sur disque
+    dead_letter = DeadLetterFile.from_env()
+    failed = dead_letter.claim(urlsplit(site_url).netloc) if dead_letter else []
+    retry = retry_categories(site_url, failed)
+    
+    os.makedirs(output_dir, exist_ok=True)
+    
+    # Reprise (RESUME=1) : un crawl interrompu du même pays continue dans les mêmes fichiers
+    state = CrawlState.from_env()
+    progress = state.resume_country(country, site_url) if state else None
+    if progress:
+        info = progress.info
+        base = info['output_base']
+        scrape_date = datetime.fromtimestamp(info['started_at']).isoformat()
+    else:
+        base = f"{output_dir}/{country}_{timestamp}"
+        scrape_date = datetime.now().isoformat()
+        if state:
+            progress = state.start_country(country, site_url, base)
+    
+    # Sortie en flux : <base>.ndjson (annonces) + <base>.meta.json (catégories, stats)
+    # et/ou base SQLite partagée (LISTING_DB), commitée au rythme des fsync
+    store = ListingStore.from_env(urlsplit(site_url).netloc)
+    if not store and not config['ndjson']:
+        logger.warning("   ⚠️ OUTPUT_NDJSON=0 sans LISTING_DB : sortie NDJSON conservée")
+    def on_sync():
+        # Annonces sur disque : avancement, index incrémental et reprises du dead-letter enregistrés
+        if progress:
+            progress.commit()
+        if seen:
+            seen.commit()
+        if dead_letter:
+            dead_letter.commit()
+    
+    writer = ListingStreamWriter(base, flush_every=config['flush_every'], on_sync=on_sync,
+                                 store=store, ndjson=config['ndjson'])
+    
+    if writer.ndjson:
+        logger.log(SUMMARY, f"   Sortie: {writer.paths['listings']} (+ {os.path.basename(writer.paths['meta'])})")
+    else:
+        logger.log(SUMMARY, f"   Sortie: {os.path.basename(writer.paths['meta'])} (annonces en base uniquement)")
+    if store:
+        logger.log(SUMMARY, f"   Base annonces: {store.path} ({store.count()} annonces connues pour {store.domain})")
+    if state:
+        resumed = progress.done_categories()
+        if resumed or progress.pending_count():
+            logger.log(SUMMARY, f"   ♻️  Reprise: {len(resumed)} catégories terminées, "
+                       f"{progress.pending_count()} annonces en attente ({state.path})")
+        else:
+            logger.log(SUMMARY, f"   État de crawl: {state.path}")
+    if cache:
+        logger.log(SUMMARY, f"   Cache HTTP: {cache.path} (TTL index {cache.ttls['index']}s, annonces {cache.ttls['listing']}s, "
+                   f"max {cache.max_bytes // 1024**2} Mo)")
+    if failed:
+        retry_listings = sum(1 for entry in failed if entry['url_class'] == 'listing')
+        logger.log(SUMMARY, f"   🔁 Dead-letter: {retry_listings} annonces en échec reprises "
+                   f"({len(failed) - retry_listings} pages d'index relues avec leur catégorie)")
+    if seen:
+        refresh = f"{seen.refresh_after // 86400} j" if seen.refresh_after else 'jamais'
+        logger.log(SUMMARY, f"   Incrémental: {seen.path} ({seen.count()} annonces connues, rafraîchissement: {refresh})")
+    if dedup:
+        logger.log(SUMMARY, f"   Doublons: IDs entre catégories, reposts à distance <= {dedup.max_distance} "
+                   f"({dedup.near}, empreintes {'en mémoire' if dedup.path == ':memory:' else dedup.path})")
+    logger.log(SUMMARY, f"\n{'='*70}")
+    
+    start_time = time.time()
+    
+    # Début du scraping
+    result = {
+        'site_url': site_url,
+        'scrape_date': scrape_date,
+        'output_base': base,
+        'listings_file': os.path.basename(writer.paths['listings']) if writer.ndjson else None,
+        'config': {
+            'max_categories': config['max_categories'],
+            'max_listings_per_category': config['max_listings'],
+            'max_pages_per_category': config['max_pages'],
+            'engine': engine,
+            'concurrency': config['concurrency'] if engine == 'async' else 1,
+            'incremental': seen is not None
+        },
+        'categories': [],
+        'stats': {
+            'total_listings': 0,
+            'total_categories': 0,
+            'errors': 0
+        }
+    }
+    
+    # Catégories terminées avant l'interruption : déjà dans le flux
+    for cat_data in (progress.done_categories() if progress else []):
+        add_category(result, cat_data)
+    
+    logger.log(SUMMARY, f"\n🌍 SCRAPING: {site_url}\n")
+    logger.log(SUMMARY, "="*70)
+    
+    # Extraire catégories et scraper chaque catégorie
+    if engine == 'async':
+        try:
+            completed = asyncio.run(scrape_categories_async(
+                proxy_manager, site_url, result, writer, config, cache=cache, seen=seen, progress=progress,
+                rate_limiter=rate_limiter, dead_letter=dead_letter, retry=retry, dedup=dedup, discovery=discovery
+            ))
+        except KeyboardInterrupt:
+            logger.warning(f"\n\n⚠️ Interruption utilisateur")
+            result['interrupted'] = True
+            completed = True
+    else:
+        scraper = LocantoScraperFinal(proxy_manager, extractor=config['extractor'], cache=cache, seen=seen,
+                                      rate_limiter=rate_limiter, dead_letter=dead_letter, dedup=dedup,
+                                      discovery=discovery, page_workers=config['per_host_concurrency'])
+        if progress:
+            # Reprise : annonces écrites avant l'interruption, d'après le dernier checkpoint
+            scraper.visited_urls = progress.visited_urls()
+        completed = scrape_categories(scraper, site_url, result, writer, config, progress, retry)
+    
+    result['stats']['rate_limits'] = rate_limiter.snapshot()
+    result['stats']['metrics'] = Metrics.shared().snapshot()
+    if cache:
+        result['stats']['cache'] = dict(cache.stats)
+        cache.close()
+    if seen:
+        # Dernières annonces sur disque et dans l'index avant de le fermer
+        writer.sync()
+        result['stats']['incremental'] = dict(seen.stats)
+        seen.close()
+    if discovery:
+        result['stats']['discovery'] = dict(discovery.stats)
+    if dedup:
+        result['stats']['dedup'] = dedup.snapshot()
+        # Grappes de ce crawl : URL de l'originale → reposts
+        result['duplicate_clusters'] = dict(dedup.clusters)
+        dedup.close()
+    if store:
+        # Même dict : complété par le dernier commit (write_meta) avant d'être écrit
+        result['stats']['store'] = store.stats
+    
+    if not completed:
+        writer.close()
+        if state:
+            state.close()
+        return None
+    
+    result['stats']['duration_seconds'] = round(time.time() - start_time, 2)
+    
+    # Sauvegarde finale
+    writer.write_meta(result)
+    writer.close()
+    if state:
+        # Interrompu : le prochain lancement reprendra ici
+        if not result.get('interrupted'):
+            state.finish_country(country)
+        state.close()
+    
+    # Export colonnaire (EXPORT_DIR) : crawls terminés seulement, un crawl repris est exporté à la fin
+    exporter = ColumnarExporter.from_env()
+    if exporter and writer.ndjson and not result.get('interrupted'):
+        try:
+            target, count = exporter.export(writer.paths['meta'], force=True)
+            logger.log(SUMMARY, f"   📦 Export {exporter.fmt}: {target} ({count} annonces)")
+        except Exception as e:
+            # Le NDJSON reste la référence : l'export se refait avec columnar_export.py
+            logger.error(f"   ❌ Export {exporter.fmt} impossible: {e}")
+    
+    return result
+
+def write_csv_summary(result: dict, csv_filename: str):
     with open(csv_filename, 'w', encoding='utf-8') as f:
         f.write("Catégorie,URL,Annonces Trouvées,Annonces Extraites,Erreurs\n")
         for cat in result['categories']:
             f.write(f'"{cat["name"]}","{cat["url"]}",{cat["listings_found"]},{cat["listings_scraped"]},{cat["errors"]}\n')
+
+def main():
+    load_dotenv()
+    setup_logging()
+    
+    logger.log(SUMMARY, "="*70)
+    logger.log(SUMMARY, "🕷️  LOCANTO SCRAPER - PRODUCTION - SCRAPING COMPLET")
+    logger.log(SUMMARY, "="*70)
+    
+    # Init
+    proxy_manager = ProxyManager()
+    if not proxy_manager.test_proxy():
+        return
+    
+    # Config
+    site_url = os.getenv('SITE_URL', 'https://abidjan.locanto.ci/')
+    config = load_config()
+    
+    logger.log(SUMMARY, f"\n⚙️  CONFIGURATION")
+    logger.log(SUMMARY, f"   Site: {site_url}")
+    print_config(config)
+    Metrics.shared().export_from_env()
+    
+    country = site_url.split('//')[1].split('.')[0].replace('www', 'main')
+    result = scrape_country(proxy_manager, site_url, country, os.getenv('OUTPUT_DIR', '/app/data/full_scrapes'), config)
+    
+    if not result:
+        logger.error("❌ Aucune catégorie trouvée")
+        return
+    
+    base = result['output_base']
+    stats = result['stats']
+    duration = stats['duration_seconds']
+    
+    logger.log(SUMMARY, f"\n{'='*70}")
+    logger.log(SUMMARY, f"✅ SCRAPING TERMINÉ")
+    logger.log(SUMMARY, "="*70)
+    logger.log(SUMMARY, f"\n📊 STATISTIQUES:")
+    logger.log(SUMMARY, f"   • Durée totale: {duration/60:.1f} minutes")
+    logger.log(SUMMARY, f"   • Catégories scrapées: {stats['total_categories']}")
+    logger.log(SUMMARY, f"   • Annonces extraites: {stats['total_listings']}")
+    logger.log(SUMMARY, f"   • Erreurs: {stats['errors']}")
+    logger.log(SUMMARY, f"   • Vitesse: {stats['total_listings']/(duration/60):.1f} annonces/min")
+    if 'cache' in stats:
+        cache_stats = stats['cache']
+        logger.log(SUMMARY, f"   • Cache HTTP: {cache_stats['hits']} hits, {cache_stats['revalidated']} revalidés (304), "
+                   f"{cache_stats['misses']} miss, {cache_stats['evicted']} évincés")
+    if stats.get('failures'):
+        logger.log(SUMMARY, f"   • Échecs définitifs: " + ", ".join(f"{kind} {count}" for kind, count in stats['failures'].items()))
+    for host, limits in stats['rate_limits'].items():
+        logger.log(SUMMARY, f"   • Débit {host}: {limits['rate']} req/s ({limits['successes']} réponses, "
+                   f"{limits['backoffs']} ralentissements)")
+    if 'transport' in stats:
+        transport = stats['transport']
+        logger.log(SUMMARY, f"   • Connexions: {transport['connections']} ouvertes pour {transport['requests']} requêtes "
+                   f"(réutilisation {transport['reuse_rate']:.0%})")
+    for name, proxy in stats.get('proxies', {}).items():
+        logger.log(SUMMARY, f"   • Proxy {name}: santé {proxy['health']}, {proxy['requests']} requêtes, "
+                   f"{proxy['failures']} échecs, {proxy['bans']} blocages" + (" (écarté)" if proxy['ejected'] else ""))
+    stages = stats.get('metrics', {}).get('stages', {})
+    if stages:
+        logger.log(SUMMARY, f"   • Latences p50/p95 (ms): " + ", ".join(
+            f"{stage} {stages[stage]['p50_ms']:g}/{stages[stage]['p95_ms']:g}"
+            for stage in ('dns', 'connect', 'ttfb', 'download', 'parse', 'extract', 'serialize') if stage in stages
+        ))
+    if 'incremental' in stats:
+        seen_stats = stats['incremental']
+        logger.log(SUMMARY, f"   • Incrémental: {seen_stats['new']} nouvelles, {seen_stats['changed']} modifiées, "
+                   f"{seen_stats['unchanged']} inchangées, {seen_stats['skipped']} ignorées (déjà connues)")
+    if stats.get('discovery', {}).get('listing_urls'):
+        discovery_stats = stats['discovery']
+        logger.log(SUMMARY, f"   • Sitemaps et flux: {discovery_stats['listing_urls']} annonces dans {discovery_stats['documents']} documents, "
+                   f"{discovery_stats['categories']} catégories sans pagination")
+    if 'dedup' in stats:
+        dedup_stats = stats['dedup']
+        logger.log(SUMMARY, f"   • Doublons: {dedup_stats['skipped']} annonces déjà prises par une autre catégorie, "
+                   f"{dedup_stats['near_duplicates']} reposts ({dedup_stats['clusters']} grappes)")
+    if 'store' in stats:
+        store_stats = stats['store']
+        logger.log(SUMMARY, f"   • Base annonces: {store_stats['new']} nouvelles, {store_stats['changed']} prix/titre modifiés, "
+                   f"{store_stats['unchanged']} inchangées")
+    
+    # Top catégories
+    logger.log(SUMMARY, f"\n📈 TOP 5 CATÉGORIES:")
+    top_cats = sorted(result['categories'], key=lambda x: x['listings_scraped'], reverse=True)[:5]
+    for i, cat in enumerate(top_cats, 1):
+        logger.log(SUMMARY, f"   {i}. {cat['name']}: {cat['listings_scraped']} annonces")
+    
+    logger.log(SUMMARY, f"\n💾 Annonces: {base}.ndjson" if result['listings_file'] else f"\n💾 Annonces: {os.getenv('LISTING_DB')}")
+    logger.log(SUMMARY, f"   Métadonnées: {base}.meta.json")
+    logger.log(SUMMARY, f"   JSON imbriqué: python src/listing_stream.py {base}")
+    logger.log(SUMMARY, f"\n{'='*70}")
+    
+    # Générer rapport CSV
+    csv_filename = f"{base}_summary.csv"
+    write_csv_summary(result, csv_filename)
     
-    print(f"📄 Rapport CSV: {csv_filename}\n")
+    logger.log(SUMMARY, f"📄 Rapport CSV: {csv_filename}\n")
+    Metrics.shared().flush()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
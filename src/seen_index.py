@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+LISTING_ID_RE = re.compile(r'ID_(\d+)')
+
+# Champs qui changent d'un scraping à l'autre sans que l'annonce change
+# (datePosted est recalculée à partir d'une date relative : "il y a 3 jours")
+VOLATILE_FIELDS = ('scrapedAt', 'datePosted')
+
+
+def listing_id(url: str) -> Optional[str]:
+    """ID numérique Locanto d'une URL d'annonce (None si absent)"""
+    match = LISTING_ID_RE.search(url)
+    return match.group(1) if match else None
+
+
+def content_hash(listing: Dict) -> str:
+    """Empreinte du contenu d'une annonce (hors champs volatils)"""
+    fields = {k: v for k, v in listing.items() if k not in VOLATILE_FIELDS}
+    return hashlib.sha1(json.dumps(fields, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+class SeenIndex:
+    """
+    Index persistant des annonces déjà scrapées d'un pays (mode incrémental).
+
+    Pour chaque ID : date de première vue, date du dernier scraping et empreinte du contenu.
+    Une annonce connue n'est plus téléchargée, sauf si son dernier scraping date de plus
+    de refresh_after secondes (0 = jamais) ; l'empreinte indique alors si elle a changé.
+
+    Une annonce écrite en flux est d'abord mise en attente (listing_done) puis enregistrée par
+    commit(), après le fsync de sa ligne : un crash entre les deux ne la fait pas ignorer ensuite.
+    """
+
+    def __init__(self, path: str, refresh_after: int = 0):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.refresh_after = refresh_after
+        self.stats = {'skipped': 0, 'new': 0, 'changed': 0, 'unchanged': 0}
+        self._lock = threading.Lock()
+        self._pending: List[Dict] = []
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('''
+            CREATE TABLE IF NOT EXISTS seen (
+                listing_id TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                first_seen REAL NOT NULL,
+                last_scraped REAL NOT NULL
+            )
+        ''')
+        self._db.commit()
+
+    @classmethod
+    def from_env(cls, country: str) -> Optional['SeenIndex']:
+        """Index configuré par INCREMENTAL / STATE_DIR / INCREMENTAL_REFRESH_DAYS"""
+        if os.getenv('INCREMENTAL', '0') != '1':
+            return None
+        state_dir = os.getenv('STATE_DIR', '/app/data/state')
+        return cls(
+            os.path.join(state_dir, f"seen_{country}.sqlite"),
+            refresh_after=int(float(os.getenv('INCREMENTAL_REFRESH_DAYS', 0)) * 86400)
+        )
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM seen').fetchone()[0]
+
+    def filter_new(self, urls: List[str]) -> List[str]:
+        """Garde les URLs à télécharger : IDs inconnus (ou à rafraîchir) et URLs sans ID"""
+        ids = {listing_id(url) for url in urls} - {None}
+        if not ids:
+            return list(urls)
+
+        cutoff = time.time() - self.refresh_after if self.refresh_after else 0
+        placeholders = ','.join('?' * len(ids))
+        with self._lock:
+            known = {row[0] for row in self._db.execute(
+                f'SELECT listing_id FROM seen WHERE last_scraped >= ? AND listing_id IN ({placeholders})',
+                (cutoff, *ids)
+            )}
+
+        new_urls = [url for url in urls if listing_id(url) not in known]
+        self.stats['skipped'] += len(urls) - len(new_urls)
+        return new_urls
+
+    def record(self, listing: Dict) -> Optional[str]:
+        """Enregistre une annonce scrapée, renvoie 'new', 'changed' ou 'unchanged'"""
+        ad_id = listing.get('id') or listing_id(listing.get('url', ''))
+        if not ad_id:
+            return None
+
+        digest = content_hash(listing)
+        now = time.time()
+        with self._lock:
+            row = self._db.execute('SELECT content_hash FROM seen WHERE listing_id = ?', (ad_id,)).fetchone()
+            if row is None:
+                status = 'new'
+                self._db.execute(
+                    'INSERT INTO seen VALUES (?, ?, ?, ?, ?)',
+                    (ad_id, listing.get('url', ''), digest, now, now)
+                )
+            else:
+                status = 'unchanged' if row[0] == digest else 'changed'
+                self._db.execute(
+                    'UPDATE seen SET url = ?, content_hash = ?, last_scraped = ? WHERE listing_id = ?',
+                    (listing.get('url', ''), digest, now, ad_id)
+                )
+            self._db.commit()
+            self.stats[status] += 1
+        return status
+
+    def listing_done(self, listing: Dict):
+        """Annonce écrite dans le flux (enregistrée au prochain commit, après le fsync)"""
+        with self._lock:
+            self._pending.append(listing)
+
+    def commit(self):
+        with self._lock:
+            listings, self._pending = self._pending, []
+        for listing in listings:
+            self.record(listing)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,187 @@
+"""
+Couche de transport partagée par tous les scrapers d'un processus.
+
+- une seule session requests (moteur historique), pool de connexions dimensionné sur CONCURRENCY,
+  sans nouvelles tentatives cachées (gérées par retry_policy) ;
+- keep-alive TCP sur les sockets, y compris les tunnels CONNECT ouverts à travers le proxy :
+  une connexion (et sa poignée de main TLS via l'unblocker) sert à plusieurs requêtes ;
+- session aiohttp du moteur asynchrone construite avec les mêmes réglages ;
+- compteurs de réutilisation : requêtes envoyées / connexions ouvertes, pour les deux moteurs.
+"""
+import os
+import socket
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from metrics import Metrics
+
+# Sondes keep-alive sur les sockets (les options absentes de la plateforme sont ignorées)
+KEEPALIVE_OPTIONS = [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)] + [
+    (socket.IPPROTO_TCP, getattr(socket, name), value)
+    for name, value in (('TCP_KEEPIDLE', 30), ('TCP_KEEPINTVL', 10), ('TCP_KEEPCNT', 3))
+    if hasattr(socket, name)
+]
+
+
+def counting_pool_classes(on_connect: Callable[[float], None]) -> Dict[str, type]:
+    """Pools urllib3 qui signalent chaque ouverture de socket (ou de tunnel CONNECT) et sa durée, reconnexions comprises"""
+    def counted(connection_cls):
+        class CountedConnection(connection_cls):
+            def connect(self):
+                start = time.perf_counter()
+                super().connect()
+                on_connect(time.perf_counter() - start)
+        return CountedConnection
+
+    return {
+        'http': type('CountedHTTPConnectionPool', (HTTPConnectionPool,), {'ConnectionCls': counted(HTTPConnection)}),
+        'https': type('CountedHTTPSConnectionPool', (HTTPSConnectionPool,), {'ConnectionCls': counted(HTTPSConnection)})
+    }
+
+
+class KeepAliveAdapter(HTTPAdapter):
+    """HTTPAdapter dont les connexions directes et via proxy restent en keep-alive et sont comptées"""
+
+    def __init__(self, counter: Dict[str, int], on_connect: Callable[[float], None], **kwargs):
+        self.counter = counter
+        self.pool_classes = counting_pool_classes(on_connect)
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['socket_options'] = HTTPConnection.default_socket_options + KEEPALIVE_OPTIONS
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = self.pool_classes
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        proxy_kwargs.setdefault('socket_options', HTTPConnection.default_socket_options + KEEPALIVE_OPTIONS)
+        manager = super().proxy_manager_for(proxy, **proxy_kwargs)
+        manager.pool_classes_by_scheme = self.pool_classes
+        return manager
+
+    def send(self, request, *args, **kwargs):
+        self.counter['requests'] += 1
+        return super().send(request, *args, **kwargs)
+
+
+class Transport:
+    _shared: Optional['Transport'] = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, pool_size: int = 10, pool_hosts: int = 100, keepalive: float = 60.0):
+        self.pool_size = pool_size
+        self.keepalive = keepalive
+        # Requêtes envoyées / connexions ouvertes, moteur historique puis moteur asynchrone
+        self._sync = {'requests': 0, 'connections': 0}
+        self._async = {'requests': 0, 'connections': 0}
+        self.metrics = Metrics.shared()
+        self._local = threading.local()
+        self.adapter = KeepAliveAdapter(
+            self._sync,
+            self._on_sync_connect,
+            pool_connections=pool_hosts,  # Pools gardés (un par domaine, et par proxy)
+            pool_maxsize=pool_size,       # Connexions gardées ouvertes par domaine
+            max_retries=0                 # Pas de nouvelle tentative cachée : voir retry_policy
+        )
+        self.session = requests.Session()
+        self.session.verify = False
+        self.session.mount('http://', self.adapter)
+        self.session.mount('https://', self.adapter)
+
+    @classmethod
+    def from_env(cls) -> 'Transport':
+        """Transport dimensionné par CONCURRENCY, connexions aiohttp inactives gardées KEEPALIVE_SECONDS"""
+        return cls(
+            pool_size=int(os.getenv('CONCURRENCY', 10)),
+            keepalive=float(os.getenv('KEEPALIVE_SECONDS', 60))
+        )
+
+    @classmethod
+    def shared(cls) -> 'Transport':
+        """Transport unique du processus (créé au premier appel)"""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls.from_env()
+            return cls._shared
+
+    def client_session(self, concurrency: int, per_host_concurrency: int, timeout: int) -> aiohttp.ClientSession:
+        """Session aiohttp (à créer dans la boucle asyncio qui l'utilise) branchée sur les compteurs"""
+        connector = aiohttp.TCPConnector(
+            limit=concurrency,
+            limit_per_host=per_host_concurrency,
+            keepalive_timeout=self.keepalive,
+            ttl_dns_cache=300,
+            ssl=False
+        )
+        trace = aiohttp.TraceConfig()
+        trace.on_request_start.append(self._on_request)
+        trace.on_request_end.append(self._on_response_headers)
+        trace.on_connection_queued_start.append(self._on_queued)
+        trace.on_connection_queued_end.append(self._on_dequeued)
+        trace.on_connection_create_start.append(self._on_connection_start)
+        trace.on_connection_create_end.append(self._on_connection)
+        trace.on_connection_reuseconn.append(self._on_connection_reused)
+        trace.on_dns_resolvehost_start.append(self._on_dns_start)
+        trace.on_dns_resolvehost_end.append(self._on_dns_end)
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=timeout),
+            trace_configs=[trace]
+        )
+
+    def _on_sync_connect(self, seconds: float):
+        self._sync['connections'] += 1
+        self.metrics.observe('connect', seconds)
+        self._local.connect_seconds = getattr(self._local, 'connect_seconds', 0.0) + seconds
+
+    def take_connect_seconds(self) -> float:
+        """Temps de connexion de la dernière requête synchrone de ce thread (déduit de son ttfb)"""
+        seconds, self._local.connect_seconds = getattr(self._local, 'connect_seconds', 0.0), 0.0
+        return seconds
+
+    # Traces aiohttp : context est propre à chaque requête
+    async def _on_request(self, session, context, params):
+        self._async['requests'] += 1
+
+    async def _on_queued(self, session, context, params):
+        context.queued_at = time.perf_counter()
+
+    async def _on_dequeued(self, session, context, params):
+        self.metrics.observe('pool_wait', time.perf_counter() - context.queued_at)
+
+    async def _on_response_headers(self, session, context, params):
+        # Depuis la connexion obtenue, comme le moteur historique : ni file du connecteur, ni connexion
+        self.metrics.observe('ttfb', time.perf_counter() - context.request_start)
+
+    async def _on_connection_start(self, session, context, params):
+        context.connect_start = time.perf_counter()
+
+    async def _on_connection(self, session, context, params):
+        self._async['connections'] += 1
+        context.request_start = time.perf_counter()
+        self.metrics.observe('connect', context.request_start - context.connect_start)
+
+    async def _on_connection_reused(self, session, context, params):
+        context.request_start = time.perf_counter()
+
+    async def _on_dns_start(self, session, context, params):
+        context.dns_start = time.perf_counter()
+
+    async def _on_dns_end(self, session, context, params):
+        self.metrics.observe('dns', time.perf_counter() - context.dns_start)
+
+    def snapshot(self) -> Dict:
+        """Requêtes envoyées, connexions ouvertes et taux de réutilisation (métriques)"""
+        sent = self._sync['requests'] + self._async['requests']
+        opened = self._sync['connections'] + self._async['connections']
+        return {
+            'requests': sent,
+            'connections': opened,
+            'reuse_rate': round(max(0.0, 1 - opened / sent), 3) if sent else 0.0
+        }
@@ -0,0 +1,323 @@
+"""
+Filtres "URL déjà vue" compacts, remplaçants de l'ancien set() de visited_urls.
+
+    set     set Python des URLs (historique, exact, ~100+ octets/URL)
+    hash64  table de hachage ouverte d'empreintes 64 bits (~12-16 octets/URL,
+            collision ~ N² / 2^65 : négligeable sous le milliard d'URLs)
+    bloom   filtre de Bloom extensible, taux de faux positifs configurable (~3 à 5 octets/URL
+            à 0,1 % selon le remplissage des étages, mesurés par benchmarks/bench_url_filter.py) ;
+            un faux positif = une annonce non téléchargée
+
+Tous exposent add / in / len / nbytes / save / load. ShardedUrlFilter les découpe par domaine
+(un filtre par site, créé à sa première URL). save / load : sauvegarde aux checkpoints de
+l'état de crawl (crawl_state.CountryProgress), rechargée à la reprise.
+"""
+import hashlib
+import json
+import math
+import os
+import re
+import sys
+from array import array
+from typing import Dict
+
+MAGIC = b'URLF1\n'
+
+
+def _hash128(url: str) -> bytes:
+    return hashlib.blake2b(url.encode('utf-8'), digest_size=16).digest()
+
+
+def _write(path: str, header: Dict, payloads):
+    """Format : MAGIC, en-tête JSON sur une ligne, puis les blocs binaires bout à bout"""
+    tmp = f"{path}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC)
+        f.write(json.dumps(header).encode('utf-8') + b'\n')
+        for payload in payloads:
+            f.write(payload)
+    os.replace(tmp, path)
+
+
+def _shard_path(directory: str, domain: str) -> str:
+    return os.path.join(directory, f"{re.sub(r'[^A-Za-z0-9.-]', '_', domain)}.urlf")
+
+
+def _read(path: str):
+    with open(path, 'rb') as f:
+        if f.readline() != MAGIC:
+            raise ValueError(f"{path}: pas un fichier de filtre d'URLs")
+        header = json.loads(f.readline())
+        return header, f.read()
+
+
+class SetFilter:
+    """Implémentation historique : set des URLs complètes"""
+
+    kind = 'set'
+
+    def __init__(self):
+        self._urls = set()
+
+    def add(self, url: str):
+        self._urls.add(url)
+
+    def __contains__(self, url: str) -> bool:
+        return url in self._urls
+
+    def __len__(self) -> int:
+        return len(self._urls)
+
+    @property
+    def nbytes(self) -> int:
+        return sys.getsizeof(self._urls) + sum(sys.getsizeof(url) for url in self._urls)
+
+    def save(self, path: str):
+        _write(path, {'kind': self.kind}, ['\n'.join(self._urls).encode('utf-8')])
+
+    @classmethod
+    def load(cls, path: str) -> 'SetFilter':
+        _, payload = _read(path)
+        instance = cls()
+        if payload:
+            instance._urls.update(payload.decode('utf-8').split('\n'))
+        return instance
+
+
+class Hash64Filter:
+    """Empreintes 64 bits dans une table à adressage ouvert (array de uint64, 0 = case vide)"""
+
+    kind = 'hash64'
+    MAX_LOAD = 0.7
+
+    def __init__(self, capacity: int = 1024):
+        size = 1 << max(4, math.ceil(math.log2(capacity / self.MAX_LOAD)))
+        self._table = array('Q', bytes(8 * size))
+        self._mask = size - 1
+        self._count = 0
+
+    @staticmethod
+    def _key(url: str) -> int:
+        return int.from_bytes(_hash128(url)[:8], 'little') or 1
+
+    def _slot(self, key: int) -> int:
+        """Case contenant key, ou première case vide de sa séquence de sondage"""
+        table, mask = self._table, self._mask
+        i = key & mask
+        while table[i] and table[i] != key:
+            i = (i + 1) & mask
+        return i
+
+    def add(self, url: str):
+        key = self._key(url)
+        i = self._slot(key)
+        if self._table[i]:
+            return
+        self._table[i] = key
+        self._count += 1
+        if self._count > self.MAX_LOAD * len(self._table):
+            self._grow()
+
+    def _grow(self):
+        old = self._table
+        self._table = array('Q', bytes(16 * len(old)))
+        self._mask = len(self._table) - 1
+        for key in old:
+            if key:
+                self._table[self._slot(key)] = key
+
+    def __contains__(self, url: str) -> bool:
+        return bool(self._table[self._slot(self._key(url))])
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def nbytes(self) -> int:
+        return self._table.itemsize * len(self._table)
+
+    def save(self, path: str):
+        _write(path, {'kind': self.kind, 'size': len(self._table), 'count': self._count}, [self._table.tobytes()])
+
+    @classmethod
+    def load(cls, path: str) -> 'Hash64Filter':
+        header, payload = _read(path)
+        instance = cls()
+        instance._table = array('Q')
+        instance._table.frombytes(payload)
+        instance._mask = header['size'] - 1
+        instance._count = header['count']
+        return instance
+
+
+class _BloomStage:
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def positions(self, digest: bytes):
+        # Double hachage (Kirsch-Mitzenmacher) : k positions à partir d'une seule empreinte
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        size = self.size
+        return [(h1 + i * h2) % size for i in range(self.hashes)]
+
+    def __contains__(self, digest: bytes) -> bool:
+        bits = self.bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self.positions(digest))
+
+    def add(self, digest: bytes):
+        bits = self.bits
+        for p in self.positions(digest):
+            bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+
+class ScalableBloomFilter:
+    """
+    Filtre de Bloom extensible : quand l'étage courant est plein, un étage 2× plus grand
+    et 2× plus strict est ajouté. Le taux de faux positifs global reste sous error_rate.
+    """
+
+    kind = 'bloom'
+    GROWTH = 2
+    TIGHTENING = 0.5
+
+    def __init__(self, error_rate: float = 0.001, initial_capacity: int = 100_000):
+        self.error_rate = error_rate
+        self.initial_capacity = initial_capacity
+        self._stages = []
+        self._count = 0
+
+    def _add_stage(self):
+        n = len(self._stages)
+        self._stages.append(_BloomStage(
+            self.initial_capacity * self.GROWTH ** n,
+            # Somme géométrique : error_rate × (1 - r) × (1 + r + r² + …) ≤ error_rate
+            self.error_rate * (1 - self.TIGHTENING) * self.TIGHTENING ** n
+        ))
+
+    def add(self, url: str):
+        digest = _hash128(url)
+        if any(digest in stage for stage in self._stages):
+            return
+        if not self._stages or self._stages[-1].count >= self._stages[-1].capacity:
+            self._add_stage()
+        self._stages[-1].add(digest)
+        self._count += 1
+
+    def __contains__(self, url: str) -> bool:
+        digest = _hash128(url)
+        return any(digest in stage for stage in self._stages)
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def nbytes(self) -> int:
+        return sum(len(stage.bits) for stage in self._stages)
+
+    def save(self, path: str):
+        header = {
+            'kind': self.kind,
+            'error_rate': self.error_rate,
+            'initial_capacity': self.initial_capacity,
+            'count': self._count,
+            'stages': [stage.count for stage in self._stages]
+        }
+        _write(path, header, [bytes(stage.bits) for stage in self._stages])
+
+    @classmethod
+    def load(cls, path: str) -> 'ScalableBloomFilter':
+        header, payload = _read(path)
+        instance = cls(header['error_rate'], header['initial_capacity'])
+        instance._count = header['count']
+        offset = 0
+        for count in header['stages']:
+            instance._add_stage()
+            stage = instance._stages[-1]
+            stage.bits = bytearray(payload[offset:offset + len(stage.bits)])
+            stage.count = count
+            offset += len(stage.bits)
+        return instance
+
+
+BACKENDS = {
+    'set': SetFilter,
+    'hash64': Hash64Filter,
+    'bloom': ScalableBloomFilter,
+}
+
+
+class ShardedUrlFilter:
+    """Un filtre par domaine (créé à la demande), sauvegardable dans un répertoire"""
+
+    def __init__(self, kind: str = 'hash64', error_rate: float = 0.001):
+        if kind not in BACKENDS:
+            raise ValueError(f"Filtre d'URLs inconnu: {kind} (choix: {', '.join(BACKENDS)})")
+        self.kind = kind
+        self.error_rate = error_rate
+        self.shards: Dict[str, object] = {}
+
+    def _new_shard(self):
+        if self.kind == 'bloom':
+            return ScalableBloomFilter(self.error_rate)
+        return BACKENDS[self.kind]()
+
+    def _shard(self, url: str, create: bool = False):
+        # Plus rapide que urlsplit(url).netloc, appelé à chaque requête
+        domain = url.partition('//')[2].partition('/')[0].partition('?')[0].lower()
+        shard = self.shards.get(domain)
+        if shard is None and create:
+            shard = self.shards[domain] = self._new_shard()
+        return shard
+
+    def add(self, url: str):
+        self._shard(url, create=True).add(url)
+
+    def __contains__(self, url: str) -> bool:
+        shard = self._shard(url)
+        return shard is not None and url in shard
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self.shards.values())
+
+    @property
+    def nbytes(self) -> int:
+        return sum(shard.nbytes for shard in self.shards.values())
+
+    def save(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        for domain, shard in self.shards.items():
+            shard.save(_shard_path(directory, domain))
+        index = os.path.join(directory, 'shards.json')
+        with open(f"{index}.tmp", 'w', encoding='utf-8') as f:
+            json.dump({'kind': self.kind, 'error_rate': self.error_rate, 'domains': list(self.shards)}, f)
+        os.replace(f"{index}.tmp", index)
+
+    @classmethod
+    def load(cls, directory: str) -> 'ShardedUrlFilter':
+        with open(os.path.join(directory, 'shards.json'), encoding='utf-8') as f:
+            index = json.load(f)
+        instance = cls(index['kind'], index['error_rate'])
+        backend = BACKENDS[instance.kind]
+        for domain in index['domains']:
+            instance.shards[domain] = backend.load(_shard_path(directory, domain))
+        return instance
+
+    @classmethod
+    def from_env(cls) -> 'ShardedUrlFilter':
+        """Filtre configuré par URL_FILTER (set / hash64 / bloom) et URL_FILTER_ERROR_RATE"""
+        return cls(os.getenv('URL_FILTER', 'hash64'), float(os.getenv('URL_FILTER_ERROR_RATE', 0.001)))
+
+
+def load_filter(path: str):
+    """Charge un filtre sauvegardé (fichier d'un backend ou répertoire d'un ShardedUrlFilter)"""
+    if os.path.isdir(path):
+        return ShardedUrlFilter.load(path)
+    header, _ = _read(path)
+    return BACKENDS[header['kind']].load(path)
@@ -0,0 +1,72 @@
+"""
+Profils d'en-têtes navigateur embarqués (config/user_agents.json), à la place de fake_useragent.
+
+Un profil = un jeu cohérent User-Agent / Accept / Accept-Language / sec-ch-ua (Chrome et Edge
+envoient les sec-ch-ua, Firefox et Safari non). Le fichier est versionné, lu une seule fois par
+processus, et le tirage d'un profil (pondéré) ne coûte qu'une recherche dichotomique.
+
+Persistance (UA_STICKY) :
+    request  nouveau profil à chaque requête (défaut, comme l'ancien ua.random)
+    session  un profil pour toute la vie du scraper
+    host     un profil par domaine
+"""
+import bisect
+import itertools
+import json
+import os
+import random
+import threading
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config', 'user_agents.json')
+STICKY_MODES = ('request', 'session', 'host')
+
+_loaded: Dict[str, Tuple[str, List[Dict[str, str]], List[float]]] = {}
+_load_lock = threading.Lock()
+
+
+def load_profiles(path: str = DEFAULT_PATH) -> Tuple[str, List[Dict[str, str]], List[float]]:
+    """(version, en-têtes des profils, poids cumulés), lus une fois par processus"""
+    with _load_lock:
+        if path not in _loaded:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+            profiles = [profile['headers'] for profile in data['profiles']]
+            weights = list(itertools.accumulate(profile.get('weight', 1) for profile in data['profiles']))
+            if not profiles:
+                raise ValueError(f"Aucun profil dans {path}")
+            _loaded[path] = (data['version'], profiles, weights)
+        return _loaded[path]
+
+
+class HeaderProfiles:
+    def __init__(self, path: str = DEFAULT_PATH, sticky: str = 'request', seed: Optional[int] = None):
+        if sticky not in STICKY_MODES:
+            raise ValueError(f"UA_STICKY inconnu: {sticky} ({', '.join(STICKY_MODES)})")
+        self.version, self.profiles, self.weights = load_profiles(path)
+        self.sticky = sticky
+        self.rng = random.Random(seed)
+        self._sticky: Dict[str, Dict[str, str]] = {}
+
+    @classmethod
+    def from_env(cls) -> 'HeaderProfiles':
+        """Profils configurés par UA_PROFILES (fichier) / UA_STICKY / UA_SEED (tirage reproductible)"""
+        seed = os.getenv('UA_SEED')
+        return cls(
+            path=os.getenv('UA_PROFILES', DEFAULT_PATH),
+            sticky=os.getenv('UA_STICKY', 'request'),
+            seed=int(seed) if seed else None
+        )
+
+    def _draw(self) -> Dict[str, str]:
+        index = bisect.bisect(self.weights, self.rng.random() * self.weights[-1])
+        return self.profiles[min(index, len(self.profiles) - 1)]
+
+    def pick(self, host: str = '') -> Dict[str, str]:
+        """En-têtes de la prochaine requête vers host (copie modifiable)"""
+        if self.sticky == 'request':
+            return dict(self._draw())
+        key = host if self.sticky == 'host' else ''
+        if key not in self._sticky:
+            self._sticky[key] = self._draw()
+        return dict(self._sticky[key])
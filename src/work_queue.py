@@ -0,0 +1,393 @@
+"""
+File de travail partagée pour le crawl distribué (coordinateur + workers sans état).
+
+Chaque job a un identifiant unique dans sa file (URL de catégorie ou d'annonce) :
+le ré-enfiler est sans effet, même après qu'il a été acquitté.
+
+    put     ajoute des jobs (ignorés s'ils existent déjà ou sont terminés)
+    lease   réserve le prochain job disponible pour lease_seconds
+    ack     job terminé
+    fail    job en échec : remis en file, ou abandonné après max_attempts tentatives
+
+Un worker qui meurt n'acquitte pas ses jobs : leur bail expire et ils sont redistribués.
+Livraison "au moins une fois" : un job peut être traité deux fois, jamais perdu.
+
+Backends :
+    sqlite:///chemin/work_queue.sqlite   un seul hôte (verrou de fichier SQLite)
+    redis://[:mot_de_passe@]hôte:port/db  plusieurs machines (protocole Redis)
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import unquote, urlsplit
+
+
+class Job:
+    def __init__(self, queue: str, job_id: str, payload: Dict, attempts: int):
+        self.queue = queue
+        self.id = job_id
+        self.payload = payload
+        self.attempts = attempts
+
+    def __repr__(self) -> str:
+        return f"Job({self.queue}, {self.id}, tentative {self.attempts})"
+
+
+class SQLiteWorkQueue:
+    """
+    File dans une base SQLite partagée par les processus d'un même hôte.
+
+    Un job prêt a available_at <= maintenant ; le réserver repousse available_at à la fin
+    du bail, dans une transaction BEGIN IMMEDIATE (un seul preneur par job).
+    """
+
+    def __init__(self, path: str, lease_seconds: int = 300, max_attempts: int = 3):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                queue TEXT NOT NULL,
+                id TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                available_at REAL NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                PRIMARY KEY (queue, id)
+            )
+        ''')
+        self._db.execute('CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (queue, status, available_at)')
+
+    def put(self, queue: str, jobs: Iterable[Tuple[str, Dict]]) -> int:
+        """Ajoute des jobs (id, payload), renvoie le nombre réellement ajoutés"""
+        now = time.time()
+        rows = [(queue, job_id, json.dumps(payload, ensure_ascii=False), now) for job_id, payload in jobs]
+        with self._lock:
+            before = self._db.total_changes
+            self._db.execute('BEGIN IMMEDIATE')
+            self._db.executemany(
+                "INSERT OR IGNORE INTO jobs (queue, id, payload, status, available_at) VALUES (?, ?, ?, 'ready', ?)",
+                rows
+            )
+            self._db.execute('COMMIT')
+            return self._db.total_changes - before
+
+    def lease(self, queues: List[str]) -> Optional[Job]:
+        """Réserve le plus ancien job disponible, en parcourant les files dans l'ordre donné"""
+        for queue in queues:
+            while True:
+                now = time.time()
+                with self._lock:
+                    self._db.execute('BEGIN IMMEDIATE')
+                    row = self._db.execute(
+                        '''SELECT id, payload, attempts FROM jobs
+                           WHERE queue = ? AND status = 'ready' AND available_at <= ?
+                           ORDER BY available_at LIMIT 1''',
+                        (queue, now)
+                    ).fetchone()
+                    if row is None:
+                        self._db.execute('COMMIT')
+                        break
+                    job_id, payload, attempts = row
+                    attempts += 1
+                    if attempts > self.max_attempts:
+                        # Bail expiré à chaque tentative : le job fait tomber ses workers
+                        self._db.execute(
+                            "UPDATE jobs SET status = 'failed', error = ? WHERE queue = ? AND id = ?",
+                            (f"bail expiré {self.max_attempts} fois", queue, job_id)
+                        )
+                        self._db.execute('COMMIT')
+                        continue
+                    self._db.execute(
+                        'UPDATE jobs SET available_at = ?, attempts = ? WHERE queue = ? AND id = ?',
+                        (now + self.lease_seconds, attempts, queue, job_id)
+                    )
+                    self._db.execute('COMMIT')
+                return Job(queue, job_id, json.loads(payload), attempts)
+        return None
+
+    def ack(self, jobs: Iterable[Job]):
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            self._db.executemany(
+                "UPDATE jobs SET status = 'done', payload = '{}' WHERE queue = ? AND id = ?",
+                [(job.queue, job.id) for job in jobs]
+            )
+            self._db.execute('COMMIT')
+
+    def fail(self, job: Job, error: str) -> bool:
+        """Échec du job : remis en file (True) ou abandonné après max_attempts tentatives (False)"""
+        retry = job.attempts < self.max_attempts
+        with self._lock:
+            self._db.execute(
+                'UPDATE jobs SET status = ?, available_at = ?, error = ? WHERE queue = ? AND id = ?',
+                ('ready' if retry else 'failed', time.time(), error, job.queue, job.id)
+            )
+        return retry
+
+    def counts(self, queue: str) -> Dict[str, int]:
+        """Jobs prêts, en cours (bail actif), terminés et abandonnés"""
+        now = time.time()
+        with self._lock:
+            rows = self._db.execute(
+                '''SELECT CASE WHEN status = 'ready' AND available_at > ? THEN 'leased' ELSE status END, COUNT(*)
+                   FROM jobs WHERE queue = ? GROUP BY 1''',
+                (now, queue)
+            ).fetchall()
+        counts = {'ready': 0, 'leased': 0, 'done': 0, 'failed': 0}
+        counts.update(dict(rows))
+        return counts
+
+    def failed(self, queue: str) -> Dict[str, str]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, error FROM jobs WHERE queue = ? AND status = 'failed'", (queue,)
+            ).fetchall()
+        return dict(rows)
+
+    def clear(self, queue: str):
+        with self._lock:
+            self._db.execute('DELETE FROM jobs WHERE queue = ?', (queue,))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class RedisError(Exception):
+    pass
+
+
+class RedisConnection:
+    """Client minimal du protocole Redis (RESP) : pas de dépendance supplémentaire"""
+
+    def __init__(self, url: str, timeout: float = 30):
+        parts = urlsplit(url)
+        self._sock = socket.create_connection((parts.hostname or 'localhost', parts.port or 6379), timeout=timeout)
+        self._file = self._sock.makefile('rb')
+        if parts.password:
+            self.execute('AUTH', unquote(parts.password))
+        db = parts.path.strip('/')
+        if db:
+            self.execute('SELECT', db)
+
+    @staticmethod
+    def _encode(args: Tuple) -> bytes:
+        command = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode('utf-8')
+            command.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        return b''.join(command)
+
+    def execute(self, *args):
+        self._sock.sendall(self._encode(args))
+        return self._read()
+
+    def pipeline(self, commands: List[Tuple]) -> List:
+        """Envoie toutes les commandes d'un coup puis lit leurs réponses : un seul aller-retour"""
+        self._sock.sendall(b''.join(self._encode(command) for command in commands))
+        replies, error = [], None
+        for _ in commands:
+            try:
+                replies.append(self._read())
+            except RedisError as e:
+                # Réponses suivantes lues quand même : la connexion reste utilisable
+                error = error or e
+                replies.append(None)
+        if error:
+            raise error
+        return replies
+
+    def _read(self):
+        line = self._file.readline()
+        if not line:
+            raise RedisError("connexion fermée par le serveur")
+        kind, data = line[:1], line[1:-2]
+        if kind == b'+':
+            return data.decode('utf-8')
+        if kind == b'-':
+            raise RedisError(data.decode('utf-8'))
+        if kind == b':':
+            return int(data)
+        if kind == b'$':
+            if data == b'-1':
+                return None
+            value = self._file.read(int(data) + 2)[:-2]
+            return value.decode('utf-8')
+        if kind == b'*':
+            if data == b'-1':
+                return None
+            return [self._read() for _ in range(int(data))]
+        raise RedisError(f"réponse inattendue: {line!r}")
+
+    def close(self):
+        self._file.close()
+        self._sock.close()
+
+
+class RedisWorkQueue:
+    """
+    File dans Redis, partagée par plusieurs machines.
+
+    Clés par file (<ns>:<file>:…) :
+        ready     zset id → date de disponibilité (fin du bail pour un job réservé)
+        jobs      hash id → payload JSON
+        attempts  hash id → nombre de réservations
+        done      set des ids terminés
+        failed    hash id → erreur
+
+    La réservation est une transaction optimiste (WATCH / MULTI / EXEC) : si un autre
+    worker a pris le job entre-temps, EXEC échoue et on réessaie. put (par lots de BATCH jobs)
+    et ack envoient leurs commandes ensemble (pipeline, MULTI / EXEC) au lieu d'une par aller-retour.
+    """
+
+    # Jobs par pipeline de put (réponses en attente bornées)
+    BATCH = 500
+
+    def __init__(self, url: str, lease_seconds: int = 300, max_attempts: int = 3, namespace: str = 'locanto'):
+        self.url = url
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._redis = RedisConnection(url)
+
+    def _key(self, queue: str, name: str) -> str:
+        return f"{self.namespace}:{queue}:{name}"
+
+    def _execute(self, *args):
+        with self._lock:
+            return self._redis.execute(*args)
+
+    def _transaction(self, commands: List[Tuple]) -> List:
+        """MULTI, commandes et EXEC envoyés ensemble : réponses des commandes (celle d'EXEC)"""
+        if not commands:
+            return []
+        with self._lock:
+            return self._redis.pipeline([('MULTI',), *commands, ('EXEC',)])[-1]
+
+    def put(self, queue: str, jobs: Iterable[Tuple[str, Dict]]) -> int:
+        jobs = list(jobs)
+        return sum(self._put_batch(queue, jobs[i:i + self.BATCH]) for i in range(0, len(jobs), self.BATCH))
+
+    def _put_batch(self, queue: str, jobs: List[Tuple[str, Dict]]) -> int:
+        # Jobs terminés ou abandonnés écartés (un aller-retour pour tout le lot)
+        with self._lock:
+            known = self._redis.pipeline(
+                [('SISMEMBER', self._key(queue, 'done'), job_id) for job_id, _ in jobs]
+                + [('HEXISTS', self._key(queue, 'failed'), job_id) for job_id, _ in jobs]
+            )
+        jobs = [job for job, done, failed in zip(jobs, known, known[len(jobs):]) if not done and not failed]
+        # Payload et disponibilité ajoutés ensemble ; ZADD NX sans effet pour un job déjà en file
+        now = time.time()
+        commands = []
+        for job_id, payload in jobs:
+            commands.append(('HSETNX', self._key(queue, 'jobs'), job_id, json.dumps(payload, ensure_ascii=False)))
+            commands.append(('ZADD', self._key(queue, 'ready'), 'NX', now, job_id))
+        replies = self._transaction(commands)
+        return sum(replies[::2])
+
+    def lease(self, queues: List[str]) -> Optional[Job]:
+        for queue in queues:
+            ready = self._key(queue, 'ready')
+            while True:
+                now = time.time()
+                with self._lock:
+                    self._redis.execute('WATCH', ready)
+                    ids = self._redis.execute('ZRANGEBYSCORE', ready, '-inf', now, 'LIMIT', 0, 1)
+                    if not ids:
+                        self._redis.execute('UNWATCH')
+                        break
+                    job_id = ids[0]
+                    self._redis.execute('MULTI')
+                    self._redis.execute('ZADD', ready, 'XX', now + self.lease_seconds, job_id)
+                    self._redis.execute('HINCRBY', self._key(queue, 'attempts'), job_id, 1)
+                    self._redis.execute('HGET', self._key(queue, 'jobs'), job_id)
+                    reply = self._redis.execute('EXEC')
+                if reply is None:
+                    # Job pris par un autre worker pendant la transaction
+                    continue
+                attempts, payload = reply[1], reply[2]
+                job = Job(queue, job_id, json.loads(payload or '{}'), attempts)
+                if attempts > self.max_attempts:
+                    self._abandon(job, f"bail expiré {self.max_attempts} fois")
+                    continue
+                return job
+        return None
+
+    def _abandon(self, job: Job, error: str):
+        self._transaction([
+            ('ZREM', self._key(job.queue, 'ready'), job.id),
+            ('HDEL', self._key(job.queue, 'jobs'), job.id),
+            ('HDEL', self._key(job.queue, 'attempts'), job.id),
+            ('HSET', self._key(job.queue, 'failed'), job.id, error)
+        ])
+
+    def ack(self, jobs: Iterable[Job]):
+        commands = []
+        for job in jobs:
+            commands += [
+                ('ZREM', self._key(job.queue, 'ready'), job.id),
+                ('HDEL', self._key(job.queue, 'jobs'), job.id),
+                ('HDEL', self._key(job.queue, 'attempts'), job.id),
+                ('SADD', self._key(job.queue, 'done'), job.id)
+            ]
+        self._transaction(commands)
+
+    def fail(self, job: Job, error: str) -> bool:
+        if job.attempts >= self.max_attempts:
+            self._abandon(job, error)
+            return False
+        self._execute('ZADD', self._key(job.queue, 'ready'), 'XX', time.time(), job.id)
+        return True
+
+    def counts(self, queue: str) -> Dict[str, int]:
+        now = time.time()
+        ready = self._key(queue, 'ready')
+        return {
+            'ready': self._execute('ZCOUNT', ready, '-inf', now),
+            'leased': self._execute('ZCOUNT', ready, f"({now}", '+inf'),
+            'done': self._execute('SCARD', self._key(queue, 'done')),
+            'failed': self._execute('HLEN', self._key(queue, 'failed'))
+        }
+
+    def failed(self, queue: str) -> Dict[str, str]:
+        values = self._execute('HGETALL', self._key(queue, 'failed'))
+        return dict(zip(values[::2], values[1::2]))
+
+    def clear(self, queue: str):
+        self._execute('DEL', *[self._key(queue, name) for name in ('ready', 'jobs', 'attempts', 'done', 'failed')])
+
+    def close(self):
+        with self._lock:
+            self._redis.close()
+
+
+def open_queue(url: str, lease_seconds: int = 300, max_attempts: int = 3):
+    """File de travail à partir de son URL (sqlite:///… ou redis://…)"""
+    scheme = url.split('://', 1)[0]
+    if scheme == 'sqlite':
+        return SQLiteWorkQueue(url[len('sqlite://'):], lease_seconds, max_attempts)
+    if scheme == 'redis':
+        return RedisWorkQueue(url, lease_seconds, max_attempts)
+    raise ValueError(f"File de travail inconnue: {url} (sqlite:///chemin ou redis://hôte:port/db)")
+
+
+def queue_from_env():
+    """File configurée par WORK_QUEUE / LEASE_SECONDS / MAX_ATTEMPTS (SQLite dans STATE_DIR par défaut)"""
+    default = f"sqlite://{os.path.join(os.getenv('STATE_DIR', '/app/data/state'), 'work_queue.sqlite')}"
+    return open_queue(
+        os.getenv('WORK_QUEUE', default),
+        lease_seconds=int(os.getenv('LEASE_SECONDS', 300)),
+        max_attempts=int(os.getenv('MAX_ATTEMPTS', 3))
+    )
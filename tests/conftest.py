@@ -0,0 +1,42 @@
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+
+@pytest.fixture
+def http_proxy(monkeypatch):
+    """
+    Serveur local utilisé comme unique proxy (PROXY_ENDPOINTS) : routes[chemin] = code HTTP,
+    ou liste de codes servis tour à tour (le dernier ensuite). Les chemins absents répondent 200.
+    """
+    routes = {}
+    requests_seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = '/' + self.path.split('://', 1)[-1].partition('/')[2].partition('?')[0]
+            requests_seen.append(path)
+            body = b'<html><body>ok</body></html>'
+            status = routes.get(path, 200)
+            if isinstance(status, list):
+                status = status.pop(0) if len(status) > 1 else status[0]
+            self.send_response(status)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv('PROXY_ENDPOINTS', f"http://127.0.0.1:{server.server_address[1]}")
+    yield routes, requests_seen
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,235 @@
+"""
+Serveur Redis de substitution pour les tests : protocole RESP et commandes utilisées par
+work_queue.RedisWorkQueue (chaînes, hash, set, zset, MULTI / EXEC, WATCH), données en mémoire.
+"""
+import socketserver
+import threading
+from typing import Dict, List, Optional
+
+
+class RedisStub(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, password: Optional[str] = None):
+        super().__init__(('127.0.0.1', 0), RedisHandler)
+        self.password = password
+        self.lock = threading.Lock()
+        # Base → clé → valeur (dict pour hash et zset, set, str)
+        self.dbs: Dict[int, Dict[str, object]] = {}
+        # (base, clé) → version, incrémentée à chaque écriture (WATCH)
+        self.versions: Dict[tuple, int] = {}
+        self.commands: List[str] = []
+
+    @property
+    def url(self) -> str:
+        auth = f":{self.password}@" if self.password else ''
+        return f"redis://{auth}127.0.0.1:{self.server_address[1]}/2"
+
+    def start(self) -> 'RedisStub':
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class CommandError(Exception):
+    pass
+
+
+class RedisHandler(socketserver.StreamRequestHandler):
+    def setup(self):
+        super().setup()
+        self.db = 0
+        self.authenticated = self.server.password is None
+        self.queued: Optional[List[List[str]]] = None
+        self.watched: Dict[tuple, int] = {}
+
+    def handle(self):
+        while True:
+            args = self.read_command()
+            if args is None:
+                return
+            try:
+                reply = self.dispatch(args)
+            except CommandError as e:
+                reply = e
+            self.wfile.write(encode(reply))
+
+    def read_command(self) -> Optional[List[str]]:
+        line = self.rfile.readline()
+        if not line:
+            return None
+        assert line[:1] == b'*', line
+        args = []
+        for _ in range(int(line[1:-2])):
+            size = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(size + 2)[:-2].decode('utf-8'))
+        return args
+
+    def dispatch(self, args: List[str]):
+        name = args[0].upper()
+        self.server.commands.append(name)
+        if name == 'AUTH':
+            if args[1] != self.server.password:
+                raise CommandError('WRONGPASS invalid password')
+            self.authenticated = True
+            return OK
+        if not self.authenticated:
+            raise CommandError('NOAUTH Authentication required.')
+        if name == 'SELECT':
+            self.db = int(args[1])
+            return OK
+        if name == 'MULTI':
+            self.queued = []
+            return OK
+        if name == 'EXEC':
+            queued, self.queued = self.queued, None
+            with self.server.lock:
+                changed = any(self.server.versions.get(key, 0) != version for key, version in self.watched.items())
+                self.watched = {}
+                if changed:
+                    return NIL_ARRAY
+                return [self.run(command) for command in queued]
+        if self.queued is not None:
+            self.queued.append(args)
+            return Status('QUEUED')
+        if name == 'WATCH':
+            with self.server.lock:
+                for key in args[1:]:
+                    self.watched[(self.db, key)] = self.server.versions.get((self.db, key), 0)
+            return OK
+        if name == 'UNWATCH':
+            self.watched = {}
+            return OK
+        with self.server.lock:
+            return self.run(args)
+
+    def touch(self, key: str):
+        self.server.versions[(self.db, key)] = self.server.versions.get((self.db, key), 0) + 1
+
+    def run(self, args: List[str]):
+        """Exécute une commande de données (verrou du serveur déjà pris)"""
+        data = self.server.dbs.setdefault(self.db, {})
+        name, key, rest = args[0].upper(), args[1] if len(args) > 1 else None, args[2:]
+
+        if name == 'DEL':
+            removed = 0
+            for k in args[1:]:
+                if data.pop(k, None) is not None:
+                    self.touch(k)
+                    removed += 1
+            return removed
+        if name == 'SISMEMBER':
+            return int(rest[0] in data.get(key, set()))
+        if name == 'SADD':
+            members = data.setdefault(key, set())
+            added = len(set(rest) - members)
+            members.update(rest)
+            self.touch(key)
+            return added
+        if name == 'SCARD':
+            return len(data.get(key, set()))
+        if name == 'HEXISTS':
+            return int(rest[0] in data.get(key, {}))
+        if name == 'HGET':
+            return data.get(key, {}).get(rest[0])
+        if name == 'HSET':
+            fields = data.setdefault(key, {})
+            added = sum(1 for field in rest[::2] if field not in fields)
+            fields.update(zip(rest[::2], rest[1::2]))
+            self.touch(key)
+            return added
+        if name == 'HSETNX':
+            fields = data.setdefault(key, {})
+            if rest[0] in fields:
+                return 0
+            fields[rest[0]] = rest[1]
+            self.touch(key)
+            return 1
+        if name == 'HINCRBY':
+            fields = data.setdefault(key, {})
+            fields[rest[0]] = str(int(fields.get(rest[0], 0)) + int(rest[1]))
+            self.touch(key)
+            return int(fields[rest[0]])
+        if name == 'HDEL':
+            fields = data.get(key, {})
+            removed = sum(1 for field in rest if fields.pop(field, None) is not None)
+            if removed:
+                self.touch(key)
+            return removed
+        if name == 'HLEN':
+            return len(data.get(key, {}))
+        if name == 'HGETALL':
+            return [value for item in data.get(key, {}).items() for value in item]
+        if name == 'ZADD':
+            flags = set()
+            while rest and rest[0].upper() in ('NX', 'XX'):
+                flags.add(rest.pop(0).upper())
+            scores = data.setdefault(key, {})
+            added = 0
+            for score, member in zip(rest[::2], rest[1::2]):
+                if ('NX' in flags and member in scores) or ('XX' in flags and member not in scores):
+                    continue
+                added += member not in scores
+                scores[member] = float(score)
+            self.touch(key)
+            return added
+        if name == 'ZREM':
+            scores = data.get(key, {})
+            removed = sum(1 for member in rest if scores.pop(member, None) is not None)
+            if removed:
+                self.touch(key)
+            return removed
+        if name in ('ZCOUNT', 'ZRANGEBYSCORE'):
+            low, high = bound(rest[0]), bound(rest[1])
+            members = sorted((score, member) for member, score in data.get(key, {}).items()
+                             if low(score, True) and high(score, False))
+            if name == 'ZCOUNT':
+                return len(members)
+            if len(rest) > 2 and rest[2].upper() == 'LIMIT':
+                offset, count = int(rest[3]), int(rest[4])
+                members = members[offset:offset + count]
+            return [member for _, member in members]
+        raise CommandError(f"ERR unknown command '{name}'")
+
+
+def bound(text: str):
+    """Borne de score Redis (-inf, +inf, (exclusive) → test (score, borne basse ?)"""
+    exclusive = text.startswith('(')
+    value = float(text.lstrip('('))
+
+    def test(score: float, low: bool) -> bool:
+        if low:
+            return score > value if exclusive else score >= value
+        return score < value if exclusive else score <= value
+    return test
+
+
+class Status(str):
+    pass
+
+
+OK = Status('OK')
+NIL_ARRAY = object()
+
+
+def encode(reply) -> bytes:
+    if isinstance(reply, CommandError):
+        return b"-%s\r\n" % str(reply).encode()
+    if reply is NIL_ARRAY:
+        return b"*-1\r\n"
+    if reply is None:
+        return b"$-1\r\n"
+    if isinstance(reply, Status):
+        return b"+%s\r\n" % reply.encode()
+    if isinstance(reply, int):
+        return b":%d\r\n" % int(reply)
+    if isinstance(reply, str):
+        data = reply.encode('utf-8')
+        return b"$%d\r\n%s\r\n" % (len(data), data)
+    if isinstance(reply, list):
+        return b"*%d\r\n" % len(reply) + b''.join(encode(item) for item in reply)
+    raise TypeError(reply)
@@ -0,0 +1,30 @@
+import asyncio
+import time
+
+from async_scraper import AsyncLocantoScraper
+from proxy_manager import ProxyManager
+from rate_limiter import AdaptiveRateLimiter
+
+
+def test_rate_limit_wait_does_not_hold_a_concurrency_slot(http_proxy):
+    _, requests_seen = http_proxy
+
+    async def crawl():
+        async with AsyncLocantoScraper(ProxyManager(), concurrency=1,
+                                       rate_limiter=AdaptiveRateLimiter(initial_rate=100)) as scraper:
+            # Retry-After d'une seconde sur un domaine : les autres passent pendant l'attente
+            scraper.rate_limiter.backoff('slow.test', retry_after=1.0)
+            done = {}
+
+            async def fetch(url):
+                await scraper.fetch(url)
+                done[url] = time.monotonic()
+
+            start = time.monotonic()
+            await asyncio.gather(fetch('http://slow.test/a.html'), fetch('http://fast.test/b.html'))
+            return start, done
+
+    start, done = asyncio.run(crawl())
+    assert done['http://fast.test/b.html'] - start < 0.5
+    assert done['http://slow.test/a.html'] - start >= 0.9
+    assert requests_seen == ['/b.html', '/a.html']
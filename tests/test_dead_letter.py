@@ -0,0 +1,103 @@
+import multiprocessing
+
+from retry_policy import DeadLetterFile, FetchError
+
+WRITERS = 4
+ENTRIES = 300
+
+
+def _add(path: str, writer: int):
+    dead_letter = DeadLetterFile(path)
+    for n in range(ENTRIES):
+        dead_letter.add(FetchError(f"http://keep{writer}.test/ID_{n}/a.html", 'server'), 4, 'listing')
+        dead_letter.add(FetchError(f"http://gone.test/ID_{writer}_{n}/a.html", 'server'), 4, 'listing')
+
+
+def _retry(path: str, retried):
+    dead_letter = DeadLetterFile(path)
+    for _ in range(ENTRIES):
+        for entry in dead_letter.claim('gone.test'):
+            dead_letter.retried(entry['url'])
+            retried.put(entry['url'])
+        dead_letter.commit()
+
+
+def test_add_and_retry_from_several_processes(tmp_path):
+    path = str(tmp_path / 'dead_letter.ndjson')
+    context = multiprocessing.get_context('spawn')
+    retried = context.Manager().Queue()
+    processes = [context.Process(target=_add, args=(path, writer)) for writer in range(WRITERS)]
+    processes += [context.Process(target=_retry, args=(path, retried)) for _ in range(2)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(60)
+        assert process.exitcode == 0
+
+    gone = set()
+    while not retried.empty():
+        gone.add(retried.get())
+    gone.update(entry['url'] for entry in DeadLetterFile(path).claim('gone.test'))
+    assert len(gone) == WRITERS * ENTRIES
+    for writer in range(WRITERS):
+        assert len(DeadLetterFile(path).claim(f"keep{writer}.test")) == ENTRIES
+
+
+def test_claimed_entries_stay_until_their_retry_is_committed(tmp_path):
+    path = str(tmp_path / 'dead_letter.ndjson')
+    dead_letter = DeadLetterFile(path)
+    for n in range(3):
+        dead_letter.add(FetchError(f"http://site.test/ID_{n}/a.html", 'server'), 4, 'listing')
+    dead_letter.add(FetchError('http://site.test/ID_0/a.html', 'timeout'), 4, 'listing')
+
+    # Une URL en échec deux fois n'est reprise qu'une fois
+    assert sorted(entry['url'] for entry in dead_letter.claim('site.test')) == [
+        f"http://site.test/ID_{n}/a.html" for n in range(3)
+    ]
+    # Crash pendant la reprise : rien n'est perdu
+    assert len(DeadLetterFile(path).claim('site.test')) == 3
+
+    dead_letter.retried('http://site.test/ID_0/a.html')
+    dead_letter.retried('http://site.test/ID_1/a.html')
+    # Nouvel échec de la reprise : l'entrée réinscrite reste
+    dead_letter.add(FetchError('http://site.test/ID_1/a.html', 'server'), 4, 'listing')
+    assert len(DeadLetterFile(path).claim('site.test')) == 3
+    dead_letter.commit()
+    assert sorted(entry['url'] for entry in DeadLetterFile(path).claim('site.test')) == [
+        'http://site.test/ID_1/a.html', 'http://site.test/ID_2/a.html'
+    ]
+
+
+def test_index_pages_are_retried_with_their_category(tmp_path):
+    path = str(tmp_path / 'dead_letter.ndjson')
+    dead_letter = DeadLetterFile(path)
+    dead_letter.add(FetchError('http://site.test/cars/?page=3', 'server'), 4, 'index')
+    dead_letter.add(FetchError('http://site.test/jobs/', 'server'), 4, 'index')
+    dead_letter.claim('site.test')
+
+    dead_letter.retried_category('http://site.test/cars/')
+    dead_letter.commit()
+    assert [entry['url'] for entry in DeadLetterFile(path).claim('site.test')] == ['http://site.test/jobs/']
+
+
+def test_failed_index_pages_send_their_category_back_through_the_walk(tmp_path):
+    from types import SimpleNamespace
+    from scrape_full_country import plan_categories, retry_categories
+
+    dead_letter = DeadLetterFile(str(tmp_path / 'dead_letter.ndjson'))
+    dead_letter.add(FetchError('http://site.test/ID_7/a.html', 'server'), 4, 'listing')
+    dead_letter.add(FetchError('http://site.test/jobs/?page=2', 'server'), 4, 'index')
+    dead_letter.add(FetchError('http://site.test/sitemap.xml', 'server'), 4, 'index')
+    retry = retry_categories('http://site.test/', dead_letter.claim('site.test'))
+    categories = [{'name': 'Voitures', 'url': 'http://site.test/cars/'}, {'name': 'Emplois', 'url': 'http://site.test/jobs/'}]
+
+    plan = plan_categories(SimpleNamespace(discovery=None, dead_letter=dead_letter), 'http://site.test/',
+                           categories, 1, retry)
+    assert [(cat['name'], cat['url']) for cat in plan] == [
+        ('Reprise des échecs précédents', 'http://site.test/#dead-letter'),
+        ('Emplois', 'http://site.test/jobs/'),
+        ('Voitures', 'http://site.test/cars/')
+    ]
+    # Sitemap déjà relu avant le plan : retiré au prochain commit
+    dead_letter.commit()
+    assert len(DeadLetterFile(dead_letter.path).claim('site.test')) == 2
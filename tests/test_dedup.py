@@ -0,0 +1,27 @@
+from dedup import ListingDedup
+from locanto_scraper_final import LocantoScraperFinal
+from proxy_manager import ProxyManager
+
+URLS = [f"http://site.test/ID_{n}/villa.html" for n in range(3)]
+
+
+def test_reposts_are_marked_by_default(monkeypatch):
+    monkeypatch.delenv('DEDUP_NEAR', raising=False)
+    assert ListingDedup().near == 'mark'
+    assert ListingDedup.from_env().near == 'mark'
+
+
+def test_failed_listing_is_released_for_another_category(http_proxy, monkeypatch):
+    routes, _ = http_proxy
+    routes['/ID_0/villa.html'] = [500, 200]
+    monkeypatch.setenv('HOST_RATE', '100')
+    monkeypatch.setenv('RETRY_MAX', '0')
+    dedup = ListingDedup()
+    scraper = LocantoScraperFinal(ProxyManager(), dedup=dedup)
+
+    assert scraper.claim_listing_urls(URLS, limit=2) == URLS[:2]
+    assert scraper.get_listing_details(URLS[0]) is None
+    # Catégorie suivante : l'annonce en échec est de nouveau disponible, pas celles déjà prises
+    assert scraper.claim_listing_urls(URLS) == [URLS[0], URLS[2]]
+    assert scraper.claim_listing_urls(URLS) == []
+    assert dedup.stats == {'claimed': 3, 'skipped': 4, 'near_duplicates': 0}
@@ -0,0 +1,67 @@
+from distributed_crawl import CrawlWorker
+from locanto_scraper_final import LocantoScraperFinal
+from proxy_manager import ProxyManager
+from retry_policy import DeadLetterFile
+from work_queue import open_queue
+
+
+def test_redelivered_listing_job_already_scraped_is_acked(http_proxy, tmp_path, monkeypatch):
+    _, requests_seen = http_proxy
+    monkeypatch.setenv('HOST_RATE', '100')
+    url = 'http://site.test/ID_1/villa.html'
+    # Bail de 0 s : le job est redistribué avant le fsync de sa ligne
+    queue = open_queue(f"sqlite://{tmp_path / 'work_queue.sqlite'}", lease_seconds=0, max_attempts=3)
+    queue.put('listings', [(url, {'country': 'site.test', 'url': url, 'category_url': 'http://site.test/cat/'})])
+    worker = CrawlWorker(queue, LocantoScraperFinal(ProxyManager()), str(tmp_path), flush_every=100)
+
+    worker.handle_listing(queue.lease(['listings']))
+    worker.handle_listing(queue.lease(['listings']))
+    worker.sync()
+
+    assert requests_seen == ['/ID_1/villa.html']
+    assert worker.stats == {'sites': 0, 'categories': 0, 'listings': 1, 'failed': 0}
+    assert queue.counts('listings') == {'ready': 0, 'leased': 0, 'done': 1, 'failed': 0}
+    queue.close()
+
+
+def test_category_with_failed_index_page_is_not_acked(http_proxy, tmp_path, monkeypatch):
+    routes, requests_seen = http_proxy
+    routes['/cat/'] = [500, 200]
+    monkeypatch.setenv('HOST_RATE', '100')
+    monkeypatch.setenv('RETRY_MAX', '0')
+    url = 'http://site.test/cat/'
+    queue = open_queue(f"sqlite://{tmp_path / 'work_queue.sqlite'}", lease_seconds=60, max_attempts=3)
+    queue.put('categories', [(url, {'country': 'site.test', 'url': url, 'max_pages': 2, 'max_listings': 10})])
+    dead_letter = DeadLetterFile(str(tmp_path / 'dead_letter.ndjson'))
+    worker = CrawlWorker(queue, LocantoScraperFinal(ProxyManager(), dead_letter=dead_letter), str(tmp_path))
+
+    worker.handle_category(queue.lease(['categories']))
+    assert queue.counts('categories') == {'ready': 1, 'leased': 0, 'done': 0, 'failed': 0}
+    assert [entry['url'] for entry in dead_letter.claim('site.test')] == [url]
+
+    # Même worker : la catégorie est bien reparcourue
+    worker.handle_category(queue.lease(['categories']))
+    assert queue.counts('categories') == {'ready': 0, 'leased': 0, 'done': 1, 'failed': 0}
+    # Pages 1 (500) et 2 au premier passage, page 1 au second
+    assert requests_seen == ['/cat/', '/cat/', '/cat/']
+    queue.close()
+
+
+def test_worker_writes_after_a_merge_go_to_a_new_file(http_proxy, tmp_path):
+    from distributed_crawl import merge_country
+    from listing_stream import iter_listings
+
+    queue = open_queue(f"sqlite://{tmp_path / 'work_queue.sqlite'}")
+    worker = CrawlWorker(queue, LocantoScraperFinal(ProxyManager()), str(tmp_path))
+    worker._writer('site.test').write_listing({'url': 'http://site.test/ID_1/a.html'}, 'http://site.test/cat/')
+    worker.sync()
+
+    first = merge_country(str(tmp_path), 'site.test', '1', {'ndjson': True})
+    # Worker toujours actif : sa prochaine annonce ne doit pas partir dans le fichier fusionné et supprimé
+    worker._writer('site.test').write_listing({'url': 'http://site.test/ID_2/b.html'}, 'http://site.test/cat/')
+    worker.sync()
+    second = merge_country(str(tmp_path), 'site.test', '2', {'ndjson': True})
+
+    for result, url in ((first, 'http://site.test/ID_1/a.html'), (second, 'http://site.test/ID_2/b.html')):
+        assert [listing['url'] for listing in iter_listings(f"{result['output_base']}.ndjson")] == [url]
+    queue.close()
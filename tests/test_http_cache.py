@@ -0,0 +1,19 @@
+from http_cache import ResponseCache
+
+
+def test_misses_counted_on_lookup(tmp_path):
+    cache = ResponseCache(str(tmp_path), ttl_index=3600, ttl_listing=0)
+    index, listing = 'http://site.test/cat-1/', 'http://site.test/ID_1/a.html'
+
+    assert cache.lookup(index) is None
+    cache.store(index, b'<html>index</html>', {'ETag': '"v1"'})
+    assert cache.lookup(index).fresh
+
+    # Annonce périmée d'emblée (TTL 0) : requête conditionnelle puis 304
+    cache.store(listing, b'<html>annonce</html>', {'ETag': '"v1"'})
+    entry = cache.lookup(listing)
+    assert not entry.fresh and entry.conditional_headers()
+    cache.revalidated(listing)
+
+    assert cache.stats == {'hits': 1, 'revalidated': 1, 'misses': 2, 'evicted': 0}
+    cache.close()
@@ -0,0 +1,39 @@
+import asyncio
+
+from crawl_state import CrawlState
+from listing_stream import ListingStreamWriter
+from pipeline import CrawlPipeline
+from retry_policy import DeadLetterFile, FetchError
+from scrape_full_country import record_category
+
+EMPTY = {'name': 'Voitures', 'url': 'http://site.test/cars/'}
+
+
+class EmptyCategories:
+    """Scraper de test : catégories sans aucune nouvelle annonce (mode incrémental)"""
+
+    async def iter_listing_pages(self, category_url, max_pages=2, max_listings=None):
+        return
+        yield
+
+
+def test_empty_category_is_checkpointed_but_not_listed(tmp_path):
+    state = CrawlState(str(tmp_path / 'crawl_state.sqlite'))
+    progress = state.start_country('site.test', 'http://site.test/', str(tmp_path / 'out'))
+    writer = ListingStreamWriter(str(tmp_path / 'out'))
+    dead_letter = DeadLetterFile(str(tmp_path / 'dead_letter.ndjson'))
+    dead_letter.add(FetchError('http://site.test/cars/?page=2', 'server'), 4, 'index')
+    dead_letter.claim('site.test')
+    result = {'categories': [], 'stats': {'total_listings': 0, 'total_categories': 0, 'errors': 0}}
+
+    pipeline = CrawlPipeline(EmptyCategories(), progress=progress, on_category=lambda cat_data: record_category(
+        result, cat_data, 1, writer, progress, dead_letter))
+    assert asyncio.run(pipeline.run([EMPTY])) == 1
+    dead_letter.commit()
+
+    # Reprise : la catégorie n'est plus parcourue, sa page en échec a été relue
+    assert [cat['url'] for cat in progress.done_categories()] == [EMPTY['url']]
+    assert DeadLetterFile(dead_letter.path).claim('site.test') == []
+    assert result['categories'] == [] and result['stats']['total_categories'] == 0
+    writer.close()
+    state.close()
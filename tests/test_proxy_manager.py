@@ -0,0 +1,21 @@
+from proxy_manager import ProxyManager
+
+
+def test_startup_check_survives_transient_error(http_proxy, monkeypatch):
+    routes, requests_seen = http_proxy
+    routes['/probe'] = [502, 200]
+    monkeypatch.setenv('PROXY_TEST_URL', 'http://site.test/probe')
+    pool = ProxyManager().pool
+
+    assert pool.check_all(attempts=3, retry_delay=0)
+    assert requests_seen == ['/probe', '/probe']
+    assert not pool.endpoints[0].ejected
+
+
+def test_startup_check_fails_when_proxy_never_answers(http_proxy, monkeypatch):
+    routes, requests_seen = http_proxy
+    routes['/probe'] = 502
+    monkeypatch.setenv('PROXY_TEST_URL', 'http://site.test/probe')
+
+    assert not ProxyManager().pool.check_all(attempts=2, retry_delay=0)
+    assert len(requests_seen) == 2
@@ -0,0 +1,34 @@
+from proxy_manager import ProxyManager
+from retry_policy import CircuitBreaker
+from locanto_scraper_final import LocantoScraperFinal
+
+
+def test_breaker_trial_released_without_verdict():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0)
+    breaker.record_failure('h')
+    breaker.record_failure('h')
+    assert breaker.allow('h')
+    assert not breaker.allow('h')
+    breaker.release_trial('h')
+    assert breaker.allow('h')
+
+
+def test_trial_ending_in_404_does_not_block_domain(http_proxy, monkeypatch):
+    routes, requests_seen = http_proxy
+    routes.update({'/down': 500, '/missing': 404})
+    monkeypatch.setenv('BREAKER_THRESHOLD', '2')
+    monkeypatch.setenv('BREAKER_RESET_SECONDS', '0')
+    monkeypatch.setenv('RETRY_MAX', '0')
+    monkeypatch.setenv('HOST_RATE', '100')
+    scraper = LocantoScraperFinal(ProxyManager())
+    host = 'site.test'
+
+    for n in range(2):
+        assert scraper.fetch(f"http://{host}/down?n={n}") is None
+    assert scraper.breaker.snapshot()[host]['open']
+
+    # Requête d'essai du circuit semi-ouvert : un 404 ne dit rien de la santé du domaine
+    assert scraper.fetch(f"http://{host}/missing") is None
+    assert scraper.fetch(f"http://{host}/page") is not None
+    assert not scraper.breaker.snapshot()[host]['open']
+    assert requests_seen[-1] == '/page'
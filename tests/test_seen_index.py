@@ -0,0 +1,26 @@
+from types import SimpleNamespace
+
+from listing_stream import ListingStreamWriter
+from scrape_full_country import write_listing
+from seen_index import SeenIndex
+
+URLS = [f"http://site.test/ID_{n}/villa.html" for n in range(3)]
+
+
+def test_listings_are_recorded_only_once_on_disk(tmp_path):
+    seen = SeenIndex(str(tmp_path / 'seen.sqlite'))
+    writer = ListingStreamWriter(str(tmp_path / 'out'), flush_every=2, on_sync=seen.commit)
+    scraper = SimpleNamespace(mark_seen=seen.listing_done, dead_letter=None)
+    category = {'url': 'http://site.test/cars/'}
+
+    write_listing(writer, {'url': URLS[0], 'title': 'a'}, category, scraper)
+    # Pas encore de fsync : un crash ici ne doit pas faire ignorer l'annonce au prochain lancement
+    assert SeenIndex(seen.path).filter_new(URLS) == URLS
+
+    write_listing(writer, {'url': URLS[1], 'title': 'b'}, category, scraper)
+    assert SeenIndex(seen.path).filter_new(URLS) == URLS[2:]
+    assert seen.stats['new'] == 2
+
+    write_listing(writer, {'url': URLS[2], 'title': 'c'}, category, scraper)
+    writer.close()
+    assert SeenIndex(seen.path).filter_new(URLS) == []
@@ -0,0 +1,39 @@
+from crawl_state import CrawlState
+from locanto_scraper_final import LocantoScraperFinal
+from proxy_manager import ProxyManager
+
+
+def test_index_pages_are_never_filtered(http_proxy, monkeypatch):
+    _, requests_seen = http_proxy
+    monkeypatch.setenv('HOST_RATE', '100')
+    scraper = LocantoScraperFinal(ProxyManager())
+    index, listing = 'http://site.test/cars/?page=2', 'http://site.test/ID_1/villa.html'
+    # Faux positif du filtre sur une page d'index : elle est tout de même téléchargée
+    scraper.visited_urls.add(index)
+
+    assert scraper.fetch(index) and scraper.fetch(index)
+    assert scraper.fetch(listing) and scraper.fetch(listing) is None
+    assert requests_seen == ['/cars/', '/cars/', '/ID_1/villa.html']
+
+
+def test_visited_urls_reloaded_from_the_last_checkpoint(tmp_path, monkeypatch):
+    monkeypatch.setenv('URL_FILTER', 'bloom')
+    written, pending = 'http://site.test/ID_1/a.html', 'http://site.test/ID_2/b.html'
+    state = CrawlState(str(tmp_path / 'crawl_state.sqlite'))
+    progress = state.start_country('site.test', 'http://site.test/', str(tmp_path / 'out'))
+    progress.enqueue('http://site.test/cars/', [written, pending])
+    progress.listing_done(written)
+    progress.commit()
+    progress.category_done({'url': 'http://site.test/cars/', 'listings_scraped': 1})
+    state.close()
+
+    # Reprise : seules les annonces écrites sont considérées comme visitées
+    state = CrawlState(str(tmp_path / 'crawl_state.sqlite'))
+    visited = state.resume_country('site.test', 'http://site.test/').visited_urls()
+    assert visited.kind == 'bloom'
+    assert written in visited and pending not in visited
+
+    # Nouveau crawl du pays : filtre vide
+    progress = state.start_country('site.test', 'http://site.test/', str(tmp_path / 'out2'))
+    assert len(progress.visited_urls()) == 0
+    state.close()
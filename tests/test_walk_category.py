@@ -0,0 +1,74 @@
+import threading
+import time
+
+from locanto_scraper_final import LocantoScraperFinal
+from proxy_manager import ProxyManager
+from retry_policy import FetchError
+
+CATEGORY = 'http://site.test/cars/'
+
+
+def page_html(ids, total=None):
+    links = ''.join(f'<a href="/ID_{n}/villa.html">{n}</a>' for n in ids)
+    count = f'<p>{total} annonces</p>' if total else ''
+    return f'<html><body>{count}{links}</body></html>'.encode()
+
+
+class FakePages:
+    """fetch_or_raise de test : pages servies après un délai, requêtes simultanées comptées"""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.requested = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, url):
+        with self._lock:
+            self.requested.append(url)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.05)
+        with self._lock:
+            self.in_flight -= 1
+        page = self.pages[url]
+        if isinstance(page, FetchError):
+            raise page
+        return page
+
+
+def test_pages_after_the_first_are_fetched_together(monkeypatch):
+    monkeypatch.setenv('PROXY_ENDPOINTS', 'http://127.0.0.1:9')
+    scraper = LocantoScraperFinal(ProxyManager(), page_workers=4)
+    pages = {
+        CATEGORY: page_html(range(0, 10), total=40),
+        f"{CATEGORY}?page=2": page_html(range(10, 20)),
+        f"{CATEGORY}?page=3": FetchError(f"{CATEGORY}?page=3", 'server'),
+        f"{CATEGORY}?page=4": page_html(range(30, 40)),
+    }
+    fake = FakePages(pages)
+    monkeypatch.setattr(scraper, 'fetch_or_raise', fake)
+
+    listing_urls, skipped = scraper.walk_category(CATEGORY, max_pages=10)
+
+    # Page 1 seule, puis les pages 2 à 4 ensemble ; résultats dans l'ordre des pages
+    assert fake.requested[0] == CATEGORY and len(fake.requested) == 4
+    assert fake.max_in_flight == 3
+    assert listing_urls == [f"http://site.test/ID_{n}/villa.html" for n in [*range(0, 20), *range(30, 40)]]
+    assert skipped == [3]
+
+
+def test_repeated_last_page_stops_the_walk(monkeypatch):
+    monkeypatch.setenv('PROXY_ENDPOINTS', 'http://127.0.0.1:9')
+    scraper = LocantoScraperFinal(ProxyManager(), page_workers=4)
+    # Sans total sur la page 1 : Locanto renvoie la dernière page au-delà de la fin
+    pages = {CATEGORY: page_html(range(0, 10))}
+    pages.update({f"{CATEGORY}?page={page}": page_html(range(10, 20)) for page in range(2, 6)})
+    fake = FakePages(pages)
+    monkeypatch.setattr(scraper, 'fetch_or_raise', fake)
+
+    listing_urls, skipped = scraper.walk_category(CATEGORY, max_pages=5)
+    assert fake.requested[0] == CATEGORY
+    assert listing_urls == [f"http://site.test/ID_{n}/villa.html" for n in range(0, 20)]
+    assert skipped == []
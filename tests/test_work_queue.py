@@ -0,0 +1,147 @@
+import threading
+
+import pytest
+
+from redis_stub import RedisStub
+from work_queue import RedisConnection, open_queue
+
+
+@pytest.fixture
+def redis_stub():
+    stub = RedisStub(password='s3cr:t').start()
+    yield stub
+    stub.stop()
+
+
+@pytest.fixture(params=['sqlite', 'redis'])
+def queue_url(request, tmp_path):
+    if request.param == 'sqlite':
+        return f"sqlite://{tmp_path / 'work_queue.sqlite'}"
+    return request.getfixturevalue('redis_stub').url
+
+
+def test_put_lease_ack(queue_url):
+    queue = open_queue(queue_url, lease_seconds=60, max_attempts=3)
+    assert queue.put('listings', [('a', {'url': 'a', 'title': 'Villa à Cocody'}), ('b', {'url': 'b'})]) == 2
+    assert queue.put('listings', [('a', {'url': 'a'})]) == 0
+
+    job = queue.lease(['categories', 'listings'])
+    assert (job.queue, job.id, job.payload['title'], job.attempts) == ('listings', 'a', 'Villa à Cocody', 1)
+    assert queue.counts('listings') == {'ready': 1, 'leased': 1, 'done': 0, 'failed': 0}
+
+    queue.ack([job])
+    # Terminé : ré-enfiler le même job est sans effet
+    assert queue.put('listings', [('a', {'url': 'a'})]) == 0
+    assert queue.lease(['listings']).id == 'b'
+    assert queue.lease(['listings']) is None
+    assert queue.counts('listings') == {'ready': 0, 'leased': 1, 'done': 1, 'failed': 0}
+
+    for name in ('listings', 'categories'):
+        queue.clear(name)
+    assert queue.put('listings', [('a', {'url': 'a'})]) == 1
+    queue.close()
+
+
+def test_fail_then_abandon(queue_url):
+    queue = open_queue(queue_url, lease_seconds=60, max_attempts=2)
+    queue.put('sites', [('s', {'site_url': 's'})])
+
+    assert queue.fail(queue.lease(['sites']), 'HTTP 500')
+    job = queue.lease(['sites'])
+    assert job.attempts == 2
+    assert not queue.fail(job, 'HTTP 502')
+    assert queue.lease(['sites']) is None
+    assert queue.failed('sites') == {'s': 'HTTP 502'}
+    assert queue.counts('sites')['failed'] == 1
+    queue.close()
+
+
+def test_expired_lease_is_redelivered_then_abandoned(queue_url):
+    queue = open_queue(queue_url, lease_seconds=0, max_attempts=2)
+    queue.put('categories', [('c', {'url': 'c'})])
+
+    assert queue.lease(['categories']).attempts == 1
+    # Bail expiré sans ack : le job revient
+    assert queue.lease(['categories']).attempts == 2
+    assert queue.lease(['categories']) is None
+    assert 'c' in queue.failed('categories')
+    queue.close()
+
+
+def test_concurrent_workers_lease_each_job_once(queue_url):
+    queue = open_queue(queue_url, lease_seconds=60)
+    queue.put('listings', [(f"job{n}", {'n': n}) for n in range(100)])
+    leased = []
+
+    def work():
+        worker_queue = open_queue(queue_url, lease_seconds=60)
+        while True:
+            job = worker_queue.lease(['listings'])
+            if job is None:
+                break
+            leased.append(job.id)
+            worker_queue.ack([job])
+        worker_queue.close()
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+    assert sorted(leased) == sorted(f"job{n}" for n in range(100))
+    assert queue.counts('listings')['done'] == 100
+    queue.close()
+
+
+def test_redis_watch_conflict_aborts_transaction(redis_stub):
+    first, second = RedisConnection(redis_stub.url), RedisConnection(redis_stub.url)
+    first.execute('WATCH', 'k')
+    second.execute('ZADD', 'k', 1, 'job')
+    first.execute('MULTI')
+    assert first.execute('ZADD', 'k', 2, 'job') == 'QUEUED'
+    # EXEC refusé (*-1) : le client le rend par None
+    assert first.execute('EXEC') is None
+    first.close()
+    second.close()
+
+
+def test_redis_auth_and_database(redis_stub):
+    queue = open_queue(redis_stub.url)
+    queue.put('sites', [('s', {})])
+    assert redis_stub.commands[:2] == ['AUTH', 'SELECT']
+    assert any(key.startswith('locanto:sites:') for key in redis_stub.dbs[2])
+    queue.close()
+
+
+class CountingSocket:
+    def __init__(self, sock):
+        self.sock = sock
+        self.sends = 0
+
+    def sendall(self, data):
+        self.sends += 1
+        self.sock.sendall(data)
+
+    def close(self):
+        self.sock.close()
+
+
+def test_redis_put_and_ack_batch_their_commands(redis_stub):
+    queue = open_queue(redis_stub.url)
+    queue.put('listings', [('done', {})])
+    queue.ack([queue.lease(['listings'])])
+
+    sock = queue._redis._sock = CountingSocket(queue._redis._sock)
+    multi = redis_stub.commands.count('MULTI')
+    jobs = [(f"job{n}", {'n': n}) for n in range(queue.BATCH + 10)] + [('done', {}), ('job0', {})]
+    # Deux allers-retours par lot (filtre des jobs terminés, puis MULTI / EXEC)
+    assert queue.put('listings', jobs) == queue.BATCH + 10
+    assert sock.sends == 4
+    assert redis_stub.commands.count('MULTI') == multi + 2
+
+    leased = [queue.lease(['listings']) for _ in range(3)]
+    sock.sends = 0
+    queue.ack(leased)
+    assert sock.sends == 1
+    assert queue.counts('listings') == {'ready': queue.BATCH + 7, 'leased': 0, 'done': 4, 'failed': 0}
+    queue.close()